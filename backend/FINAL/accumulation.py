@@ -0,0 +1,219 @@
+"""Accumulation control: accepted liability within a radius or zone of a risk.
+
+AccumulationIndex buckets geocoded accepted risks (Risk_Location) into a
+uniform lat/lon grid of `cell_deg` degrees and keeps a running liability
+total per cell and per zone. A radius query only visits the cells the
+search circle can touch; cells lying entirely inside the circle contribute
+their running total without looking at their risks, so the cost depends on
+the radius and local density rather than on the size of the book.
+
+Zones are CRESTA-style labels: the record's CRESTA_Zone when given, else
+the country of its Risk_Location. Accepting, re-deciding or declining a
+risk updates one cell and one zone.
+"""
+import math
+import threading
+
+EARTH_RADIUS_KM = 6371.0088
+DEFAULT_CELL_DEG = 0.05  # about 5.5 km north-south
+
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((p2 - p1) / 2) ** 2
+         + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+def _amount(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return value if value == value else 0.0
+
+
+def risk_coords(record):
+    """(lat, lon) from the record's Risk_Location, or (None, None)."""
+    location = record.get("Risk_Location") or {}
+    lat, lon = location.get("latitude"), location.get("longitude")
+    if lat is None or lon is None:
+        return None, None
+    return float(lat), float(lon)
+
+
+def zone_for(record):
+    zone = record.get("CRESTA_Zone")
+    if zone:
+        return str(zone).strip()
+    return (record.get("Risk_Location") or {}).get("country") or None
+
+
+class AccumulationIndex:
+    def __init__(self, cell_deg=DEFAULT_CELL_DEG):
+        self.cell_deg = cell_deg
+        self._entries = {}  # submission_id -> (lat, lon, zone, liability)
+        self._cells = {}  # (row, col) -> {"total": liability, "risks": {submission_id: (lat, lon, liability)}}
+        self._zones = {}  # zone -> [liability, count]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _cell(self, lat, lon):
+        return int(math.floor((lat + 90.0) / self.cell_deg)), int(math.floor((lon + 180.0) / self.cell_deg))
+
+    # --------------------------
+    # Updates
+    # --------------------------
+
+    def _remove(self, submission_id):
+        previous = self._entries.pop(submission_id, None)
+        if previous is None:
+            return False
+        lat, lon, zone, liability = previous
+        if lat is not None:
+            key = self._cell(lat, lon)
+            cell = self._cells[key]
+            del cell["risks"][submission_id]
+            cell["total"] -= liability
+            if not cell["risks"]:
+                del self._cells[key]
+        if zone is not None:
+            bucket = self._zones[zone]
+            bucket[0] -= liability
+            bucket[1] -= 1
+            if bucket[1] <= 0:
+                del self._zones[zone]
+        return True
+
+    def add(self, submission_id, lat, lon, liability, zone=None):
+        """Add or replace one accepted risk (lat/lon may be None for zone-only risks)."""
+        liability = _amount(liability)
+        with self._lock:
+            self._remove(submission_id)
+            self._entries[submission_id] = (lat, lon, zone, liability)
+            if lat is not None:
+                cell = self._cells.setdefault(self._cell(lat, lon), {"total": 0.0, "risks": {}})
+                cell["risks"][submission_id] = (lat, lon, liability)
+                cell["total"] += liability
+            if zone is not None:
+                bucket = self._zones.setdefault(zone, [0.0, 0])
+                bucket[0] += liability
+                bucket[1] += 1
+
+    def remove(self, submission_id):
+        with self._lock:
+            return self._remove(submission_id)
+
+    def apply_decision(self, record, liability=None):
+        """Keep the index in line with a decided record (accepted in, anything else out)."""
+        sid = record.get("Submission_ID")
+        if not sid:
+            return
+        if record.get("Decision") != "Accept":
+            self.remove(sid)
+            return
+        lat, lon = risk_coords(record)
+        zone = zone_for(record)
+        if lat is None and zone is None:
+            self.remove(sid)
+            return
+        if liability is None:
+            liability = record.get("Accepted_Liability_KES")
+        self.add(sid, lat, lon, liability, zone)
+
+    # --------------------------
+    # Queries
+    # --------------------------
+
+    def within_radius(self, lat, lon, radius_km, exclude=None):
+        """(liability, count) of accepted risks within radius_km of the point."""
+        lat_span = math.degrees(radius_km / EARTH_RADIUS_KM)
+        lon_span = lat_span / max(math.cos(math.radians(min(89.9, abs(lat) + lat_span))), 1e-3)
+        row_lo, col_lo = self._cell(lat - lat_span, lon - min(lon_span, 180.0))
+        row_hi, col_hi = self._cell(lat + lat_span, lon + min(lon_span, 180.0))
+        n_cols = int(round(360 / self.cell_deg))
+        total, count = 0.0, 0
+        with self._lock:
+            for row in range(row_lo, row_hi + 1):
+                for col in range(col_lo, min(col_hi, col_lo + n_cols - 1) + 1):
+                    cell = self._cells.get((row, col % n_cols))
+                    if cell is None:
+                        continue
+                    if exclude not in cell["risks"] and self._cell_inside(row, col, lat, lon, radius_km):
+                        total += cell["total"]
+                        count += len(cell["risks"])
+                        continue
+                    for sid, (r_lat, r_lon, liability) in cell["risks"].items():
+                        if sid != exclude and _haversine_km(lat, lon, r_lat, r_lon) <= radius_km:
+                            total += liability
+                            count += 1
+        return total, count
+
+    def _cell_inside(self, row, col, lat, lon, radius_km):
+        """True when all four corners of the cell are within the radius."""
+        south = row * self.cell_deg - 90.0
+        west = col * self.cell_deg - 180.0
+        return all(
+            _haversine_km(lat, lon, c_lat, c_lon) <= radius_km
+            for c_lat in (south, south + self.cell_deg)
+            for c_lon in (west, west + self.cell_deg)
+        )
+
+    def zone_total(self, zone, exclude=None):
+        """(liability, count) of accepted risks in the zone."""
+        with self._lock:
+            total, count = self._zones.get(zone, (0.0, 0))
+            own = self._entries.get(exclude) if exclude else None
+            if own is not None and own[2] == zone:
+                total, count = total - own[3], count - 1
+        return total, count
+
+    def accumulation(self, record, liability, radius_km):
+        """Liability this risk would bring its radius and zone to, its own prior entry excluded."""
+        sid = record.get("Submission_ID")
+        liability = _amount(liability)
+        lat, lon = risk_coords(record)
+        zone = zone_for(record)
+        result = {"zone": zone, "radius_km": radius_km, "radius_liability": None, "zone_liability": None}
+        if lat is not None:
+            total, count = self.within_radius(lat, lon, radius_km, exclude=sid)
+            result.update(radius_liability=total + liability, radius_risks=count)
+        if zone is not None:
+            total, count = self.zone_total(zone, exclude=sid)
+            result.update(zone_liability=total + liability, zone_risks=count)
+        return result
+
+    # --------------------------
+    # Snapshot / restore
+    # --------------------------
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "cell_deg": self.cell_deg,
+                "entries": {
+                    sid: {"lat": lat, "lon": lon, "zone": zone, "liability": liability}
+                    for sid, (lat, lon, zone, liability) in self._entries.items()
+                },
+            }
+
+    @classmethod
+    def restore(cls, snapshot):
+        snapshot = snapshot or {}
+        index = cls(snapshot.get("cell_deg", DEFAULT_CELL_DEG))
+        for sid, entry in snapshot.get("entries", {}).items():
+            index.add(sid, entry["lat"], entry["lon"], entry["liability"], entry["zone"])
+        return index
+
+    @classmethod
+    def from_records(cls, records, cell_deg=DEFAULT_CELL_DEG):
+        index = cls(cell_deg)
+        for record in records:
+            index.apply_decision(record)
+        return index
+
+    @classmethod
+    def from_store(cls, store, cell_deg=DEFAULT_CELL_DEG):
+        return cls.from_records(store.query(decision="Accept"), cell_deg)
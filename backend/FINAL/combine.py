@@ -1,7 +1,79 @@
 import json
+import os
 
+# Keys written onto each case by score_facultative_risks
+DECISION_FIELDS = [
+    "Decision", "Accepted_Share_Pct", "Decision_Reasons", "Decision_Rationale",
+    "Evaluated_Loss_Ratio_Pct", "Evaluated_Accepted_Liability_KES",
+    "Accumulation_Zone", "Evaluated_Radius_Accumulation_KES", "Evaluated_Zone_Accumulation_KES",
+    "Evaluated_Peak_In_Force_KES",
+]
 
-def score_facultative_risks(data):
+# Accumulation control (used when an AccumulationIndex is passed in)
+ACCUMULATION_RADIUS_KM = float(os.getenv("ACCUMULATION_RADIUS_KM", "1.0"))
+RADIUS_ACCUMULATION_LIMIT_KES = float(os.getenv("RADIUS_ACCUMULATION_LIMIT_KES", "2000000000"))
+ZONE_ACCUMULATION_LIMIT_KES = float(os.getenv("ZONE_ACCUMULATION_LIMIT_KES", "20000000000"))
+# Aggregate accepted liability in force at any point of the policy period (InForceIndex)
+IN_FORCE_LIMIT_KES = float(os.getenv("IN_FORCE_LIMIT_KES", "50000000000"))
+
+
+def _accumulation_rule(case, accepted_liability, accumulation, decision_reasons):
+    """Rule 3 - accepted liability within the radius / zone including this risk."""
+    result = accumulation.accumulation(case, accepted_liability, ACCUMULATION_RADIUS_KM)
+    ok = True
+    radius_liability = result["radius_liability"]
+    if radius_liability is not None:
+        if radius_liability < RADIUS_ACCUMULATION_LIMIT_KES:
+            decision_reasons.append(
+                f"Accumulated liability {int(radius_liability)} KES within {ACCUMULATION_RADIUS_KM:g} km "
+                f"is < {int(RADIUS_ACCUMULATION_LIMIT_KES):,} KES (acceptable)"
+            )
+        else:
+            decision_reasons.append(
+                f"Accumulated liability {int(radius_liability)} KES within {ACCUMULATION_RADIUS_KM:g} km "
+                f"is >= {int(RADIUS_ACCUMULATION_LIMIT_KES):,} KES (reject)"
+            )
+            ok = False
+    zone_liability = result["zone_liability"]
+    if zone_liability is not None:
+        if zone_liability < ZONE_ACCUMULATION_LIMIT_KES:
+            decision_reasons.append(
+                f"Zone {result['zone']} accumulated liability {int(zone_liability)} KES "
+                f"is < {int(ZONE_ACCUMULATION_LIMIT_KES):,} KES (acceptable)"
+            )
+        else:
+            decision_reasons.append(
+                f"Zone {result['zone']} accumulated liability {int(zone_liability)} KES "
+                f"is >= {int(ZONE_ACCUMULATION_LIMIT_KES):,} KES (reject)"
+            )
+            ok = False
+    return ok, result
+
+
+def _in_force_rule(case, accepted_liability, in_force, decision_reasons):
+    """Rule 4 - peak liability in force during the policy period including this risk."""
+    result = in_force.period_peak(case)
+    if result is None:
+        decision_reasons.append("Policy period not available (in-force aggregate not checked)")
+        return True, None
+    peak, peak_date = result
+    peak += accepted_liability
+    if peak < IN_FORCE_LIMIT_KES:
+        decision_reasons.append(
+            f"Peak in-force liability {int(peak)} KES (on {peak_date}) is < {int(IN_FORCE_LIMIT_KES):,} KES (acceptable)"
+        )
+        return True, peak
+    decision_reasons.append(
+        f"Peak in-force liability {int(peak)} KES (on {peak_date}) is >= {int(IN_FORCE_LIMIT_KES):,} KES (reject)"
+    )
+    return False, peak
+
+
+def score_facultative_risks(data, accumulation=None, in_force=None):
+    """Decide each case; with an AccumulationIndex (FINAL/accumulation.py) and/or
+    an InForceIndex (FINAL/in_force.py) also apply the accumulation and in-force
+    limits and book accepted cases into them, so later cases in the same batch
+    see them."""
     results = []
 
     for case in data:
@@ -37,8 +109,15 @@ def score_facultative_risks(data):
         else:
             decision_reasons.append(f"Accepted liability {int(accepted_liability)} KES is >= 1,000,000,000 KES (reject)")
 
+        accumulation_ok, accumulated = True, None
+        if accumulation is not None:
+            accumulation_ok, accumulated = _accumulation_rule(case, accepted_liability, accumulation, decision_reasons)
+        in_force_ok, peak_in_force = True, None
+        if in_force is not None:
+            in_force_ok, peak_in_force = _in_force_rule(case, accepted_liability, in_force, decision_reasons)
+
         # Final decision
-        if loss_ratio_ok and max_liability_ok:
+        if loss_ratio_ok and max_liability_ok and accumulation_ok and in_force_ok:
             decision = "Accept"
             offered = case.get("Share_Offered_Pct", 0)
             accepted_share = offered if offered is not None else 0
@@ -53,6 +132,14 @@ def score_facultative_risks(data):
         case["Decision_Rationale"] = "; ".join(decision_reasons)
         case["Evaluated_Loss_Ratio_Pct"] = loss_ratio_pct
         case["Evaluated_Accepted_Liability_KES"] = accepted_liability
+        if accumulated is not None:
+            case["Accumulation_Zone"] = accumulated["zone"]
+            case["Evaluated_Radius_Accumulation_KES"] = accumulated["radius_liability"]
+            case["Evaluated_Zone_Accumulation_KES"] = accumulated["zone_liability"]
+            accumulation.apply_decision(case, accepted_liability)
+        if in_force is not None:
+            case["Evaluated_Peak_In_Force_KES"] = peak_in_force
+            in_force.apply_decision(case, accepted_liability)
 
         results.append(case)
 
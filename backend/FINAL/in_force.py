@@ -0,0 +1,281 @@
+"""Period-in-force exposure over accepted risks (Period_Start .. Period_End).
+
+InForceIndex keeps the accepted risks' policy periods as sorted endpoint
+arrays with prefix sums of accepted liability, so
+
+  - exposure on a date is two binary searches (liability started on or
+    before D minus liability ended before D),
+  - the peak aggregate over a window is a range-max over the running
+    exposure at each start/end date (sparse table, O(1) per range),
+  - risks expiring in the next N days are one searchsorted slice.
+
+Periods are inclusive of both dates. Adding or reversing a risk does not
+re-sort: changes go to a small delta (risks added, base rows superseded)
+that queries fold in, and the arrays are rebuilt once the delta passes
+rebuild_threshold.
+"""
+import os
+import sys
+import threading
+
+import numpy as np
+
+try:
+    from calculations import dates
+except ImportError:  # running from inside FINAL/
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from calculations import dates
+
+DEFAULT_REBUILD_THRESHOLD = 64
+_EPOCH = np.datetime64("1970-01-01", "D")
+
+
+def _amount(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return value if value == value else 0.0
+
+
+def to_day(value):
+    """Days since 1970-01-01 for a date, datetime or slip date string (None if unparseable)."""
+    if isinstance(value, (int, np.integer)) and not isinstance(value, bool):
+        return int(value)
+    value = dates.parse_date(value)
+    if value is None:
+        return None
+    return int((np.datetime64(value, "D") - _EPOCH).astype(np.int64))
+
+
+def from_day(day):
+    return str(_EPOCH + np.timedelta64(int(day), "D"))
+
+
+def record_period(record):
+    """(start_day, end_day) of a record's policy period, or None when incomplete."""
+    start, end = to_day(record.get("Period_Start")), to_day(record.get("Period_End"))
+    if start is None or end is None or end < start:
+        return None
+    return start, end
+
+
+class _SparseMax:
+    """Range-maximum (value, position) over a fixed array in O(1) per query."""
+
+    def __init__(self, values):
+        self.values = values
+        self.table = [np.arange(len(values))]
+        width = 1
+        while 2 * width <= len(values):
+            prev = self.table[-1]
+            left, right = prev[:-width], prev[width:]
+            self.table.append(np.where(values[left] >= values[right], left, right))
+            width *= 2
+
+    def argmax(self, lo, hi):
+        """Position of the maximum over values[lo:hi] (hi > lo)."""
+        lo, hi = int(lo), int(hi)
+        level = (hi - lo).bit_length() - 1
+        a, b = self.table[level][lo], self.table[level][hi - (1 << level)]
+        return a if self.values[a] >= self.values[b] else b
+
+
+class InForceIndex:
+    def __init__(self, rebuild_threshold=DEFAULT_REBUILD_THRESHOLD):
+        self.rebuild_threshold = rebuild_threshold
+        self._entries = {}  # submission_id -> (start_day, end_day, liability)
+        self._base = {}  # entries as of the last rebuild
+        self._dirty = set()  # submission_ids changed since the last rebuild
+        self._lock = threading.Lock()
+        self._build()
+
+    def __len__(self):
+        return len(self._entries)
+
+    # --------------------------
+    # Updates
+    # --------------------------
+
+    def add(self, submission_id, start_day, end_day, liability):
+        """Add or replace one accepted risk's period."""
+        with self._lock:
+            self._entries[submission_id] = (int(start_day), int(end_day), _amount(liability))
+            self._dirty.add(submission_id)
+
+    def remove(self, submission_id):
+        with self._lock:
+            self._dirty.add(submission_id)
+            return self._entries.pop(submission_id, None) is not None
+
+    def apply_decision(self, record, liability=None):
+        """Keep the index in line with a decided record (accepted in, anything else out)."""
+        sid = record.get("Submission_ID")
+        if not sid:
+            return
+        period = record_period(record)
+        if record.get("Decision") != "Accept" or period is None:
+            self.remove(sid)
+            return
+        if liability is None:
+            liability = record.get("Accepted_Liability_KES")
+        self.add(sid, period[0], period[1], liability)
+
+    # --------------------------
+    # Sorted arrays and delta
+    # --------------------------
+
+    def _build(self):
+        """Re-sort the endpoint arrays from the current entries (lock held)."""
+        self._base = dict(self._entries)
+        self._dirty = set()
+        ids = list(self._base)
+        data = np.array([self._base[sid] for sid in ids], dtype=float).reshape(-1, 3)
+        starts, ends, liability = data[:, 0].astype(np.int64), data[:, 1].astype(np.int64), data[:, 2]
+
+        order = np.argsort(starts, kind="stable")
+        self._starts = starts[order]
+        self._start_cum = np.concatenate([[0.0], np.cumsum(liability[order])])
+
+        order = np.argsort(ends, kind="stable")
+        self._ends = ends[order]
+        self._end_cum = np.concatenate([[0.0], np.cumsum(liability[order])])
+        self._end_ids = [ids[i] for i in order]
+
+        # Running exposure just after each change date (a start, or the day after an end)
+        days = np.concatenate([starts, ends + 1])
+        changes = np.concatenate([liability, -liability])
+        self._event_days, inverse = np.unique(days, return_inverse=True)
+        self._event_exposure = np.cumsum(np.bincount(inverse, weights=changes, minlength=len(self._event_days)))
+        self._peaks = _SparseMax(self._event_exposure) if len(self._event_days) else None
+
+    def _delta(self):
+        """(added, superseded) entries since the last rebuild; rebuilds when the delta is large."""
+        if len(self._dirty) > self.rebuild_threshold:
+            self._build()
+            return [], []
+        changed = [(self._base.get(sid), self._entries.get(sid)) for sid in self._dirty]
+        added = [new for old, new in changed if new is not None and new != old]
+        superseded = [old for old, new in changed if old is not None and new != old]
+        return added, superseded
+
+    def _base_exposure(self, day):
+        started = self._start_cum[np.searchsorted(self._starts, day, side="right")]
+        ended = self._end_cum[np.searchsorted(self._ends, day, side="left")]
+        return started - ended
+
+    def _base_peak(self, first, last):
+        """(peak, day) of base exposure over [first, last]."""
+        best, best_day = self._base_exposure(first), first
+        if self._peaks is not None:
+            lo = np.searchsorted(self._event_days, first, side="right")
+            hi = np.searchsorted(self._event_days, last, side="right")
+            if hi > lo:
+                i = self._peaks.argmax(lo, hi)
+                if self._event_exposure[i] > best:
+                    best, best_day = self._event_exposure[i], int(self._event_days[i])
+        return best, best_day
+
+    @staticmethod
+    def _delta_exposure(added, superseded, days):
+        days = np.asarray(days)[:, None]
+        total = np.zeros(days.shape[0])
+        for entries, sign in ((added, 1.0), (superseded, -1.0)):
+            if entries:
+                e = np.array(entries, dtype=float)
+                inside = (e[:, 0] <= days) & (days <= e[:, 1])
+                total += sign * (inside * e[:, 2]).sum(axis=1)
+        return total
+
+    # --------------------------
+    # Queries
+    # --------------------------
+
+    def exposure_on(self, day):
+        """Accepted liability in force on the date."""
+        day = to_day(day)
+        with self._lock:
+            added, superseded = self._delta()
+            return float(self._base_exposure(day) + self._delta_exposure(added, superseded, [day])[0])
+
+    def peak(self, first, last, exclude=None):
+        """(peak liability in force, date of the peak) over the inclusive window.
+
+        `exclude` leaves one submission's own period out, for re-evaluating a booked risk.
+        """
+        first, last = to_day(first), to_day(last)
+        if last < first:
+            raise ValueError("window ends before it starts")
+        with self._lock:
+            added, superseded = self._delta()
+            if exclude in self._entries:
+                superseded = superseded + [self._entries[exclude]]
+            # The delta is constant between its own change dates; take the base peak per piece
+            cuts = {first}
+            for s, e, _ in added + superseded:
+                cuts.update(d for d in (s, e + 1) if first < d <= last)
+            cuts = sorted(cuts)
+            offsets = self._delta_exposure(added, superseded, cuts)
+            best, best_day = None, first
+            for i, piece_start in enumerate(cuts):
+                piece_end = cuts[i + 1] - 1 if i + 1 < len(cuts) else last
+                value, day = self._base_peak(piece_start, piece_end)
+                value += offsets[i]
+                if best is None or value > best:
+                    best, best_day = value, day
+        return float(best), from_day(best_day)
+
+    def period_peak(self, record):
+        """peak() over the record's own policy period, its booked entry left out; None without a period."""
+        period = record_period(record)
+        if period is None:
+            return None
+        return self.peak(period[0], period[1], exclude=record.get("Submission_ID"))
+
+    def expiring(self, first, days):
+        """[(submission_id, Period_End, liability)] for risks ending within `days` days of first."""
+        first = to_day(first)
+        last = first + int(days)
+        with self._lock:
+            self._delta()
+            lo = np.searchsorted(self._ends, first, side="left")
+            hi = np.searchsorted(self._ends, last, side="right")
+            found = [sid for sid in self._end_ids[lo:hi] if sid not in self._dirty or self._entries.get(sid) == self._base[sid]]
+            found += [
+                sid for sid in self._dirty
+                if sid in self._entries and self._base.get(sid) != self._entries[sid]
+                and first <= self._entries[sid][1] <= last
+            ]
+            rows = [(sid, from_day(self._entries[sid][1]), self._entries[sid][2]) for sid in found]
+        return sorted(rows, key=lambda row: (row[1], row[0]))
+
+    def profile(self, first, last, step_days=30):
+        """[(date, exposure)] sampled every step_days over the window, for charts."""
+        first, last = to_day(first), to_day(last)
+        return [(from_day(d), self.exposure_on(d)) for d in range(first, last + 1, max(1, int(step_days)))]
+
+    # --------------------------
+    # Snapshot / restore
+    # --------------------------
+
+    def snapshot(self):
+        with self._lock:
+            return {"entries": {sid: list(entry) for sid, entry in self._entries.items()}}
+
+    @classmethod
+    def restore(cls, snapshot):
+        index = cls()
+        for sid, (start, end, liability) in (snapshot or {}).get("entries", {}).items():
+            index.add(sid, start, end, liability)
+        with index._lock:
+            index._build()
+        return index
+
+    @classmethod
+    def from_records(cls, records):
+        index = cls()
+        for record in records:
+            index.apply_decision(record)
+        with index._lock:
+            index._build()
+        return index
@@ -0,0 +1,173 @@
+"""Running portfolio totals over accepted decisions.
+
+PortfolioAccumulator keeps, per Submission_ID, the accepted risk's TSI and
+accepted liability (KES) and the buckets it falls in (cedant, broker,
+occupation, country, currency), plus running sums per bucket. Accepting,
+updating or reversing a risk touches only that risk's buckets, so updates
+and concentration checks are O(1) whatever the book size. snapshot() /
+restore() move the state between processes or onto disk.
+"""
+import threading
+
+DIMENSIONS = ("cedant", "broker", "occupation", "country", "currency")
+
+
+def _clean(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _amount(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return value if value == value else 0.0
+
+
+def portfolio_keys(record):
+    """Bucket per dimension for a record (None when the field is missing)."""
+    location = record.get("Risk_Location") or {}
+    currency = _clean(record.get("Original_Currency"))
+    return {
+        "cedant": _clean(record.get("Cedant")),
+        "broker": _clean(record.get("Broker")),
+        "occupation": _clean(record.get("Occupation_of_Insured") or record.get("Main_Activities")),
+        "country": _clean(location.get("country")),
+        "currency": currency.upper() if currency else None,
+    }
+
+
+class PortfolioAccumulator:
+    def __init__(self):
+        self._entries = {}  # submission_id -> (keys, tsi, liability)
+        self._totals = {dim: {} for dim in DIMENSIONS}  # dim -> key -> [tsi, liability, count]
+        self.total_tsi = 0.0
+        self.total_liability = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, submission_id):
+        return submission_id in self._entries
+
+    # --------------------------
+    # Updates
+    # --------------------------
+
+    def _apply(self, keys, tsi, liability, sign):
+        self.total_tsi += sign * tsi
+        self.total_liability += sign * liability
+        for dim in DIMENSIONS:
+            key = keys.get(dim)
+            if key is None:
+                continue
+            bucket = self._totals[dim].setdefault(key, [0.0, 0.0, 0])
+            bucket[0] += sign * tsi
+            bucket[1] += sign * liability
+            bucket[2] += sign
+            if bucket[2] <= 0:
+                del self._totals[dim][key]
+
+    def add(self, submission_id, keys, tsi, liability):
+        """Add or replace one accepted risk."""
+        with self._lock:
+            previous = self._entries.pop(submission_id, None)
+            if previous is not None:
+                self._apply(*previous, sign=-1)
+            entry = (dict(keys), _amount(tsi), _amount(liability))
+            self._entries[submission_id] = entry
+            self._apply(*entry, sign=1)
+
+    def remove(self, submission_id):
+        """Reverse an accepted risk; returns False if it was not in the book."""
+        with self._lock:
+            previous = self._entries.pop(submission_id, None)
+            if previous is None:
+                return False
+            self._apply(*previous, sign=-1)
+            return True
+
+    def apply_decision(self, record):
+        """Keep the book in line with a decided record (accepted in, anything else out)."""
+        sid = record.get("Submission_ID")
+        if not sid:
+            return
+        if record.get("Decision") == "Accept":
+            self.add(sid, portfolio_keys(record), record.get("TSI_KES"), record.get("Accepted_Liability_KES"))
+        else:
+            self.remove(sid)
+
+    # --------------------------
+    # Queries
+    # --------------------------
+
+    def totals(self, dimension, key):
+        """{"tsi", "liability", "count"} for one bucket."""
+        tsi, liability, count = self._totals[dimension].get(key, (0.0, 0.0, 0))
+        return {"tsi": tsi, "liability": liability, "count": count}
+
+    def breakdown(self, dimension):
+        return {key: {"tsi": t, "liability": l, "count": c} for key, (t, l, c) in self._totals[dimension].items()}
+
+    def concentration(self, record, tsi, submission_id=None):
+        """Share of the book (overall and per bucket) the risk would take with this TSI.
+
+        The risk's own current entry, if any, is swapped out rather than
+        counted twice, so re-evaluating a booked risk gives the same answer.
+        """
+        tsi = _amount(tsi)
+        keys = portfolio_keys(record)
+        with self._lock:
+            own = self._entries.get(submission_id) if submission_id else None
+            own_keys, own_tsi = (own[0], own[1]) if own else ({}, 0.0)
+            total = self.total_tsi - own_tsi + tsi
+            by = {}
+            for dim in DIMENSIONS:
+                key = keys.get(dim)
+                if key is None:
+                    continue
+                bucket_tsi = self._totals[dim].get(key, (0.0,))[0]
+                if own_keys.get(dim) == key:
+                    bucket_tsi -= own_tsi
+                by[dim] = tsi / (bucket_tsi + tsi) if bucket_tsi + tsi else 0.0
+        return {
+            "concentration": tsi / total if total else 0.0,
+            "by": by,
+            "portfolio_tsi": total - tsi,
+        }
+
+    # --------------------------
+    # Snapshot / restore
+    # --------------------------
+
+    def snapshot(self):
+        """JSON-serialisable state; the per-bucket totals are rebuilt on restore."""
+        with self._lock:
+            return {
+                "entries": {
+                    sid: {"keys": keys, "tsi": tsi, "liability": liability}
+                    for sid, (keys, tsi, liability) in self._entries.items()
+                }
+            }
+
+    @classmethod
+    def restore(cls, snapshot):
+        acc = cls()
+        for sid, entry in (snapshot or {}).get("entries", {}).items():
+            acc.add(sid, entry["keys"], entry["tsi"], entry["liability"])
+        return acc
+
+    @classmethod
+    def from_records(cls, records):
+        acc = cls()
+        for record in records:
+            acc.apply_decision(record)
+        return acc
+
+    @classmethod
+    def from_store(cls, store):
+        return cls.from_records(store.query(decision="Accept"))
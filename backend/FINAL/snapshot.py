@@ -0,0 +1,98 @@
+"""Atomic, versioned publication of decision snapshots.
+
+The pipeline publishes each store version as an immutable
+snapshots/decisions.v<N>.json and atomically replaces decisions.json (write
+to a temp file in the same directory, fsync, os.replace), so file readers
+never see a half-written document. Files are compact unless JSON_PRETTY=1
+(see calculations/jsonio.py). SnapshotCache keeps the current version
+parsed and pre-serialized in memory for the API and swaps it in one
+assignment when the store version moves.
+"""
+import os
+import sys
+import threading
+import time
+
+try:
+    from calculations import jsonio
+except ImportError:  # running from inside FINAL/
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from calculations import jsonio
+
+# Re-exported: callers write files through snapshot.atomic_write_bytes
+atomic_write_bytes = jsonio.atomic_write_bytes
+
+KEEP_SNAPSHOTS = int(os.getenv("DECISION_SNAPSHOTS_KEEP", "10"))
+
+
+def snapshot_path(directory, version):
+    return os.path.join(directory, "snapshots", f"decisions.v{version:06d}.json")
+
+
+def _prune(directory, keep):
+    snap_dir = os.path.join(directory, "snapshots")
+    names = sorted(n for n in os.listdir(snap_dir) if n.startswith("decisions.v") and n.endswith(".json"))
+    for name in names[:-keep] if keep > 0 else []:
+        try:
+            os.remove(os.path.join(snap_dir, name))
+        except OSError:
+            pass
+
+
+def publish(store, directory, export_name="decisions.json", keep=KEEP_SNAPSHOTS):
+    """Publish the store's current version; returns (version, export_path)."""
+    version, records = store.snapshot()
+    payload = jsonio.dumps_bytes(records)
+    versioned = snapshot_path(directory, version)
+    if not os.path.isfile(versioned):
+        atomic_write_bytes(versioned, payload)
+    export_path = os.path.join(directory, export_name)
+    atomic_write_bytes(export_path, payload)
+    _prune(directory, keep)
+    return version, export_path
+
+
+def latest_snapshot(directory):
+    """(version, path) of the newest published snapshot, or (None, None)."""
+    snap_dir = os.path.join(directory, "snapshots")
+    if not os.path.isdir(snap_dir):
+        return None, None
+    names = sorted(n for n in os.listdir(snap_dir) if n.startswith("decisions.v") and n.endswith(".json"))
+    if not names:
+        return None, None
+    name = names[-1]
+    return int(name[len("decisions.v"):-len(".json")]), os.path.join(snap_dir, name)
+
+
+class SnapshotCache:
+    """In-memory (version, records, bytes) for the current decisions snapshot.
+
+    get() checks the store version at most every check_interval seconds and
+    rebuilds off to the side before swapping, so readers never block on a
+    writer or see a partially built payload.
+    """
+
+    def __init__(self, store, check_interval=1.0):
+        self.store = store
+        self.check_interval = check_interval
+        self._current = (None, [], b"[]")
+        self._checked_at = 0.0
+        self._reload_lock = threading.Lock()
+
+    def refresh(self, force=False):
+        with self._reload_lock:
+            version = self.store.version()
+            if force or version != self._current[0]:
+                version, records = self.store.snapshot()
+                payload = jsonio.dumps_bytes(records, pretty=False)
+                self._current = (version, records, payload)
+            self._checked_at = time.monotonic()
+        return self._current
+
+    def get(self):
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            # Another thread already reloading: serve the current copy
+            if self._reload_lock.locked():
+                return self._current
+            return self.refresh()
+        return self._current
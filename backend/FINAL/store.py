@@ -0,0 +1,332 @@
+"""Embedded SQLite store for submissions, calculated metrics and decisions.
+
+One row per submission, upserted by Submission_ID. The columns used for
+filtering (cedant, broker, decision, currency, period, created time) are
+indexed; the extracted fields, calculated metrics and decision outputs are
+kept as JSON documents so records round-trip unchanged to the API.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    from FINAL.combine import DECISION_FIELDS
+except ImportError:  # running from inside FINAL/
+    from combine import DECISION_FIELDS
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from calculations import dates, jsonio
+
+FINAL_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB_PATH = os.getenv("DECISION_STORE_PATH", os.path.join(FINAL_DIR, "decisions.db"))
+
+# Fields produced by extraction (nlp2/APItest.py FIELDS) plus optional inputs
+EXTRACTED_FIELDS = [
+    "Submission_ID",
+    "Insured", "Cedant", "Broker", "Perils_Covered",
+    "Geographical_Limit", "Situation_of_Risk",
+    "Occupation_of_Insured", "Main_Activities",
+    "TSI_Original_Currency", "Original_Currency",
+    "Premium_Original_Currency", "Excess_Deductible",
+    "Retention_of_Cedant_Pct", "Share_Offered_Pct", "PML_Pct",
+    "Paid_Losses_3_Years", "Outstanding_Reserves_3_Years",
+    "Recoveries_3_Years", "Earned_Premium_3_Years",
+    "Climate_Change_Risk", "ESG_Risk_Level",
+    "Period_Start", "Period_End", "Premium_Rate_Pct",
+    "Proposed_Terms_Conditions", "latitude", "longitude",
+]
+
+# Numeric inputs the calculator coerces (None/invalid -> 0.0); hashed in that form
+NUMERIC_FIELDS = {
+    "TSI_Original_Currency", "Premium_Original_Currency",
+    "Paid_Losses_3_Years", "Outstanding_Reserves_3_Years", "Recoveries_3_Years",
+    "Earned_Premium_3_Years", "Share_Offered_Pct", "PML_Pct", "Retention_of_Cedant_Pct",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS risks (
+    submission_id   TEXT PRIMARY KEY,
+    insured         TEXT,
+    cedant          TEXT,
+    broker          TEXT,
+    decision        TEXT,
+    currency        TEXT,
+    period_start    TEXT,
+    period_end      TEXT,
+    content_hash    TEXT NOT NULL,
+    created_at      TEXT NOT NULL,
+    updated_at      TEXT NOT NULL,
+    extracted       TEXT NOT NULL,
+    metrics         TEXT NOT NULL,
+    decision_detail TEXT NOT NULL,
+    stage_versions  TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_risks_cedant ON risks (cedant);
+CREATE INDEX IF NOT EXISTS idx_risks_broker ON risks (broker);
+CREATE INDEX IF NOT EXISTS idx_risks_decision ON risks (decision);
+CREATE INDEX IF NOT EXISTS idx_risks_currency ON risks (currency);
+CREATE INDEX IF NOT EXISTS idx_risks_period ON risks (period_start, period_end);
+CREATE INDEX IF NOT EXISTS idx_risks_created_at ON risks (created_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+"""
+
+UPSERT_SQL = """
+INSERT INTO risks (
+    submission_id, insured, cedant, broker, decision, currency,
+    period_start, period_end, content_hash, created_at, updated_at,
+    extracted, metrics, decision_detail, stage_versions
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (submission_id) DO UPDATE SET
+    insured = excluded.insured,
+    cedant = excluded.cedant,
+    broker = excluded.broker,
+    decision = excluded.decision,
+    currency = excluded.currency,
+    period_start = excluded.period_start,
+    period_end = excluded.period_end,
+    content_hash = excluded.content_hash,
+    updated_at = excluded.updated_at,
+    extracted = excluded.extracted,
+    metrics = excluded.metrics,
+    decision_detail = excluded.decision_detail,
+    stage_versions = excluded.stage_versions
+"""
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def parse_date(value):
+    """Normalise the date formats seen in slips to ISO YYYY-MM-DD (None if unparseable)."""
+    day = dates.parse_date(value)
+    return None if day is None else day.isoformat()
+
+
+def _canonical_number(value):
+    try:
+        number = float(str(value).strip().replace(",", ""))
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if number != number else number  # NaN -> 0.0
+
+
+def extracted_hash(record):
+    """Stable hash of a record's extracted fields (ignores derived outputs).
+
+    Numeric fields are hashed as the calculator coerces them, so a raw input
+    and its decided record hash the same.
+    """
+    payload = {}
+    for key in EXTRACTED_FIELDS:
+        value = record.get(key)
+        if key in NUMERIC_FIELDS:
+            payload[key] = _canonical_number(value)
+        elif key != "Submission_ID" and value is not None:
+            payload[key] = value  # absent and null are the same after the DataFrame pass
+    blob = json.dumps(payload, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+def submission_id_for(record):
+    """Submission_ID if present, else a content-derived ID for legacy records."""
+    sid = record.get("Submission_ID")
+    if sid:
+        return str(sid)
+    return f"sha1-{extracted_hash(record)[:16]}"
+
+
+def _upper_or_none(value):
+    return str(value).strip().upper() if value not in (None, "") else None
+
+
+class DecisionStore:
+    """Thin wrapper over a SQLite file; one short-lived connection per call."""
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(risks)")}
+            if "stage_versions" not in columns:  # stores created before stage versioning
+                conn.execute("ALTER TABLE risks ADD COLUMN stage_versions TEXT")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:  # commit on success, roll back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def _row_values(self, record, now, versions_json):
+        extracted, metrics, decision = {}, {}, {}
+        for key, value in record.items():
+            if key in EXTRACTED_FIELDS:
+                extracted[key] = value
+            elif key in DECISION_FIELDS:
+                decision[key] = value
+            else:
+                metrics[key] = value
+        sid = submission_id_for(record)
+        extracted["Submission_ID"] = sid
+        return (
+            sid,
+            record.get("Insured"),
+            record.get("Cedant"),
+            record.get("Broker"),
+            record.get("Decision"),
+            _upper_or_none(record.get("Original_Currency")),
+            parse_date(record.get("Period_Start")),
+            parse_date(record.get("Period_End")),
+            extracted_hash(record),
+            now,
+            now,
+            json.dumps(extracted, ensure_ascii=False),
+            json.dumps(metrics, ensure_ascii=False),
+            json.dumps(decision, ensure_ascii=False),
+            versions_json,
+        )
+
+    def upsert_records(self, records, stage_versions=None):
+        """Insert or update decided records by Submission_ID.
+
+        Returns (rows written, store version committed by this write); the
+        version is None when there was nothing to write. stage_versions
+        ({stage: version}) records which code produced the rows, so
+        stale_ids() can find rows to re-run after a rule or prompt change.
+        """
+        now = _now_iso()
+        versions_json = json.dumps(stage_versions, sort_keys=True) if stage_versions else None
+        rows = [self._row_values(r, now, versions_json) for r in records]
+        if not rows:
+            return 0, None
+        with self._connect() as conn:
+            conn.executemany(UPSERT_SQL, rows)
+            # Read back inside the write transaction, before any other writer can bump it
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+            version = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+        return len(rows), version
+
+    def version(self):
+        """Monotonic counter bumped by every write; used to detect new snapshots."""
+        with self._connect() as conn:
+            return conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def known_hashes(self):
+        """Map of submission_id -> extracted-content hash for incremental runs."""
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT submission_id, content_hash FROM risks").fetchall())
+
+    def stale_ids(self, stage_versions, stages=None):
+        """Submission IDs whose stored stage versions differ from stage_versions."""
+        stages = list(stages or stage_versions)
+        stale = []
+        with self._connect() as conn:
+            for sid, raw in conn.execute("SELECT submission_id, stage_versions FROM risks"):
+                stored = jsonio.loads(raw) if raw else {}
+                if any(stored.get(s) != stage_versions.get(s) for s in stages):
+                    stale.append(sid)
+        return stale
+
+    def get_records(self, submission_ids):
+        """Stored records for the given IDs, with their stage versions."""
+        ids = list(submission_ids)
+        out = []
+        with self._connect() as conn:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                sql = ("SELECT extracted, metrics, decision_detail, stage_versions FROM risks "
+                       f"WHERE submission_id IN ({','.join('?' * len(chunk))}) ORDER BY created_at, rowid")
+                for row in conn.execute(sql, chunk):
+                    versions = jsonio.loads(row["stage_versions"]) if row["stage_versions"] else {}
+                    out.append((self._row_to_record(row), versions))
+        return out
+
+    def all_ids(self):
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute("SELECT submission_id FROM risks ORDER BY created_at, rowid")]
+
+    def count(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM risks").fetchone()[0]
+
+    @staticmethod
+    def _row_to_record(row):
+        record = jsonio.loads(row["extracted"])
+        record.update(jsonio.loads(row["metrics"]))
+        record.update(jsonio.loads(row["decision_detail"]))
+        return record
+
+    def query(self, cedant=None, broker=None, decision=None, currency=None,
+              period_from=None, period_to=None, created_since=None, limit=None):
+        """Filtered read over the indexed columns. Dates are ISO strings."""
+        clauses, params = [], []
+        for column, value in (("cedant", cedant), ("broker", broker), ("decision", decision)):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if currency:
+            clauses.append("currency = ?")
+            params.append(currency.upper())
+        if period_from:
+            # Policy still in force on/after period_from
+            clauses.append("period_end >= ?")
+            params.append(period_from)
+        if period_to:
+            clauses.append("period_start <= ?")
+            params.append(period_to)
+        if created_since:
+            clauses.append("created_at >= ?")
+            params.append(created_since)
+
+        sql = "SELECT extracted, metrics, decision_detail FROM risks"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY created_at, rowid"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+
+        with self._connect() as conn:
+            return [self._row_to_record(row) for row in conn.execute(sql, params)]
+
+    def all_records(self):
+        return self.query()
+
+    def snapshot(self):
+        """(version, records) read in one transaction so the two always agree."""
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            version = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+            rows = conn.execute(
+                "SELECT extracted, metrics, decision_detail FROM risks ORDER BY created_at, rowid"
+            ).fetchall()
+        return version, [self._row_to_record(row) for row in rows]
+
+    def summary(self):
+        """Decision counts overall and per cedant, computed in SQL for analytics."""
+        with self._connect() as conn:
+            by_decision = dict(conn.execute(
+                "SELECT COALESCE(decision, 'Pending'), COUNT(*) FROM risks GROUP BY decision"
+            ).fetchall())
+            by_cedant = [
+                {"Cedant": row[0], "Total": row[1], "Accepted": row[2]}
+                for row in conn.execute(
+                    "SELECT cedant, COUNT(*), SUM(decision = 'Accept') FROM risks "
+                    "GROUP BY cedant ORDER BY COUNT(*) DESC"
+                )
+            ]
+        return {"total": sum(by_decision.values()), "by_decision": by_decision, "by_cedant": by_cedant}
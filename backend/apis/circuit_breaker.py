@@ -0,0 +1,76 @@
+"""Circuit breaker for external lookups (USGS, FX providers).
+
+After `failure_threshold` consecutive failures the breaker opens and calls
+fail immediately with CircuitOpenError, so callers fall back to defaults
+instead of waiting out a timeout per record. After `reset_timeout` seconds
+one trial call is let through (half-open); success closes the breaker,
+failure opens it again.
+"""
+import threading
+import time
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, reset_timeout=60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def _before_call(self):
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+            if self.state == OPEN or (self.state == HALF_OPEN and self._trial_in_flight):
+                self.rejected += 1
+                raise CircuitOpenError(f"{self.name} circuit open after {self.failures} failures")
+            if self.state == HALF_OPEN:
+                self._trial_in_flight = True
+
+    def _on_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                print(f"[CIRCUIT] {self.name} closed")
+            self.state = CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def _on_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    print(f"[CIRCUIT] {self.name} open after {self.failures} consecutive failures")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def call(self, fn, *args, **kwargs):
+        self._before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self._on_failure()
+            raise
+        self._on_success()
+        return result
+
+    def status(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "rejected": self.rejected,
+            }
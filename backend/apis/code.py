@@ -1,7 +1,23 @@
+import math
+import os
+import sys
 import requests
 import random
 import json
-from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from apis import circuit_breaker, geocoder as geocoder_module, hazard_cache, hazard_layers, quake_catalog
+except ImportError:  # run as a script from apis/
+    import circuit_breaker
+    import geocoder as geocoder_module
+    import hazard_cache
+    import hazard_layers
+    import quake_catalog
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from calculations import actuarial, jsonio
 
 # --------------------------
 # Safe numeric coercion
@@ -24,56 +40,117 @@ def _safe_float(v: Any) -> float:
 # CAT Exposure (Earthquake, Flood, Typhoon)
 # --------------------------
 
-def get_cat_exposure(lat: Optional[float], lon: Optional[float]) -> Dict[str, str]:
-    # If coordinates are missing, return conservative defaults
-    if lat is None or lon is None:
-        return {"Earthquake": "Low", "Flood": "Moderate", "Typhoon": "Low"}
+USGS_RADIUS_KM = 100
+USGS_TIMEOUT_SECONDS = float(os.getenv("USGS_TIMEOUT_SECONDS", "10"))
+ENRICH_WORKERS = int(os.getenv("ENRICH_WORKERS", "8"))
+
+# Pooled connections for all lookups; the breaker stops calling USGS while it is down
+http_session = requests.Session()
+http_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=ENRICH_WORKERS))
+usgs_breaker = circuit_breaker.CircuitBreaker(
+    "usgs",
+    failure_threshold=int(os.getenv("USGS_BREAKER_FAILURES", "5")),
+    reset_timeout=float(os.getenv("USGS_BREAKER_RESET_SECONDS", "60")),
+)
+
+# Shared by every enrichment call; see apis/hazard_cache.py for TTL/size settings
+usgs_cache = hazard_cache.HazardCache()
+
+# Offline USGS exports (QUAKE_CATALOG_PATH); when set, no live USGS requests are made
+earthquake_catalog = quake_catalog.EarthquakeCatalog() if quake_catalog.DEFAULT_CATALOG_PATH else None
+
+# Memory-mapped flood / wind rasters (HAZARD_LAYER_DIR), keyed by CAT_Exposure peril
+hazard_layer_index = hazard_layers.load_layers()
+
+
+def fetch_usgs_magnitudes(lat: float, lon: float, radius_km: float = USGS_RADIUS_KM) -> List[float]:
+    response = http_session.get(
+        "https://earthquake.usgs.gov/fdsnws/event/1/query",
+        params={
+            "format": "geojson",
+            "latitude": lat,
+            "longitude": lon,
+            "maxradiuskm": radius_km,
+        },
+        timeout=USGS_TIMEOUT_SECONDS,
+    )
+    response.raise_for_status()
+    magnitudes: List[float] = []
+    for event in response.json().get("features", []):
+        mag = event.get("properties", {}).get("mag")
+        if isinstance(mag, (int, float)):
+            magnitudes.append(float(mag))
+    return magnitudes
 
-    # Fetch recent earthquake data from USGS (robust with filtering and timeouts)
+
+def _earthquake_level(avg_magnitude: Optional[float]) -> str:
+    if avg_magnitude is None:
+        return "Low"
+    if avg_magnitude >= 6.0:
+        return "High"
+    if avg_magnitude >= 4.0:
+        return "Moderate"
+    return "Low"
+
+
+# Defaults for missing coordinates, and for perils without a hazard layer
+DEFAULT_CAT_EXPOSURE = {"Earthquake": "Low", "Flood": "Moderate", "Typhoon": "Low"}
+
+
+def _usgs_earthquake_level(lat: float, lon: float) -> str:
+    # Recent earthquakes from USGS, cached per grid cell (failed lookups are not cached).
+    # While the breaker is open, misses fail immediately and get the default.
+    cell_lat, cell_lon = usgs_cache.cell(lat, lon)
     try:
-        response = requests.get(
-            "https://earthquake.usgs.gov/fdsnws/event/1/query",
-            params={
-                "format": "geojson",
-                "latitude": lat,
-                "longitude": lon,
-                "maxradiuskm": 100,
-            },
-            timeout=10,
+        magnitudes = usgs_cache.get_or_fetch(
+            usgs_cache.key("usgs_quakes", lat, lon, USGS_RADIUS_KM),
+            lambda: usgs_breaker.call(fetch_usgs_magnitudes, cell_lat, cell_lon),
         )
-        response.raise_for_status()
-        data = response.json()
     except Exception:
-        data = {"features": []}
+        magnitudes = []
 
     # Determine earthquake hazard level based on recent events
-    features = data.get("features", [])
-    magnitudes: List[float] = []
-    for event in features:
-        mag = event.get("properties", {}).get("mag")
-        if isinstance(mag, (int, float)):
-            magnitudes.append(float(mag))
+    avg_magnitude = sum(magnitudes) / len(magnitudes) if magnitudes else None
+    return _earthquake_level(avg_magnitude)
 
-    if magnitudes:
-        avg_magnitude = sum(magnitudes) / len(magnitudes)
-        if avg_magnitude >= 6.0:
-            earthquake_risk = "High"
-        elif avg_magnitude >= 4.0:
-            earthquake_risk = "Moderate"
-        else:
-            earthquake_risk = "Low"
-    else:
-        earthquake_risk = "Low"
 
-    # For flood and typhoon, mock values
-    flood_risk = "Moderate"
-    typhoon_risk = "Low"
+def _earthquake_levels(lats: List[float], lons: List[float]) -> List[str]:
+    if earthquake_catalog is not None:
+        _, means = earthquake_catalog.radius_stats(lats, lons, USGS_RADIUS_KM)
+        return [_earthquake_level(None if mean != mean else float(mean)) for mean in means]
+    if len(lats) <= 1 or ENRICH_WORKERS <= 1:
+        return [_usgs_earthquake_level(lat, lon) for lat, lon in zip(lats, lons)]
+    with ThreadPoolExecutor(max_workers=ENRICH_WORKERS) as pool:
+        return list(pool.map(_usgs_earthquake_level, lats, lons))
 
-    return {
-        "Earthquake": earthquake_risk,
-        "Flood": flood_risk,
-        "Typhoon": typhoon_risk,
-    }
+
+def get_cat_exposure(lat: Optional[float], lon: Optional[float]) -> Dict[str, str]:
+    return get_cat_exposure_batch([(lat, lon)])[0]
+
+
+def get_cat_exposure_batch(coords: List[Any]) -> List[Dict[str, str]]:
+    """CAT exposure for many (lat, lon) pairs (None for missing coordinates).
+
+    Earthquake comes from the offline catalog (one radius query for the
+    batch) or from concurrent USGS lookups (ENRICH_WORKERS threads). Flood
+    and typhoon come from hazard layers where configured, one gather per
+    layer; elsewhere they keep the default values.
+    """
+    # If coordinates are missing, return conservative defaults
+    results = [dict(DEFAULT_CAT_EXPOSURE) for _ in coords]
+    located = [i for i, c in enumerate(coords) if c is not None and None not in c]
+    if not located:
+        return results
+    lats = [coords[i][0] for i in located]
+    lons = [coords[i][1] for i in located]
+
+    for i, level in zip(located, _earthquake_levels(lats, lons)):
+        results[i]["Earthquake"] = level
+    for peril, layer in hazard_layer_index.items():
+        for i, band in zip(located, layer.bands_at(lats, lons)):
+            if band is not None:
+                results[i][peril] = band
+    return results
 
 # --------------------------
 # Climate / ESG Risk
@@ -102,16 +179,45 @@ def get_market_conditions(industry: str) -> Dict[str, float]:
 # Portfolio Impact
 # --------------------------
 
-def compute_portfolio_impact(existing_portfolio_tsi: List[float], new_tsi: float) -> Dict[str, Any]:
-    total_tsi = sum(existing_portfolio_tsi) + (_safe_float(new_tsi) or 0.0)
-    concentration = (_safe_float(new_tsi) or 0.0) / total_tsi if total_tsi else 0.0
+def _finite_amount(v: Any) -> float:
+    """_safe_float, with NaN/inf read as 0 (no FX rate, e.g. no Original_Currency), like FINAL/portfolio.py _amount"""
+    value = _safe_float(v)
+    return value if math.isfinite(value) else 0.0
+
+
+def _impact_level(concentration: float) -> str:
+    if not math.isfinite(concentration):
+        raise ValueError(f"concentration must be finite, got {concentration!r}")
     if concentration < 0.1:
-        impact = "Low"
+        return "Low"
     elif concentration < 0.3:
-        impact = "Medium"
-    else:
-        impact = "High"
-    return {"PortfolioImpact": impact, "Concentration": concentration}
+        return "Medium"
+    return "High"
+
+
+def compute_portfolio_impact(existing_portfolio_tsi: List[float], new_tsi: float,
+                             portfolio: Any = None, record: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Concentration of the new TSI against the book.
+
+    `portfolio` is a FINAL.portfolio.PortfolioAccumulator over accepted
+    decisions (O(1) lookup, also broken down by cedant, broker, occupation,
+    country and currency). Without one, or while it is still empty, the
+    static existing_portfolio_tsi list is used.
+    """
+    new_tsi = _finite_amount(new_tsi)
+    if portfolio is None or len(portfolio) == 0:
+        total_tsi = sum(existing_portfolio_tsi) + new_tsi
+        concentration = new_tsi / total_tsi if total_tsi else 0.0
+        return {"PortfolioImpact": _impact_level(concentration), "Concentration": concentration}
+
+    record = record or {}
+    result = portfolio.concentration(record, new_tsi, record.get("Submission_ID"))
+    return {
+        "PortfolioImpact": _impact_level(result["concentration"]),
+        "Concentration": result["concentration"],
+        "Concentration_By": result["by"],
+        "Portfolio_TSI_KES": round(result["portfolio_tsi"], 2),
+    }
 
 # --------------------------
 # Proposed % Share
@@ -139,54 +245,41 @@ def safe_pct(value: float) -> float:
     return round(value, 10)
 
 
-def compute_actuarial_fields(r: Dict[str, Any]) -> Dict[str, Any]:
-    tsi = _safe_float(r.get("TSI_Original_Currency", 0))
-    premium = _safe_float(r.get("Premium_Original_Currency", 0))
-    pml_pct = _safe_float(r.get("PML_Pct", 0))
-    retention_pct = _safe_float(r.get("Retention_of_Cedant_Pct", 0))
-    share_offered_pct = _safe_float(r.get("Share_Offered_Pct", 0))
-
-    tsi_base = tsi
-    premium_base = premium
+# Ratios are kept to 10 decimals, amounts to cents
+_PCT_FIELDS = {"Premium_Rate_Percentage", "Premium_Rate_Permille", "Loss_Ratio_Pct"}
 
-    premium_rate_percentage = (premium_base / tsi_base * 100.0) if tsi_base else 0.0
-    premium_rate_permille = premium_rate_percentage * 10.0 / 1.0
 
-    paid = _safe_float(r.get("Paid_Losses_3_Years", 0))
-    outstanding = _safe_float(r.get("Outstanding_Reserves_3_Years", 0))
-    recoveries = _safe_float(r.get("Recoveries_3_Years", 0))
-    earned = _safe_float(r.get("Earned_Premium_3_Years", 0))
-    loss_ratio = ((paid + outstanding - recoveries) / earned * 100.0) if earned else 0.0
+def compute_actuarial_batch(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Actuarial fields for a batch in original currency (the calculator converts to KES).
 
-    accepted_liability = tsi_base * (share_offered_pct / 100.0)
-    accepted_premium = premium_base * (share_offered_pct / 100.0)
+    Uses the shared vectorized kernel in calculations/actuarial.py.
+    """
+    columns = actuarial.metrics_for_records(records)
+    return [
+        {
+            name: safe_pct(float(columns[name][i])) if name in _PCT_FIELDS else round(float(columns[name][i]), 2)
+            for name in actuarial.OUTPUT_COLUMNS
+        }
+        for i in range(len(records))
+    ]
 
-    pml_amount = tsi_base * (pml_pct / 100.0)
-    retention_amount = tsi_base * (retention_pct / 100.0)
 
-    return {
-        "TSI_KES": round(tsi_base, 2),
-        "Premium_KES": round(premium_base, 2),
-        "Premium_Rate_Percentage": safe_pct(premium_rate_percentage),
-        "Premium_Rate_Permille": safe_pct(premium_rate_permille),
-        "Loss_Ratio_Pct": safe_pct(loss_ratio),
-        "Accepted_Premium_KES": round(accepted_premium, 2),
-        "Accepted_Liability_KES": round(accepted_liability, 2),
-        "PML_Amount_KES": round(pml_amount, 2),
-        "Retention_Amount_KES": round(retention_amount, 2),
-    }
+def compute_actuarial_fields(r: Dict[str, Any]) -> Dict[str, Any]:
+    return compute_actuarial_batch([r])[0]
 
 # --------------------------
 # Batch processing main
 # --------------------------
 
-existing_portfolio = [200e6, 150e6, 300e6]  # Other TSI in base currency
+existing_portfolio = [200e6, 150e6, 300e6]  # Reference book until accepted decisions exist
 
 
-def enrich_risk_record(r: Dict[str, Any]) -> Dict[str, Any]:
-    industry = r.get("Occupation_of_Insured") or r.get("Main_Activities") or "Manufacturing"
-    tsi = _safe_float(r.get("TSI_Original_Currency", 0))
+# Resolves Situation_of_Risk / Geographical_Limit when no coordinates are given
+geocoder = geocoder_module.Geocoder()
+LOCATION_FIELDS = ("Situation_of_Risk", "Geographical_Limit")
 
+
+def _coordinates(r: Dict[str, Any]):
     # Coordinates are optional in input
     lat = r.get("latitude")
     lon = r.get("longitude")
@@ -198,41 +291,111 @@ def enrich_risk_record(r: Dict[str, Any]) -> Dict[str, Any]:
         lon = float(lon) if lon is not None else None
     except Exception:
         lon = None
+    return lat, lon
+
 
-    cat_exposure = get_cat_exposure(lat, lon)
+def locate_risks(records: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+    """Risk_Location per record: input coordinates, else the gazetteer match, else None."""
+    locations: List[Optional[Dict[str, Any]]] = [None] * len(records)
+    pending = []
+    for i, r in enumerate(records):
+        lat, lon = _coordinates(r)
+        if lat is not None and lon is not None:
+            locations[i] = {"latitude": lat, "longitude": lon, "source": "input"}
+        else:
+            pending.append(i)
+
+    # Most specific field first; a field with no match falls through to the next
+    for field in LOCATION_FIELDS:
+        texts = [records[i].get(field) for i in pending]
+        still_pending = []
+        for i, place in zip(pending, geocoder.geocode_many(texts)):
+            if place is None:
+                still_pending.append(i)
+                continue
+            locations[i] = {
+                "latitude": place["latitude"],
+                "longitude": place["longitude"],
+                "source": "gazetteer",
+                "field": field,
+                "place": place["name"],
+                "kind": place["kind"],
+                "country": place["country"],
+                "fuzzy": place["fuzzy"],
+            }
+        pending = still_pending
+        if not pending:
+            break
+    return locations
+
+
+def _location_coords(location: Optional[Dict[str, Any]]):
+    if location is None:
+        return None, None
+    return location["latitude"], location["longitude"]
+
+
+def enrich_risk_record(r: Dict[str, Any], cat_exposure: Optional[Dict[str, str]] = None,
+                       location: Optional[Dict[str, Any]] = None, portfolio: Any = None,
+                       to_kes: Optional[Callable[[float, str, Dict[str, Any]], float]] = None,
+                       actuarial_fields: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    industry = r.get("Occupation_of_Insured") or r.get("Main_Activities") or "Manufacturing"
+    tsi = _safe_float(r.get("TSI_Original_Currency", 0))
+
+    if location is None:
+        location = locate_risks([r])[0]
+    if cat_exposure is None:
+        cat_exposure = get_cat_exposure(*_location_coords(location))
     climate_esg = get_climate_esg_risk(industry, tsi)
     market = get_market_conditions(industry)
-    portfolio = compute_portfolio_impact(existing_portfolio, tsi)
+    # The book is in KES, so compare the converted TSI when a converter is given
+    # (it gets the record too, to convert at the rate on the risk's policy date)
+    tsi_base = to_kes(tsi, r.get("Original_Currency"), r) if to_kes is not None else tsi
+    portfolio_impact = compute_portfolio_impact(
+        existing_portfolio, tsi_base, portfolio, dict(r, Risk_Location=location)
+    )
 
     pml_pct = _safe_float(r.get("PML_Pct", 0))
     retention_pct = _safe_float(r.get("Retention_of_Cedant_Pct", 0))
-    proposed_share = propose_share(pml_pct, cat_exposure, retention_pct, portfolio)
+    proposed_share = propose_share(pml_pct, cat_exposure, retention_pct, portfolio_impact)
 
-    actuarial = compute_actuarial_fields(r)
+    if actuarial_fields is None:
+        actuarial_fields = compute_actuarial_fields(r)
 
-    enriched: Dict[str, Any] = dict(r)  # keep original keys
-    enriched.update(actuarial)
+    enriched: Dict[str, Any] = r.copy()  # keep original keys (and the record type, see calculations/schema.py)
+    enriched.update(actuarial_fields)
     enriched.update({
+        "Risk_Location": location,
         "CAT_Exposure": cat_exposure,
         "Climate_ESG_Risk": climate_esg,
         "Market_Considerations": market,
-        "Portfolio_Impact": portfolio,
+        "Portfolio_Impact": portfolio_impact,
         "Proposed_Share": proposed_share,
     })
     return enriched
 
 
+def enrich_records(records: List[Dict[str, Any]], portfolio: Any = None,
+                   to_kes: Optional[Callable[[float, str, Dict[str, Any]], float]] = None) -> List[Dict[str, Any]]:
+    """Enrich a batch, scoring CAT exposure for all records at once."""
+    if earthquake_catalog is not None:
+        earthquake_catalog.refresh()  # pick up new catalog exports between runs
+    locations = locate_risks(records)
+    cat_exposures = get_cat_exposure_batch([_location_coords(loc) for loc in locations])
+    actuarial_fields = compute_actuarial_batch(records)
+    return [
+        enrich_risk_record(r, cat, loc, portfolio, to_kes, fields)
+        for r, cat, loc, fields in zip(records, cat_exposures, locations, actuarial_fields)
+    ]
+
+
 def load_input(path: str) -> List[Dict[str, Any]]:
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-        if not isinstance(data, list):
-            raise ValueError("sample_input.json must contain a list of risks")
-        return data
+    """Risks from a JSON array or JSON Lines file, plus any appended to its .jsonl journal."""
+    return jsonio.load_records(path)
 
 
-def write_output(path: str, records: List[Dict[str, Any]]) -> None:
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(records, f, indent=2)
+def write_output(path: str, records: List[Dict[str, Any]], pretty: Optional[bool] = None) -> None:
+    jsonio.dump(records, path, pretty=pretty)
 
 
 if __name__ == "__main__":
@@ -240,7 +403,7 @@ if __name__ == "__main__":
     output_path = "/home/gichinga/Desktop/projects/AI4INSURANCE/backend/calcultaions/facultative_reinsurance_calculations.json"
 
     risks = load_input(input_path)
-    enriched_records = [enrich_risk_record(r) for r in risks]
+    enriched_records = enrich_records(risks)
     write_output(output_path, enriched_records)
 
     # Also print a brief summary to stdout
@@ -0,0 +1,208 @@
+"""Offline geocoder for free-text risk locations (Situation_of_Risk, Geographical_Limit).
+
+Place names from a local gazetteer are normalized to token sequences
+(lowercase, accents stripped, punctuation removed) and stored in a token
+trie. A query is tokenized the same way and every start position is walked
+through the trie; the longest match wins, then the most specific kind
+(site > district > city > region > country), then the earliest position.
+Tokens missing from the gazetteer vocabulary are replaced by their closest
+vocabulary word (difflib ratio >= fuzzy_cutoff) before the walk, which
+absorbs typos ("Nairobbi", "Monbasa"); derived forms sharing a prefix
+("Indian" / "India") are not treated as typos.
+
+Gazetteers are CSV files with name,latitude,longitude[,country,kind,aliases]
+(aliases separated by "|") or GeoNames dumps (*.txt, e.g. cities500.txt).
+The bundled apis/data/gazetteer.csv covers the markets in the sample
+submissions; point GAZETTEER_PATH at larger files (os.pathsep separated).
+"""
+import csv
+import difflib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_GAZETTEER_PATHS = [
+    p for p in os.getenv("GAZETTEER_PATH", os.path.join(DATA_DIR, "gazetteer.csv")).split(os.pathsep) if p
+]
+DEFAULT_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", "4096"))
+DEFAULT_FUZZY_CUTOFF = float(os.getenv("GEOCODE_FUZZY_CUTOFF", "0.85"))
+
+KIND_RANK = {"country": 1, "region": 2, "city": 3, "district": 4, "site": 5}
+GEONAMES_KINDS = {"P": "city", "A": "region", "S": "site", "L": "district"}
+_END = "\0"
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_tokens(text):
+    text = "".join(c for c in unicodedata.normalize("NFKD", str(text)) if not unicodedata.combining(c))
+    return tuple(_TOKEN_RE.findall(text.lower()))
+
+
+def _read_csv(path):
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            try:
+                lat, lon = float(row["latitude"]), float(row["longitude"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            names = [row.get("name") or ""] + [a for a in (row.get("aliases") or "").split("|") if a]
+            yield names, {
+                "name": row.get("name") or "",
+                "latitude": lat,
+                "longitude": lon,
+                "country": row.get("country") or None,
+                "kind": (row.get("kind") or "city").strip().lower(),
+            }
+
+
+def _read_geonames(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) < 9:
+                continue
+            try:
+                lat, lon = float(cols[4]), float(cols[5])
+            except ValueError:
+                continue
+            kind = "country" if cols[7].startswith("PCL") else GEONAMES_KINDS.get(cols[6], "region")
+            names = [cols[1], cols[2]] + [a for a in cols[3].split(",") if a]
+            yield names, {"name": cols[1], "latitude": lat, "longitude": lon, "country": cols[8] or None, "kind": kind}
+
+
+class Geocoder:
+    def __init__(self, paths=None, cache_size=DEFAULT_CACHE_SIZE, fuzzy_cutoff=DEFAULT_FUZZY_CUTOFF):
+        self.paths = list(DEFAULT_GAZETTEER_PATHS if paths is None else paths)
+        self.cache_size = cache_size
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.places = []
+        self._trie = {}
+        self._vocab = {}  # first letter -> words, for fuzzy candidates
+        self._fuzzy = {}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    # --------------------------
+    # Gazetteer
+    # --------------------------
+
+    def load(self):
+        """Build the trie from the gazetteer files (once; called lazily)."""
+        with self._lock:
+            if self._loaded:
+                return self
+            for path in self.paths:
+                if not os.path.isfile(path):
+                    print(f"[WARN] Gazetteer not found: {path}")
+                    continue
+                reader = _read_csv if path.lower().endswith(".csv") else _read_geonames
+                for names, place in reader(path):
+                    self._add(names, place)
+            vocab = {}
+            for word in self._words():
+                vocab.setdefault(word[0], []).append(word)
+            self._vocab = vocab
+            self._loaded = True
+            print(f"[GEOCODE] {len(self.places)} places loaded from {len(self.paths)} gazetteer(s)")
+        return self
+
+    def _add(self, names, place):
+        index = len(self.places)
+        self.places.append(place)
+        for name in names:
+            tokens = normalize_tokens(name)
+            if not tokens:
+                continue
+            node = self._trie
+            for token in tokens:
+                node = node.setdefault(token, {})
+            node.setdefault(_END, []).append(index)
+
+    def _words(self):
+        words, stack = set(), [self._trie]
+        while stack:
+            node = stack.pop()
+            for key, child in node.items():
+                if key != _END:
+                    words.add(key)
+                    stack.append(child)
+        return words
+
+    # --------------------------
+    # Matching
+    # --------------------------
+
+    def _correct(self, token):
+        """Closest vocabulary word for an unknown token (None if nothing is close)."""
+        if token in self._fuzzy:
+            return self._fuzzy[token]
+        match = None
+        if len(token) >= 4 and not token.isdigit():
+            # Skip prefix pairs: "indian" is not a misspelling of "india"
+            candidates = [
+                w for w in self._vocab.get(token[0], ())
+                if abs(len(w) - len(token)) <= 2 and not (w.startswith(token) or token.startswith(w))
+            ]
+            close = difflib.get_close_matches(token, candidates, n=1, cutoff=self.fuzzy_cutoff)
+            match = close[0] if close else None
+        if len(self._fuzzy) > 10 * self.cache_size:
+            self._fuzzy.clear()
+        self._fuzzy[token] = match
+        return match
+
+    def _match(self, tokens):
+        best, best_key = None, None
+        for start in range(len(tokens)):
+            node, fuzzy = self._trie, 0
+            for pos in range(start, len(tokens)):
+                token = tokens[pos]
+                if token not in node:
+                    corrected = self._correct(token)
+                    if corrected is None or corrected not in node:
+                        break
+                    token, fuzzy = corrected, fuzzy + 1
+                node = node[token]
+                for index in node.get(_END, ()):
+                    span = pos - start + 1
+                    key = (span - fuzzy * 0.5, KIND_RANK.get(self.places[index]["kind"], 0), -start)
+                    if best_key is None or key > best_key:
+                        best_key = key
+                        best = dict(self.places[index], matched=" ".join(tokens[start:pos + 1]),
+                                    fuzzy=bool(fuzzy))
+        return best
+
+    def geocode(self, text):
+        """Best gazetteer place in `text` as a dict (name, latitude, longitude, ...) or None."""
+        if text is None:
+            return None
+        if isinstance(text, (list, tuple)):
+            text = "; ".join(str(t) for t in text)
+        tokens = normalize_tokens(text)
+        if not tokens:
+            return None
+        self.load()
+        with self._lock:
+            if tokens in self._cache:
+                self._cache.move_to_end(tokens)
+                return self._cache[tokens]
+        result = self._match(tokens)
+        with self._lock:
+            self._cache[tokens] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def geocode_many(self, texts):
+        """geocode() over a batch, resolving each distinct text once."""
+        resolved = {}
+        results = []
+        for text in texts:
+            key = repr(text)
+            if key not in resolved:
+                resolved[key] = self.geocode(text)
+            results.append(resolved[key])
+        return results
@@ -0,0 +1,175 @@
+"""Persistent cache for hazard lookups, keyed by grid cell and radius.
+
+Coordinates are snapped to a grid of `cell_deg` degrees (0.1 deg is about
+11 km, small next to the 100 km USGS search radius), so nearby risks share
+one entry. Entries live in SQLite and expire after `ttl_seconds`; when the
+table grows past `max_entries` the least recently used rows are dropped.
+Concurrent misses for the same key are coalesced: one caller fetches, the
+others wait for its result.
+"""
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_PATH = os.getenv("USGS_CACHE_PATH", os.path.join(BACKEND_DIR, "cache", "usgs.db"))
+DEFAULT_TTL_SECONDS = float(os.getenv("USGS_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+DEFAULT_MAX_ENTRIES = int(os.getenv("USGS_CACHE_MAX_ENTRIES", "10000"))
+DEFAULT_CELL_DEG = float(os.getenv("USGS_CACHE_CELL_DEG", "0.1"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hazard_cache (
+    key         TEXT PRIMARY KEY,
+    value       TEXT NOT NULL,
+    fetched_at  REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_hazard_cache_accessed ON hazard_cache (accessed_at);
+"""
+
+
+class _Pending:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class HazardCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 max_entries=DEFAULT_MAX_ENTRIES, cell_deg=DEFAULT_CELL_DEG, observer=None):
+        """observer(result) is called per lookup with "hit", "miss" or "coalesced"."""
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.cell_deg = cell_deg
+        self.observer = observer
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._ready = False
+
+    @contextmanager
+    def _connect(self):
+        if not self._ready:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            if not self._ready:
+                conn.executescript(SCHEMA)
+                self._ready = True
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def cell(self, lat, lon):
+        """(lat, lon) of the centre of the grid cell containing the point."""
+        size = self.cell_deg
+        return (
+            round((math.floor(lat / size) + 0.5) * size, 6),
+            round((math.floor(lon / size) + 0.5) * size, 6),
+        )
+
+    def key(self, kind, lat, lon, radius_km):
+        cell_lat, cell_lon = self.cell(lat, lon)
+        return f"{kind}:{cell_lat:.6f}:{cell_lon:.6f}:{radius_km:g}"
+
+    def _observe(self, result):
+        attr = {"hit": "hits", "miss": "misses", "coalesced": "coalesced"}[result]
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+        if self.observer is not None:
+            self.observer(result)
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, fetched_at FROM hazard_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                return None
+            conn.execute("UPDATE hazard_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO hazard_cache (key, value, fetched_at, accessed_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, "
+                "fetched_at = excluded.fetched_at, accessed_at = excluded.accessed_at",
+                (key, json.dumps(value), now, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM hazard_cache WHERE fetched_at < ?", (now - self.ttl_seconds,))
+        count = conn.execute("SELECT COUNT(*) FROM hazard_cache").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM hazard_cache WHERE key IN "
+                "(SELECT key FROM hazard_cache ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,),
+            )
+
+    def get_or_fetch(self, key, fetch):
+        """Cached value for key, calling fetch() once on a miss.
+
+        fetch() may raise to signal a failed lookup; failures are not cached
+        and are re-raised to every caller waiting on the same key.
+        """
+        value = self.get(key)
+        if value is not None:
+            self._observe("hit")
+            return value
+
+        with self._lock:
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._pending[key] = _Pending()
+
+        if not owner:
+            self._observe("coalesced")
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        self._observe("miss")
+        try:
+            pending.value = fetch()
+            self.put(key, pending.value)
+            return pending.value
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+            pending.done.set()
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM hazard_cache")
+
+    def stats(self):
+        with self._connect() as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM hazard_cache").fetchone()[0]
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "ttl_seconds": self.ttl_seconds,
+            "max_entries": self.max_entries,
+            "cell_deg": self.cell_deg,
+        }
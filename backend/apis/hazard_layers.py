@@ -0,0 +1,100 @@
+"""Gridded hazard layers (flood depth, wind speed) read through memory maps.
+
+A layer is a 2-D .npy raster plus a .json sidecar with the same base name
+in HAZARD_LAYER_DIR, e.g. flood.npy + flood.json:
+
+    {"peril": "Flood", "origin_lat": 40.0, "origin_lon": -20.0,
+     "cell_deg": 0.01, "nodata": -9999, "thresholds": [0.5, 1.5],
+     "bands": ["Low", "Moderate", "High"]}
+
+origin_lat/origin_lon are the north-west corner of the top-left cell, rows
+run south. Rasters are opened with np.load(mmap_mode="r"), so only the
+pages holding sampled cells are read from disk and several continent-sized
+layers can be open at once. GeoTIFFs can be converted once with GDAL or
+rasterio (read band 1, np.save, copy the geotransform into the sidecar).
+"""
+import json
+import os
+
+import numpy as np
+
+DEFAULT_LAYER_DIR = os.getenv("HAZARD_LAYER_DIR", "")
+
+# Default bands when the sidecar has none: flood depth in metres, wind speed in m/s
+DEFAULT_THRESHOLDS = {
+    "Flood": ([0.5, 1.5], ["Low", "Moderate", "High"]),
+    "Typhoon": ([33.0, 50.0], ["Low", "Moderate", "High"]),
+}
+
+
+class HazardLayer:
+    def __init__(self, raster_path, meta):
+        self.path = raster_path
+        self.values = np.load(raster_path, mmap_mode="r")
+        if self.values.ndim != 2:
+            raise ValueError(f"{raster_path}: expected a 2-D raster, got shape {self.values.shape}")
+        self.peril = meta["peril"]
+        self.origin_lat = float(meta["origin_lat"])
+        self.origin_lon = float(meta["origin_lon"])
+        self.cell_lat = float(meta.get("cell_lat", meta.get("cell_deg")))
+        self.cell_lon = float(meta.get("cell_lon", meta.get("cell_deg")))
+        self.nodata = meta.get("nodata")
+        default_thresholds, default_bands = DEFAULT_THRESHOLDS.get(self.peril, ([], ["Low"]))
+        self.thresholds = np.asarray(meta.get("thresholds", default_thresholds), dtype=float)
+        self.bands = list(meta.get("bands", default_bands))
+        if len(self.bands) != len(self.thresholds) + 1:
+            raise ValueError(f"{raster_path}: need len(thresholds) + 1 bands")
+
+    def sample(self, lats, lons):
+        """Raster values at the given points (NaN outside the raster or on nodata)."""
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        rows = np.floor((self.origin_lat - lats) / self.cell_lat).astype(np.int64)
+        cols = np.floor((lons - self.origin_lon) / self.cell_lon).astype(np.int64)
+        n_rows, n_cols = self.values.shape
+        inside = (rows >= 0) & (rows < n_rows) & (cols >= 0) & (cols < n_cols)
+        out = np.full(len(lats), np.nan)
+        if inside.any():
+            # One fancy-index gather; the memmap only faults in the touched pages
+            gathered = np.asarray(self.values[rows[inside], cols[inside]], dtype=float)
+            if self.nodata is not None:
+                gathered[gathered == float(self.nodata)] = np.nan
+            out[inside] = gathered
+        return out
+
+    def classify(self, values):
+        """Band label per value; None where the value is NaN."""
+        values = np.asarray(values, dtype=float)
+        index = np.searchsorted(self.thresholds, np.nan_to_num(values, nan=0.0), side="right")
+        return [None if v != v else self.bands[i] for v, i in zip(values, index)]
+
+    def bands_at(self, lats, lons):
+        return self.classify(self.sample(lats, lons))
+
+
+def load_layers(directory=DEFAULT_LAYER_DIR):
+    """{peril: HazardLayer} for every .npy with a .json sidecar in directory."""
+    layers = {}
+    if not directory or not os.path.isdir(directory):
+        return layers
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".npy"):
+            continue
+        raster_path = os.path.join(directory, name)
+        meta_path = raster_path[:-len(".npy")] + ".json"
+        if not os.path.isfile(meta_path):
+            print(f"[WARN] Hazard layer {name} has no .json sidecar, skipped")
+            continue
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            meta.setdefault("peril", name[:-len(".npy")].capitalize())
+            layer = HazardLayer(raster_path, meta)
+        except Exception as e:
+            print(f"[WARN] Failed to load hazard layer {name}: {e}")
+            continue
+        if layer.peril in layers:
+            print(f"[WARN] Several layers for {layer.peril}; using {name}")
+        layers[layer.peril] = layer
+        print(f"[HAZARD] {layer.peril} layer {name} {layer.values.shape} (memory-mapped)")
+    return layers
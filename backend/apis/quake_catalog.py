@@ -0,0 +1,208 @@
+"""Offline earthquake catalog with a grid index for batch hazard scoring.
+
+Loads USGS exports from disk (the CSV or GeoJSON that
+earthquake.usgs.gov/fdsnws/event/1/query or the feed pages produce) into
+numpy arrays and buckets events into cells of `cell_deg` degrees. A radius
+query only computes haversine distances against events in the cells the
+search circle can touch, and queries are grouped by cell so each group is
+one vectorized distance computation.
+
+QUAKE_CATALOG_PATH may be a single file or a directory of exports; refresh()
+reloads when a file is added or modified, deduplicating events by ID.
+"""
+import csv
+import json
+import math
+import os
+import threading
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+DEFAULT_CATALOG_PATH = os.getenv("QUAKE_CATALOG_PATH", "")
+DEFAULT_CELL_DEG = 1.0
+CATALOG_EXTENSIONS = (".csv", ".json", ".geojson")
+
+
+def _read_csv(path):
+    events = []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            try:
+                lat, lon = float(row["latitude"]), float(row["longitude"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            try:
+                mag = float(row.get("mag") or "nan")
+            except ValueError:
+                mag = float("nan")
+            events.append((row.get("id") or f"{path}:{len(events)}", lat, lon, mag))
+    return events
+
+
+def _read_geojson(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    events = []
+    for feature in data.get("features", []):
+        coords = (feature.get("geometry") or {}).get("coordinates") or []
+        if len(coords) < 2:
+            continue
+        mag = (feature.get("properties") or {}).get("mag")
+        events.append((
+            feature.get("id") or f"{path}:{len(events)}",
+            float(coords[1]), float(coords[0]),
+            float(mag) if isinstance(mag, (int, float)) else float("nan"),
+        ))
+    return events
+
+
+def read_catalog_file(path):
+    """[(event_id, lat, lon, mag)] from a USGS CSV or GeoJSON export."""
+    if path.lower().endswith(".csv"):
+        return _read_csv(path)
+    return _read_geojson(path)
+
+
+def _catalog_files(path):
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.lower().endswith(CATALOG_EXTENSIONS)
+        )
+    return [path] if os.path.isfile(path) else []
+
+
+class EarthquakeCatalog:
+    def __init__(self, path=DEFAULT_CATALOG_PATH, cell_deg=DEFAULT_CELL_DEG):
+        self.path = path
+        self.cell_deg = cell_deg
+        self._n_lon = int(round(360 / cell_deg))
+        self._lock = threading.Lock()
+        self._file_state = {}
+        self._events = {}  # event_id -> (lat, lon, mag)
+        self._set_arrays([])
+        if path:
+            self.refresh()
+
+    def __len__(self):
+        return len(self.lat)
+
+    # --------------------------
+    # Loading and index
+    # --------------------------
+
+    def refresh(self):
+        """Load new or modified catalog files; returns the number of files read."""
+        changed = []
+        for path in _catalog_files(self.path):
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            if self._file_state.get(path) != mtime:
+                changed.append((path, mtime))
+        if not changed:
+            return 0
+        events = dict(self._events)
+        for path, mtime in changed:
+            try:
+                for event_id, lat, lon, mag in read_catalog_file(path):
+                    events[event_id] = (lat, lon, mag)
+            except Exception as e:
+                print(f"[WARN] Failed to read earthquake catalog {path}: {e}")
+                continue
+            self._file_state[path] = mtime
+        self.add_events(events, replace=True)
+        print(f"[CATALOG] {len(self)} earthquakes indexed from {len(self._file_state)} file(s)")
+        return len(changed)
+
+    def add_events(self, events, replace=False):
+        """Merge {event_id: (lat, lon, mag)} into the catalog and rebuild the index."""
+        merged = dict(events) if replace else {**self._events, **events}
+        rows = list(merged.values())
+        with self._lock:
+            self._events = merged
+            self._set_arrays(rows)
+
+    def _cell_keys(self, lat_cells, lon_cells):
+        return lat_cells.astype(np.int64) * self._n_lon + lon_cells.astype(np.int64)
+
+    def _cells(self, lat, lon):
+        return (
+            np.floor((np.asarray(lat) + 90.0) / self.cell_deg).astype(np.int64),
+            np.mod(np.floor((np.asarray(lon) + 180.0) / self.cell_deg).astype(np.int64), self._n_lon),
+        )
+
+    def _set_arrays(self, rows):
+        data = np.array(rows, dtype=float).reshape(-1, 3)
+        lat_cells, lon_cells = self._cells(data[:, 0], data[:, 1])
+        keys = self._cell_keys(lat_cells, lon_cells)
+        order = np.argsort(keys, kind="stable")
+        # Events sorted by cell; a cell's events are keys[start:end] via searchsorted
+        self.lat = data[order, 0]
+        self.lon = data[order, 1]
+        self.mag = data[order, 2]
+        self._lat_rad = np.radians(self.lat)
+        self._lon_rad = np.radians(self.lon)
+        self._keys = keys[order]
+
+    # --------------------------
+    # Queries
+    # --------------------------
+
+    def _candidates(self, lat_cell, lon_cells):
+        """Indices of events in the given lon cells of one lat cell row."""
+        lon_cells = np.unique(np.mod(lon_cells, self._n_lon))
+        keys = self._cell_keys(np.full(len(lon_cells), lat_cell), lon_cells)
+        starts = np.searchsorted(self._keys, keys, side="left")
+        ends = np.searchsorted(self._keys, keys, side="right")
+        return [np.arange(s, e) for s, e in zip(starts, ends) if e > s]
+
+    def radius_stats(self, lats, lons, radius_km=100.0):
+        """(count, mean magnitude) of catalog events within radius_km of each point.
+
+        Mean is NaN where no event with a magnitude is in range.
+        """
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        counts = np.zeros(len(lats), dtype=np.int64)
+        means = np.full(len(lats), np.nan)
+        if len(lats) == 0 or len(self.lat) == 0:
+            return counts, means
+
+        lat_span = int(math.ceil(math.degrees(radius_km / EARTH_RADIUS_KM) / self.cell_deg))
+        lat_cells, lon_cells = self._cells(lats, lons)
+        query_keys = self._cell_keys(lat_cells, lon_cells)
+        unique_keys, inverse = np.unique(query_keys, return_inverse=True)
+        groups = np.split(np.argsort(inverse, kind="stable"), np.cumsum(np.bincount(inverse))[:-1])
+        with self._lock:
+            ev_lat, ev_lon, ev_mag = self._lat_rad, self._lon_rad, self.mag
+            for members in groups:
+                lat_cell, lon_cell = lat_cells[members[0]], lon_cells[members[0]]
+                cell_lat = (lat_cell + 0.5) * self.cell_deg - 90.0
+                # Longitude span widens towards the poles
+                max_abs_lat = min(89.9, abs(cell_lat) + self.cell_deg / 2 + lat_span * self.cell_deg)
+                lon_span = int(math.ceil(lat_span / max(math.cos(math.radians(max_abs_lat)), 1e-3)))
+                lon_span = min(lon_span, int(round(180 / self.cell_deg)))
+                idx = []
+                for row in range(lat_cell - lat_span, lat_cell + lat_span + 1):
+                    idx.extend(self._candidates(row, np.arange(lon_cell - lon_span, lon_cell + lon_span + 1)))
+                if not idx:
+                    continue
+                idx = np.concatenate(idx)
+
+                # Haversine distance, queries in this cell x candidate events
+                q_lat = np.radians(lats[members])[:, None]
+                q_lon = np.radians(lons[members])[:, None]
+                a = (np.sin((ev_lat[idx] - q_lat) / 2) ** 2
+                     + np.cos(q_lat) * np.cos(ev_lat[idx]) * np.sin((ev_lon[idx] - q_lon) / 2) ** 2)
+                within = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0))) <= radius_km
+
+                mags = ev_mag[idx]
+                has_mag = within & ~np.isnan(mags)
+                counts[members] = within.sum(axis=1)
+                n_mag = has_mag.sum(axis=1)
+                total = np.where(has_mag, mags, 0.0).sum(axis=1)
+                means[members] = np.where(n_mag > 0, total / np.maximum(n_mag, 1), np.nan)
+        return counts, means
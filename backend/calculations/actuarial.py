@@ -0,0 +1,91 @@
+"""Vectorized actuarial kernel shared by enrichment (apis/code.py) and the calculator.
+
+All formulas work on whole columns (numpy float64 arrays), so a batch of a
+million risks is a handful of array operations instead of a Python call per
+cell. Amounts are converted with a per-row FX rate vector; ratios whose
+denominator is zero come out as 0.
+"""
+import numpy as np
+
+# Numeric inputs, in the order actuarial_metrics takes them
+NUMERIC_INPUTS = (
+    "TSI_Original_Currency", "Premium_Original_Currency",
+    "Paid_Losses_3_Years", "Outstanding_Reserves_3_Years", "Recoveries_3_Years",
+    "Earned_Premium_3_Years", "Share_Offered_Pct", "PML_Pct", "Retention_of_Cedant_Pct",
+)
+
+OUTPUT_COLUMNS = (
+    "TSI_KES", "Premium_KES", "Premium_Rate_Percentage", "Premium_Rate_Permille",
+    "Loss_Ratio_Pct", "Accepted_Premium_KES", "Accepted_Liability_KES",
+    "PML_Amount_KES", "Retention_Amount_KES",
+)
+
+
+def _to_float(value):
+    if value is None:
+        return 0.0
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value)
+    s = str(value).strip().replace(",", "")
+    if s == "" or s.lower() in {"nan", "none", "null"}:
+        return 0.0
+    try:
+        return float(s)
+    except ValueError:
+        return 0.0
+
+
+def coerce(values):
+    """float64 array from a column of raw input values; None, blanks, NaN and junk become 0.
+
+    Strings may carry thousands separators ("1,234.5"), as in the slips.
+    """
+    try:
+        array = np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        array = np.fromiter((_to_float(v) for v in values), dtype=np.float64, count=len(values))
+    return np.where(np.isnan(array), 0.0, array)
+
+
+def _ratio(numerator, denominator, scale):
+    out = np.zeros(np.broadcast(numerator, denominator).shape)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out * scale
+
+
+def actuarial_metrics(tsi, premium, paid, outstanding, recoveries, earned,
+                      share_pct, pml_pct, retention_pct, fx_rate=1.0):
+    """Derived columns (OUTPUT_COLUMNS) for coerced input arrays.
+
+    fx_rate is the original-currency -> KES rate per row (scalar or array);
+    NaN marks a failed conversion. Like the calculator, rates and accepted
+    amounts then treat the KES amount as 0 while PML/retention stay NaN.
+    """
+    tsi_kes = tsi * fx_rate
+    premium_kes = premium * fx_rate
+    tsi_known = np.nan_to_num(tsi_kes, nan=0.0)
+    premium_known = np.nan_to_num(premium_kes, nan=0.0)
+    return {
+        "TSI_KES": tsi_kes,
+        "Premium_KES": premium_kes,
+        "Premium_Rate_Percentage": _ratio(premium_known, tsi_known, 100.0),
+        "Premium_Rate_Permille": _ratio(premium_known, tsi_known, 1000.0),
+        "Loss_Ratio_Pct": _ratio(paid + outstanding - recoveries, earned, 100.0),
+        "Accepted_Premium_KES": premium_known * (share_pct / 100.0),
+        "Accepted_Liability_KES": tsi_known * (share_pct / 100.0),
+        "PML_Amount_KES": tsi_kes * (pml_pct / 100.0),
+        "Retention_Amount_KES": tsi_kes * (retention_pct / 100.0),
+    }
+
+
+def metrics_for_columns(columns, fx_rate=1.0):
+    """actuarial_metrics over a mapping of input column name -> values (missing columns are 0)."""
+    n = max((len(v) for v in columns.values()), default=0)
+    inputs = [coerce(columns[name]) if name in columns else np.zeros(n) for name in NUMERIC_INPUTS]
+    return actuarial_metrics(*inputs, fx_rate=fx_rate)
+
+
+def metrics_for_records(records, fx_rate=1.0):
+    """actuarial_metrics over a list of record dicts."""
+    columns = {name: [r.get(name) for r in records] for name in NUMERIC_INPUTS}
+    return metrics_for_columns(columns, fx_rate=fx_rate)
@@ -0,0 +1,120 @@
+"""Benchmark FacultativeReinsuranceCalculator.calculate_all_metrics on synthetic risks.
+
+Compares the columnar implementation with the previous row-wise one
+(seven df.apply(axis=1) passes with _safe_float per cell and a currency
+conversion per row) and checks that both give the same numbers.
+
+    python calculations/benchmark.py                      # 10k, 100k, 1M rows
+    python calculations/benchmark.py --rows 50000 --rowwise-max 0
+
+FX rates come from the calculator's fallback table, so no network calls are
+made; the columnar run also does the dated (Period_Start) history lookup. The row-wise run is skipped above --rowwise-max rows (it takes
+minutes at 1M).
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(CURRENT_DIR)
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from calculations import actuarial
+from calculations import calculator as calc_module
+from calculations import fx_rates
+
+
+def synthetic_risks(n, seed=0):
+    """n risks with the input columns the calculator reads (some zero TSI / earned premium)."""
+    rng = np.random.default_rng(seed)
+    currencies = np.array(["KES", "USD", "EUR", "GBP", "EGP", "PHP", "INR", "ZAR", "QAR", "TZS", "UGX"])
+    tsi = rng.lognormal(18, 2, n).round(2)
+    tsi[rng.random(n) < 0.01] = 0.0
+    earned = rng.lognormal(14, 1.5, n).round(2)
+    earned[rng.random(n) < 0.05] = 0.0
+    return pd.DataFrame({
+        "Original_Currency": currencies[rng.integers(0, len(currencies), n)],
+        "TSI_Original_Currency": tsi,
+        "Premium_Original_Currency": (tsi * rng.uniform(0.0005, 0.01, n)).round(2),
+        "Paid_Losses_3_Years": (earned * rng.uniform(0, 0.8, n)).round(2),
+        "Outstanding_Reserves_3_Years": (earned * rng.uniform(0, 0.3, n)).round(2),
+        "Recoveries_3_Years": (earned * rng.uniform(0, 0.1, n)).round(2),
+        "Earned_Premium_3_Years": earned,
+        "Share_Offered_Pct": rng.uniform(1, 50, n).round(2),
+        "PML_Pct": rng.uniform(10, 100, n).round(2),
+        "Retention_of_Cedant_Pct": rng.uniform(5, 50, n).round(2),
+        "Period_Start": (np.datetime64("2023-01-01") + rng.integers(0, 1095, n)).astype(str),
+    })
+
+
+def calculate_all_metrics_rowwise(calculator, df):
+    """The pre-vectorization calculate_all_metrics, kept as the reference."""
+    df = calc_module._coerce_numeric_columns(df, list(actuarial.NUMERIC_INPUTS))
+    df['TSI_KES'] = df.apply(lambda row: calculator.convert_currency(
+        row['TSI_Original_Currency'], row['Original_Currency'], 'KES'), axis=1)
+    df['Premium_KES'] = df.apply(lambda row: calculator.convert_currency(
+        row['Premium_Original_Currency'], row['Original_Currency'], 'KES'), axis=1)
+    df['Premium_Rate_Percentage'] = df.apply(lambda row: calculator.calculate_premium_rate_percentage(
+        row['Premium_KES'], row['TSI_KES']), axis=1)
+    df['Premium_Rate_Permille'] = df.apply(lambda row: calculator.calculate_premium_rate_permille(
+        row['Premium_KES'], row['TSI_KES']), axis=1)
+    df['Loss_Ratio_Pct'] = df.apply(lambda row: calculator.calculate_loss_ratio(
+        row['Paid_Losses_3_Years'], row['Outstanding_Reserves_3_Years'],
+        row['Recoveries_3_Years'], row['Earned_Premium_3_Years']), axis=1)
+    df['Accepted_Premium_KES'] = df.apply(lambda row: calculator.calculate_accepted_premium(
+        row['Premium_KES'], row['Share_Offered_Pct']), axis=1)
+    df['Accepted_Liability_KES'] = df.apply(lambda row: calculator.calculate_accepted_liability(
+        row['TSI_KES'], row['Share_Offered_Pct']), axis=1)
+    df['PML_Amount_KES'] = df['TSI_KES'] * (df['PML_Pct'] / 100)
+    df['Retention_Amount_KES'] = df['TSI_KES'] * (df['Retention_of_Cedant_Pct'] / 100)
+    return df
+
+
+def offline_calculator():
+    calculator = calc_module.FacultativeReinsuranceCalculator()
+    fx = calculator.fx
+    quotes = fx_rates.quotes_from_kes_rates(fx.fallback_rates)
+    fx.table = fx_rates.FxRateTable(lambda: quotes, cache_dir=tempfile.mkdtemp(prefix="fx-bench-"))
+    return calculator
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def run(rows, rowwise_max):
+    calculator = offline_calculator()
+    print(f"{'rows':>10} {'row-wise s':>12} {'columnar s':>12} {'speedup':>9} {'max rel diff':>13}")
+    for n in rows:
+        df = synthetic_risks(n)
+        columnar, columnar_s = _timed(calculator.calculate_all_metrics, df.copy())
+        if n > rowwise_max:
+            print(f"{n:>10} {'skipped':>12} {columnar_s:>12.3f} {'-':>9} {'-':>13}")
+            continue
+        rowwise, rowwise_s = _timed(calculate_all_metrics_rowwise, calculator, df.copy())
+        diff = 0.0
+        for column in actuarial.OUTPUT_COLUMNS:
+            a, b = rowwise[column].to_numpy(dtype=float), columnar[column].to_numpy(dtype=float)
+            diff = max(diff, float(np.max(np.abs(a - b) / np.maximum(np.abs(a), 1.0), initial=0.0)))
+        print(f"{n:>10} {rowwise_s:>12.3f} {columnar_s:>12.3f} {rowwise_s / columnar_s:>8.0f}x {diff:>13.2e}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark calculate_all_metrics")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--rowwise-max", type=int, default=100_000,
+                        help="Skip the row-wise reference above this many rows")
+    args = parser.parse_args(argv)
+    run(args.rows, args.rowwise_max)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,14 @@ from urllib.request import urlopen, Request
 from urllib.parse import urlparse, urlencode
 import requests
 
+try:
+    from calculations import actuarial, fx_rates, jsonio, streaming
+except ImportError:  # run as a script from calculations/
+    import actuarial
+    import fx_rates
+    import jsonio
+    import streaming
+
 # Optional .env loading if python-dotenv is available
 try:
     from dotenv import load_dotenv  # type: ignore
@@ -45,6 +53,10 @@ def _coerce_numeric_columns(df: pd.DataFrame, columns: list[str]) -> pd.DataFram
     """Coerce selected columns to numeric, replacing invalids with 0."""
     for col in columns:
         if col in df.columns:
+            if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col]):
+                # Already numeric: only missing values need filling, no string round-trip
+                df[col] = df[col].fillna(0)
+                continue
             # Remove thousands separators, spaces, and coerce
             df[col] = (
                 pd.to_numeric(
@@ -62,8 +74,7 @@ def _coerce_numeric_columns(df: pd.DataFrame, columns: list[str]) -> pd.DataFram
 class OandaExchangeRates:
     def __init__(self, api_key: str):
         self.api_key = api_key
-        self.base_url = "https://exchange-rates-api.oanda.com/v2"
-        self._cache = {}
+        self.base_url = fx_rates.DEFAULT_BASE_URL
         
         # Fallback exchange rates (approximate rates to KES as of 2024)
         self.fallback_rates = {
@@ -78,6 +89,8 @@ class OandaExchangeRates:
             'TZS': 0.065,  # 1 TZS = 0.065 KES
             'UGX': 0.04,   # 1 UGX = 0.04 KES
         }
+        # Daily quotes shared by every instance in the process, refreshed in the background
+        self.table = fx_rates.shared_table(api_key, self.base_url, self.fallback_rates)
 
     def _get_fallback_rate(self, from_currency: str, to_currency: str) -> float:
         """Get fallback exchange rate when API fails"""
@@ -95,8 +108,8 @@ class OandaExchangeRates:
 
     def _get_latest_rate(self, from_currency: str, to_currency: str) -> float:
         """
-        Get the latest FX rate using OANDA Exchange Rates API (end-of-day).
-        Falls back to static rates if API fails.
+        Get the latest FX rate from the shared daily rate table (fx_rates.py).
+        Falls back to static rates for currencies the table does not quote.
         """
         from_currency = (from_currency or '').upper()
         to_currency = (to_currency or '').upper()
@@ -104,41 +117,25 @@ class OandaExchangeRates:
             raise ValueError('Invalid currency symbols')
         if from_currency == to_currency:
             return 1.0
+        return self.table.rate(from_currency, to_currency)
 
-        cache_key = (from_currency, to_currency)
-        if cache_key in self._cache:
-            return self._cache[cache_key]
+    def rates(self, from_currencies, to_currency: str = 'KES'):
+        """Vectorized _get_latest_rate: rate per element, NaN where the currency is missing."""
+        return self.table.rates(from_currencies, to_currency)
 
-        # Try OANDA API first
-        try:
-            url = f"{self.base_url}/rates/latest.json"
-            params = {
-                "api_key": self.api_key,
-                "base": from_currency
-            }
-            resp = requests.get(url, params=params, timeout=10)
-            
-            if resp.status_code == 200:
-                data = resp.json()
-                if "quotes" in data and to_currency in data["quotes"]:
-                    rate = float(data["quotes"][to_currency])
-                    self._cache[cache_key] = rate
-                    return rate
-        except Exception:
-            pass  # Fall through to fallback rates
-
-        # Use fallback rates if API fails
-        print(f"🔄 Using fallback rate for {from_currency}->{to_currency}")
-        rate = self._get_fallback_rate(from_currency, to_currency)
-        self._cache[cache_key] = rate
-        return rate
-
-    def convert(self, amount: float, from_currency: str, to_currency: str) -> float:
+    def rates_on(self, from_currencies, dates, to_currency: str = 'KES'):
+        """Rate per element as of its date from the local history, else the latest rate."""
+        return self.table.rates_on(from_currencies, dates, to_currency)
+
+    def convert(self, amount: float, from_currency: str, to_currency: str, on_date=None) -> float:
         """
-        Convert an amount from one currency to another.
+        Convert an amount from one currency to another, at the rate on `on_date` when given.
         """
         try:
-            rate = self._get_latest_rate(from_currency, to_currency)
+            if on_date is None:
+                rate = self._get_latest_rate(from_currency, to_currency)
+            else:
+                rate = float(self.rates_on([from_currency], [on_date], to_currency)[0])
             return _safe_float(amount) * rate
         except Exception as e:
             print(f"⚠️ FX conversion failed {from_currency}->{to_currency}: {e}")
@@ -158,8 +155,8 @@ class FacultativeReinsuranceCalculator:
         self.oanda_exr_base_url = os.getenv('OANDA_EXR_BASE_URL', 'https://exchange-rates-api.oanda.com/v2').rstrip('/')
         # Initialize FX helper
         self.fx = OandaExchangeRates(self.oanda_exr_api_key)
-        # Simple in-memory cache for FX pairs: (from,to) -> rate (kept for backward compatibility)
-        self._fx_cache = {}
+        # Risks are converted at the rate on this date field (empty: always today's rate)
+        self.fx_date_field = os.getenv('FX_DATE_FIELD', 'Period_Start').strip()
     
     def _get_latest_rate(self, from_currency: str, to_currency: str) -> float:
         """Deprecated: use self.fx._get_latest_rate instead. Retained for compatibility."""
@@ -216,74 +213,49 @@ class FacultativeReinsuranceCalculator:
         accepted_share_pct = _safe_float(accepted_share_pct)
         return tsi * (accepted_share_pct / 100)
     
-    def convert_currency(self, amount, from_currency, to_currency='KES'):
-        """Convert currency using OANDA Exchange Rates API v2 latest end-of-day rate via helper class."""
+    def convert_currency(self, amount, from_currency, to_currency='KES', on_date=None):
+        """Convert currency at the OANDA rate on `on_date` (historical store), else the latest end-of-day rate."""
         if from_currency == to_currency:
             return _safe_float(amount)
         
         from_currency = (from_currency or '').upper()
         to_currency = (to_currency or '').upper()
 
-        return self.fx.convert(amount, from_currency, to_currency)
+        return self.fx.convert(amount, from_currency, to_currency, on_date=on_date)
     
+    def fx_rates_to_kes(self, currencies, dates=None):
+        """Per-row original-currency -> KES rate (NaN if missing).
+
+        With dates, each row uses the rate on its own date where the history
+        has one, else today's rate from the shared daily table.
+        """
+        if dates is None:
+            return self.fx.rates(currencies, 'KES')
+        return self.fx.rates_on(currencies, dates, 'KES')
+
     def calculate_all_metrics(self, df):
-        """Calculate all derived metrics for the DataFrame"""
+        """Calculate all derived metrics for the DataFrame (vectorized, see actuarial.py)"""
         
         # First, coerce known numeric columns safely to numeric with 0 defaults
-        numeric_cols = [
-            'TSI_Original_Currency', 'Premium_Original_Currency',
-            'Paid_Losses_3_Years', 'Outstanding_Reserves_3_Years', 'Recoveries_3_Years',
-            'Earned_Premium_3_Years', 'Share_Offered_Pct', 'PML_Pct', 'Retention_of_Cedant_Pct'
-        ]
+        numeric_cols = list(actuarial.NUMERIC_INPUTS)
         df = _coerce_numeric_columns(df, numeric_cols)
         
-        # Convert currencies to KES
-        df['TSI_KES'] = df.apply(lambda row: self.convert_currency(
-            row['TSI_Original_Currency'], 
-            row['Original_Currency'], 
-            'KES'
-        ), axis=1)
-        
-        df['Premium_KES'] = df.apply(lambda row: self.convert_currency(
-            row['Premium_Original_Currency'], 
-            row['Original_Currency'], 
-            'KES'
-        ), axis=1)
-        
-        # Calculate premium rates
-        df['Premium_Rate_Percentage'] = df.apply(lambda row: self.calculate_premium_rate_percentage(
-            row['Premium_KES'], row['TSI_KES']
-        ), axis=1)
-        
-        df['Premium_Rate_Permille'] = df.apply(lambda row: self.calculate_premium_rate_permille(
-            row['Premium_KES'], row['TSI_KES']
-        ), axis=1)
-        
-        # Calculate loss ratios
-        df['Loss_Ratio_Pct'] = df.apply(lambda row: self.calculate_loss_ratio(
-            row['Paid_Losses_3_Years'],
-            row['Outstanding_Reserves_3_Years'],
-            row['Recoveries_3_Years'],
-            row['Earned_Premium_3_Years']
-        ), axis=1)
-        
-        # Calculate accepted amounts
-        df['Accepted_Premium_KES'] = df.apply(lambda row: self.calculate_accepted_premium(
-            row['Premium_KES'], row['Share_Offered_Pct']
-        ), axis=1)
-        
-        df['Accepted_Liability_KES'] = df.apply(lambda row: self.calculate_accepted_liability(
-            row['TSI_KES'], row['Share_Offered_Pct']
-        ), axis=1)
-        
-        # Calculate PML amounts
-        df['PML_Amount_KES'] = _safe_float(1.0) * df['TSI_KES'] * (df['PML_Pct'] / 100)
-        
-        # Calculate retention amounts
-        df['Retention_Amount_KES'] = _safe_float(1.0) * df['TSI_KES'] * (df['Retention_of_Cedant_Pct'] / 100)
+        # Convert currencies to KES and derive rates, ratios and shares column-wise
+        dates = df[self.fx_date_field] if self.fx_date_field in df.columns else None
+        fx_rate = self.fx_rates_to_kes(df['Original_Currency'], dates)
+        inputs = [df[col].to_numpy(dtype=float) for col in numeric_cols]
+        for column, values in actuarial.actuarial_metrics(*inputs, fx_rate=fx_rate).items():
+            df[column] = values
         
         return df
     
+    def calculate_stream(self, input_source, output_path, chunk_size=streaming.DEFAULT_CHUNK_SIZE, lines=None):
+        """Calculate a large JSON / JSON Lines input in fixed-size chunks, streaming results to output_path.
+
+        Memory stays bounded by chunk_size; returns the throughput report (see streaming.py).
+        """
+        return streaming.stream_metrics(self, input_source, output_path, chunk_size=chunk_size, lines=lines)
+    
     def generate_summary_report(self, df):
         """Generate a summary report of the calculations"""
         
@@ -333,14 +305,22 @@ def _is_url(path_or_url: str) -> bool:
 
 def load_json_input(input_source: str) -> pd.DataFrame:
     """Load JSON input from a local file path or HTTP(S) URL into a DataFrame.
-    Accepts list-of-records or column-oriented dicts."""
+    Accepts list-of-records, column-oriented dicts or JSON Lines; records
+    appended to a local file's .jsonl journal are included."""
     if _is_url(input_source):
         with urlopen(input_source) as response:
-            data = json.loads(response.read().decode('utf-8'))
+            data = jsonio.loads(response.read())
     else:
-        with open(input_source, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = jsonio.load(input_source)
+        if isinstance(data, list):
+            data += jsonio.load_journal(input_source)
+
+    return records_to_dataframe(data)
+
 
+def records_to_dataframe(data) -> pd.DataFrame:
+    """Build a DataFrame from already-parsed input data.
+    Accepts list-of-records or column-oriented dicts, like load_json_input."""
     if isinstance(data, dict):
         # Support either {"records": [...]} or column-oriented {col: [..]}
         if 'records' in data and isinstance(data['records'], list):
@@ -353,9 +333,20 @@ def load_json_input(input_source: str) -> pd.DataFrame:
     raise ValueError('Unsupported JSON structure for input data')
 
 
-def save_json_output(df: pd.DataFrame, output_path: str) -> None:
+def dataframe_to_records(df: pd.DataFrame) -> list:
+    """Convert a DataFrame back to plain JSON-compatible records.
+    Missing values become None, matching what save_json_output would write."""
+    return df.astype(object).where(pd.notna(df), None).to_dict(orient='records')
+
+
+def save_json_output(df: pd.DataFrame, output_path: str, pretty=None) -> None:
+    """Write the records compactly (pretty=True or JSON_PRETTY=1 indents), as JSON Lines for .jsonl paths."""
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    df.to_json(output_path, orient='records', indent=2)
+    if jsonio.is_lines_path(output_path):
+        df.to_json(output_path, orient='records', lines=True)
+        return
+    pretty = jsonio.PRETTY if pretty is None else pretty
+    df.to_json(output_path, orient='records', indent=2 if pretty else None)
 
 
 # Main execution
@@ -371,6 +362,11 @@ if __name__ == "__main__":
     input_source = os.getenv('INPUT_JSON', default_input)
     output_path = os.getenv('OUTPUT_JSON', default_output)
 
+    # Large bordereaux: stream in chunks instead of loading the whole file
+    if os.getenv('CALC_CHUNK_SIZE') or streaming.is_lines_path(input_source):
+        calculator.calculate_stream(input_source, output_path)
+        raise SystemExit(0)
+
     # Load input data
     print(f"Loading input data from: {input_source}")
     df = load_json_input(input_source)
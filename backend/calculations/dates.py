@@ -0,0 +1,35 @@
+"""Policy date parsing shared by the FX history, the decision store and the in-force index.
+
+Slips give Period_Start/Period_End in several layouts ("2025-09-20",
+"20/09/2025", "20 September 2025", ...) and sometimes as timestamps
+("20/09/2025 00:00", "20 September 2025 08:30", "2025-09-20T00:00:00").
+Everything that reads a policy date goes through parse_date so a risk gets
+the same date everywhere.
+"""
+from datetime import date, datetime
+
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d", "%d %B %Y", "%d %b %Y", "%B %d, %Y")
+
+
+def parse_date(value):
+    """datetime.date for a date, datetime or slip date string (None if unparseable)."""
+    if value is None or value != value:  # None, NaN, NaT
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    s = str(value).strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(s, fmt).date()
+        except ValueError:
+            continue
+    # Timestamps such as "20/09/2025 00:00" or "20 September 2025 08:30" end in a time
+    head, _, tail = s.rpartition(" ")
+    if head and ":" in tail:
+        return parse_date(head)
+    try:
+        return datetime.fromisoformat(s).date()  # "2025-09-20T00:00:00"
+    except ValueError:
+        return None
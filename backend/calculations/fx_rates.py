@@ -0,0 +1,447 @@
+"""Daily FX rate table shared by every calculator in the process.
+
+One OANDA latest.json call with base=USD returns the quotes for every
+currency; the table keeps them as "units per USD" and crosses any pair
+locally (from -> to = quote[to] / quote[from]), so KES and USD crosses need
+no extra calls. Each day's quotes are written to FX_CACHE_DIR as
+rates-YYYY-MM-DD.json and reloaded at startup, so a restart or a new
+FacultativeReinsuranceCalculator does not hit the API again.
+
+The network is only touched on a cold start with nothing on disk; after
+that a daemon thread refreshes the table in the background (new day, or
+older than FX_REFRESH_SECONDS) while lookups keep serving the last table.
+Currencies the provider does not quote fall back to the static
+KES rates passed in.
+
+FxHistory keeps every day seen (the cached day files plus any rate sheets
+named in FX_HISTORY_PATHS) as sorted date arrays per currency, so a column
+of risks can be converted at the rate in force on their own date (e.g.
+Period_Start) with one binary search per row.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import requests
+
+try:
+    from calculations import dates
+except ImportError:  # run as a script from calculations/
+    import dates
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_DIR = os.getenv("FX_CACHE_DIR", os.path.join(BACKEND_DIR, "cache", "fx"))
+DEFAULT_BASE_URL = os.getenv("OANDA_EXR_BASE_URL", "https://exchange-rates-api.oanda.com/v2").rstrip("/")
+REFRESH_SECONDS = float(os.getenv("FX_REFRESH_SECONDS", str(6 * 3600)))
+TIMEOUT_SECONDS = float(os.getenv("FX_TIMEOUT_SECONDS", "10"))
+QUOTE_BASE = "USD"
+HISTORY_PATHS = [p for p in os.getenv("FX_HISTORY_PATHS", "").split(os.pathsep) if p.strip()]
+
+NO_DAY = np.iinfo(np.int64).min
+
+# observer(result) is called with "hit" when a table is served from the disk
+# cache and "miss" when it has to be fetched (comined/main.py counts these)
+observer = None
+_EPOCH = datetime(1970, 1, 1).date()
+
+
+def _observe(result):
+    if observer is not None:
+        observer(result)
+
+
+def _today():
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def fetch_oanda_quotes(api_key, base_url=DEFAULT_BASE_URL, base=QUOTE_BASE, timeout=TIMEOUT_SECONDS):
+    """{currency: units per `base`} from one OANDA latest.json call."""
+    resp = requests.get(f"{base_url}/rates/latest.json", params={"api_key": api_key, "base": base}, timeout=timeout)
+    resp.raise_for_status()
+    quotes = {}
+    for currency, value in (resp.json().get("quotes") or {}).items():
+        try:
+            quotes[currency.upper()] = float(value)
+        except (TypeError, ValueError):
+            continue
+    if not quotes:
+        raise ValueError("no quotes in OANDA response")
+    quotes[base] = 1.0
+    return quotes
+
+
+def quotes_from_kes_rates(kes_rates, base=QUOTE_BASE):
+    """{currency: units per base} from {currency: KES per unit}, e.g. to seed a table offline."""
+    kes_per_base = kes_rates[base]
+    quotes = {currency: kes_per_base / rate for currency, rate in kes_rates.items() if rate}
+    quotes["KES"] = kes_per_base
+    quotes[base] = 1.0
+    return quotes
+
+
+def _parse_day(value):
+    """Days since 1970-01-01, or NO_DAY when the value is not a date."""
+    day = dates.parse_date(value)
+    return NO_DAY if day is None else (day - _EPOCH).days
+
+
+def _factorize(values):
+    """(codes, uniques) for a column; categoricals reuse their codes instead of hashing every row."""
+    if isinstance(getattr(values, "dtype", None), pd.CategoricalDtype):
+        categorical = values.array if isinstance(values, pd.Series) else values
+        return np.asarray(categorical.codes, dtype=np.intp), list(categorical.categories)
+    return pd.factorize(pd.Series(values, dtype=object))
+
+
+def to_days(values):
+    """int64 day numbers for a column of dates (NO_DAY where unparseable); each distinct value is parsed once."""
+    if pd.api.types.is_datetime64_dtype(getattr(values, "dtype", None)):
+        # Already typed (schema.typed_frame): NaT -> NO_DAY
+        return np.asarray(values, dtype="datetime64[D]").astype(np.int64)
+    codes, uniques = _factorize(values)
+    table = np.array([_parse_day(v) for v in uniques] + [NO_DAY], dtype=np.int64)
+    return table[codes]
+
+
+def kes_rates_from_quotes(quotes):
+    """{currency: KES per unit} from {currency: units per base} (empty without a KES quote)."""
+    kes = quotes.get("KES")
+    if not kes:
+        return {}
+    return {currency: kes / value for currency, value in quotes.items() if value}
+
+
+class FxHistory:
+    """KES-per-unit rates by date for each currency, looked up as of a date."""
+
+    def __init__(self):
+        self._days = {}  # currency -> sorted int64 day numbers
+        self._rates = {}  # currency -> KES per unit on those days
+        self._pending = {}  # currency -> {day: KES per unit} not merged yet
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            self._merge()
+            return sum(len(days) for days in self._days.values())
+
+    def add_rates(self, day, kes_rates):
+        """Record {currency: KES per unit} for one date (replaces what that date had)."""
+        day = _parse_day(day)
+        if day == NO_DAY:
+            raise ValueError("invalid rate date")
+        with self._lock:
+            for currency, rate in kes_rates.items():
+                try:
+                    rate = float(rate)
+                except (TypeError, ValueError):
+                    continue
+                if rate > 0:
+                    self._pending.setdefault(currency.upper(), {})[day] = rate
+
+    def add_quotes(self, day, quotes):
+        """Record one day of provider quotes ({currency: units per USD})."""
+        self.add_rates(day, kes_rates_from_quotes(quotes))
+
+    def _merge(self):
+        """Fold pending dates into the sorted arrays (lock held)."""
+        for currency, pending in self._pending.items():
+            merged = dict(zip(self._days.get(currency, ()), self._rates.get(currency, ())))
+            merged.update(pending)
+            days = np.fromiter(merged, dtype=np.int64, count=len(merged))
+            order = np.argsort(days)
+            self._days[currency] = days[order]
+            self._rates[currency] = np.fromiter(merged.values(), dtype=float, count=len(merged))[order]
+        self._pending = {}
+
+    # --------------------------
+    # Loading
+    # --------------------------
+
+    def load_dir(self, cache_dir):
+        """Add every rates-YYYY-MM-DD.json day file in the directory; returns the number of days."""
+        if not os.path.isdir(cache_dir):
+            return 0
+        loaded = 0
+        for name in sorted(os.listdir(cache_dir)):
+            if name.startswith("rates-") and name.endswith(".json"):
+                try:
+                    loaded += self.load_file(os.path.join(cache_dir, name))
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"[WARN] Skipping FX history {name}: {e}")
+        return loaded
+
+    def load_file(self, path):
+        """Import rates from a file; returns the number of dates added.
+
+        .json: a day file as written by FxRateTable ({"date", "quotes"}), or a
+        list of them. .csv: columns date, currency, rate (KES per unit), as
+        exported from the finance rate sheet.
+        """
+        if path.lower().endswith(".csv"):
+            frame = pd.read_csv(path, dtype={"currency": str})
+            missing = {"date", "currency", "rate"} - set(frame.columns)
+            if missing:
+                raise ValueError(f"missing columns {sorted(missing)}")
+            for day, rows in frame.groupby("date", sort=False):
+                self.add_rates(day, dict(zip(rows["currency"], rows["rate"])))
+            return int(frame["date"].nunique())
+        with open(path, "r", encoding="utf-8") as f:
+            docs = json.load(f)
+        docs = docs if isinstance(docs, list) else [docs]
+        for doc in docs:
+            self.add_quotes(doc["date"], doc["quotes"])
+        return len(docs)
+
+    # --------------------------
+    # Lookups
+    # --------------------------
+
+    def kes_per_unit(self, currencies, days):
+        """KES per unit of each row's currency as of its day (NaN without an earlier rate)."""
+        days = np.asarray(days, dtype=np.int64)
+        codes, uniques = _factorize(currencies)
+        out = np.full(len(codes), np.nan)
+        with self._lock:
+            self._merge()
+            for i, currency in enumerate(uniques):
+                currency = currency.upper() if isinstance(currency, str) else ""
+                if currency == "KES":
+                    out[codes == i] = 1.0
+                    continue
+                series_days = self._days.get(currency)
+                if series_days is None:
+                    continue
+                rows = np.flatnonzero((codes == i) & (days != NO_DAY))
+                # Rate on the latest date on or before the row's date
+                pos = np.searchsorted(series_days, days[rows], side="right") - 1
+                found = pos >= 0
+                out[rows[found]] = self._rates[currency][pos[found]]
+        return out
+
+    def rates(self, from_currencies, dates, to_currency="KES"):
+        """Per-row from -> to rate as of each row's date (NaN where history has no rate)."""
+        days = to_days(dates)
+        from_kes = self.kes_per_unit(from_currencies, days)
+        to_currency = to_currency.upper() if isinstance(to_currency, str) else ""
+        if to_currency == "KES":
+            return from_kes
+        return from_kes / self.kes_per_unit(np.full(len(days), to_currency, dtype=object), days)
+
+    def status(self):
+        with self._lock:
+            self._merge()
+            spans = [(days[0], days[-1]) for days in self._days.values() if len(days)]
+        if not spans:
+            return {"currencies": 0, "first": None, "last": None}
+        return {
+            "currencies": len(spans),
+            "first": str(_EPOCH + timedelta(days=int(min(s for s, _ in spans)))),
+            "last": str(_EPOCH + timedelta(days=int(max(e for _, e in spans)))),
+        }
+
+
+class FxRateTable:
+    def __init__(self, fetch, cache_dir=DEFAULT_CACHE_DIR, fallback_rates=None,
+                 refresh_seconds=REFRESH_SECONDS, base=QUOTE_BASE, history_paths=None):
+        """fetch() returns {currency: units per base}; fallback_rates are KES per unit.
+
+        history_paths are extra rate files (see FxHistory.load_file) loaded
+        with the cached days.
+        """
+        self.fetch = fetch
+        self.cache_dir = cache_dir
+        self.fallback_rates = dict(fallback_rates or {})
+        self.refresh_seconds = refresh_seconds
+        self.base = base
+        self.date = None
+        self.fetched_at = 0.0
+        self.quotes = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._refresher = None
+        self._wake = threading.Event()
+        self._warned = set()
+        self.history = FxHistory()
+        self.history_paths = list(HISTORY_PATHS if history_paths is None else history_paths)
+
+    # --------------------------
+    # Disk cache
+    # --------------------------
+
+    def _path(self, day):
+        return os.path.join(self.cache_dir, f"rates-{day}.json")
+
+    def cached_days(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        return sorted(
+            name[len("rates-"):-len(".json")] for name in os.listdir(self.cache_dir)
+            if name.startswith("rates-") and name.endswith(".json")
+        )
+
+    def _load_day(self, day):
+        with open(self._path(day), "r", encoding="utf-8") as f:
+            doc = json.load(f)
+        return doc["quotes"], float(doc.get("fetched_at", 0.0))
+
+    def _save_day(self, day, quotes, fetched_at):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self._path(day) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"date": day, "base": self.base, "fetched_at": fetched_at, "quotes": quotes}, f)
+        os.replace(tmp_path, self._path(day))
+
+    # --------------------------
+    # Refresh
+    # --------------------------
+
+    def refresh(self):
+        """Fetch today's quotes in one call, persist them and swap them in; True on success."""
+        _observe("miss")
+        try:
+            quotes = self.fetch()
+        except Exception as e:
+            print(f"[WARN] FX refresh failed: {e}")
+            return False
+        day, fetched_at = _today(), time.time()
+        try:
+            self._save_day(day, quotes, fetched_at)
+        except OSError as e:
+            print(f"[WARN] Could not persist FX rates: {e}")
+        with self._lock:
+            self.quotes, self.date, self.fetched_at = quotes, day, fetched_at
+            self._warned = set()
+        self.history.add_quotes(day, quotes)
+        print(f"[FX] {len(quotes)} quotes for {day} (base {self.base})")
+        return True
+
+    def stale(self):
+        return self.date != _today() or time.time() - self.fetched_at > self.refresh_seconds
+
+    def load(self):
+        """Latest table from disk; fetch synchronously only when there is none at all."""
+        with self._lock:
+            if self._loaded:
+                return self
+            self._loaded = True
+            for day in reversed(self.cached_days()):
+                try:
+                    self.quotes, self.fetched_at = self._load_day(day)
+                    self.date = day
+                    break
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"[WARN] Skipping FX cache {day}: {e}")
+        self._load_history()
+        if self.quotes:
+            _observe("hit")
+        else:
+            self.refresh()
+        self.start_background_refresh()
+        return self
+
+    def _load_history(self):
+        days = self.history.load_dir(self.cache_dir)
+        for path in self.history_paths:
+            try:
+                days += self.history.load_file(path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"[WARN] Could not load FX history {path}: {e}")
+        if days:
+            print(f"[FX] History loaded: {days} dated rate sets")
+
+    def start_background_refresh(self):
+        with self._lock:
+            if self._refresher is not None:
+                return
+            self._refresher = threading.Thread(target=self._refresh_loop, name="fx-refresh", daemon=True)
+        self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            if self.stale():
+                self.refresh()
+            # Re-check at least hourly so a new day is picked up soon after midnight UTC
+            self._wake.wait(min(self.refresh_seconds, 3600.0))
+            self._wake.clear()
+
+    # --------------------------
+    # Lookups
+    # --------------------------
+
+    def _kes_per_unit(self, currency):
+        quotes = self.quotes
+        if currency in quotes and "KES" in quotes and quotes[currency]:
+            return quotes["KES"] / quotes[currency]
+        if currency == "KES":
+            return 1.0
+        if currency not in self._warned:
+            self._warned.add(currency)
+            print(f"🔄 Using fallback rate for {currency}->KES")
+        return self.fallback_rates.get(currency, 1.0)
+
+    def rates(self, from_currencies, to_currency="KES"):
+        """Rate vector for a column of source currencies (NaN where the currency is missing).
+
+        Each distinct currency is resolved once; rows pick their rate with one take.
+        """
+        self.load()
+        codes, uniques = _factorize(from_currencies)
+        to_currency = to_currency.upper() if isinstance(to_currency, str) else ""
+        with self._lock:
+            to_kes = self._kes_per_unit(to_currency) if to_currency else np.nan
+            table = []
+            for currency in uniques:
+                currency = currency.upper() if isinstance(currency, str) else ""
+                if not currency or not to_currency:
+                    table.append(np.nan)
+                elif currency == to_currency:
+                    table.append(1.0)
+                else:
+                    table.append(self._kes_per_unit(currency) / to_kes)
+        # Code -1 (missing currency) picks the trailing NaN
+        return np.array(table + [np.nan], dtype=float)[codes]
+
+    def rate(self, from_currency, to_currency="KES"):
+        """Scalar rate for one pair (NaN when a currency is missing)."""
+        self.load()
+        from_currency = from_currency.upper() if isinstance(from_currency, str) else ""
+        to_currency = to_currency.upper() if isinstance(to_currency, str) else ""
+        if not from_currency or not to_currency:
+            return float("nan")
+        if from_currency == to_currency:
+            return 1.0
+        with self._lock:
+            return self._kes_per_unit(from_currency) / self._kes_per_unit(to_currency)
+
+    def rates_on(self, from_currencies, dates, to_currency="KES"):
+        """Per-row rate as of each row's date; rows history cannot price get today's rate."""
+        latest = self.rates(from_currencies, to_currency)
+        dated = self.history.rates(from_currencies, dates, to_currency)
+        return np.where(np.isnan(dated), latest, dated)
+
+    def status(self):
+        return {"date": self.date, "fetched_at": self.fetched_at, "currencies": len(self.quotes),
+                "stale": self.stale(), "cached_days": len(self.cached_days()),
+                "history": self.history.status()}
+
+
+# One table per API key, shared by every calculator in the process
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def shared_table(api_key, base_url=DEFAULT_BASE_URL, fallback_rates=None):
+    with _tables_lock:
+        table = _tables.get((api_key, base_url))
+        if table is None:
+            table = FxRateTable(
+                lambda: fetch_oanda_quotes(api_key, base_url),
+                fallback_rates=fallback_rates,
+            )
+            _tables[(api_key, base_url)] = table
+        return table
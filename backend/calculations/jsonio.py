@@ -0,0 +1,195 @@
+"""Shared JSON I/O for the pipeline files.
+
+- Fast backend: orjson when installed, the standard library otherwise.
+  numpy scalars are written as plain numbers; values orjson cannot encode
+  (e.g. non-string keys) fall back to json.dumps. Reading falls back to
+  json.loads for the NaN/Infinity tokens json.dump writes.
+- Compact by default; pretty=True (or JSON_PRETTY=1) indents by 2.
+- JSON Lines: one record per line, appended in O(1) with a single write.
+  An array file such as sample_input.json gets a sibling journal
+  (sample_input.jsonl) that appends go to; load_records() returns the
+  array followed by the journal, so appending never rewrites the array.
+- Whole-file writes go through a temp file + fsync + rename.
+"""
+import json
+import os
+import tempfile
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+PRETTY = os.getenv("JSON_PRETTY", "").strip().lower() in {"1", "true", "yes"}
+LINES_EXTENSIONS = (".jsonl", ".ndjson")
+
+
+def _pretty(pretty):
+    return PRETTY if pretty is None else pretty
+
+
+def is_lines_path(path):
+    return str(path).lower().endswith(LINES_EXTENSIONS)
+
+
+def _default(value):
+    """numpy scalars (.item()) and record objects (.to_dict(), e.g. schema.RiskRecord) as plain values."""
+    item = getattr(value, "item", None)
+    if item is not None:
+        return item()
+    to_dict = getattr(value, "to_dict", None)
+    if to_dict is not None:
+        return to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj, pretty=None):
+    """UTF-8 JSON for obj (compact unless pretty)."""
+    pretty = _pretty(pretty)
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=_default, option=orjson.OPT_INDENT_2 if pretty else 0)
+        except TypeError:
+            pass
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False, default=_default).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=_default).encode("utf-8")
+
+
+def dumps(obj, pretty=None):
+    return dumps_bytes(obj, pretty).decode("utf-8")
+
+
+def loads(data):
+    """Parse JSON from str or bytes."""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+def atomic_write_bytes(path, payload):
+    """Write bytes to path via temp file + rename; readers see old or new, never partial."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load(path):
+    """Parsed JSON document at path; a JSON Lines file is read as a list of records."""
+    if is_lines_path(path):
+        return list(iter_lines(path))
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def dump(obj, path, pretty=None):
+    """Write obj to path atomically (JSON Lines when path ends in .jsonl and obj is a list)."""
+    if is_lines_path(path) and isinstance(obj, list):
+        payload = b"".join(dumps_bytes(record, pretty=False) + b"\n" for record in obj)
+    else:
+        payload = dumps_bytes(obj, pretty)
+    atomic_write_bytes(path, payload)
+
+
+# --------------------------
+# JSON Lines
+# --------------------------
+
+def iter_lines(path):
+    """Records of a JSON Lines file; a torn last line (interrupted append) is skipped."""
+    with open(path, "rb") as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield loads(line)
+            except ValueError as e:
+                if line.endswith(b"\n"):
+                    raise ValueError(f"{path}:{number}: {e}") from e
+                print(f"[WARN] Skipping incomplete last line of {path}")
+
+
+def _drop_torn_tail(path, block=4096):
+    """Truncate a last line left without its newline by an interrupted append."""
+    if not os.path.isfile(path):
+        return
+    with open(path, "r+b") as f:
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b"\n":
+            return
+        pos = end
+        while pos > 0:
+            start = max(0, pos - block)
+            f.seek(start)
+            newline = f.read(pos - start).rfind(b"\n")
+            if newline >= 0:
+                pos = start + newline + 1
+                break
+            pos = start
+        print(f"[WARN] Dropping incomplete last line of {path}")
+        f.truncate(pos)
+
+
+def append_lines(path, records):
+    """Append records to a JSON Lines file in one write; returns the number appended."""
+    payload = b"".join(dumps_bytes(record, pretty=False) + b"\n" for record in records)
+    if not payload:
+        return 0
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    _drop_torn_tail(path)
+    with open(path, "ab") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    return len(records)
+
+
+def journal_path(path):
+    """JSON Lines file that appends to `path` go to (path itself when it is already JSON Lines)."""
+    if is_lines_path(path):
+        return path
+    return os.path.splitext(path)[0] + ".jsonl"
+
+
+def iter_journal(path):
+    """Records appended to the journal of an array file, one at a time (none when there is no journal)."""
+    journal = journal_path(path)
+    if journal != path and os.path.isfile(journal):
+        yield from iter_lines(journal)
+
+
+def load_journal(path):
+    """Records appended to the journal of an array file (empty when there is none)."""
+    return list(iter_journal(path))
+
+
+def load_records(path):
+    """Records from a JSON array (or JSON Lines) file followed by those appended to its journal."""
+    journal = load_journal(path)
+    if not os.path.isfile(path) and journal:
+        return journal
+    data = load(path)
+    if not isinstance(data, list):
+        raise ValueError(f"{os.path.basename(path)} must contain a list of records")
+    return data + journal
+
+
+def append_records(path, records):
+    """Append records to the dataset at path without rewriting it; returns the number appended."""
+    return append_lines(journal_path(path), records)
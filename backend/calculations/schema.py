@@ -0,0 +1,379 @@
+"""Typed risk record schema shared by the pipeline stages.
+
+Every field a risk picks up on its way through the pipeline (extraction,
+enrichment, calculator, decision engine) is declared once here with its
+kind:
+
+  - category: low-cardinality text (currency, cedant, broker, occupation,
+    climate/ESG levels, ...). Interned on records, pandas categoricals in
+    frames.
+  - amount: the calculator's numeric inputs, float64. Invalid or missing
+    values are coerced to 0 like the calculator does.
+  - coordinate: latitude/longitude, float64 (None when not given).
+  - date: Period_Start/Period_End. Records keep the slip text ("to be
+    agreed" stays readable); frames carry datetime64 (NaT when unparseable).
+  - anything else is carried as is.
+
+ingest() is the one validated conversion at the pipeline entry: it turns
+input dicts into RiskRecord objects (a MutableMapping with __slots__, so
+code.py and combine.py keep using .get / [] unchanged) and reports values
+it had to coerce. typed_frame() / records_from_frame() are the columnar
+form used by the calculator stage.
+
+    python calculations/schema.py --rows 100000    # memory report, dict/object vs typed
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+from collections.abc import MutableMapping
+
+import numpy as np
+import pandas as pd
+
+try:
+    from calculations import actuarial, fx_rates
+except ImportError:  # run as a script from calculations/
+    import actuarial
+    import fx_rates
+
+CATEGORY_FIELDS = (
+    "Cedant", "Broker", "Original_Currency", "Occupation_of_Insured", "Main_Activities",
+    "Geographical_Limit", "Climate_Change_Risk", "ESG_Risk_Level", "CRESTA_Zone",
+    "Decision", "Accumulation_Zone",
+)
+AMOUNT_FIELDS = actuarial.NUMERIC_INPUTS
+COORDINATE_FIELDS = ("latitude", "longitude")
+DATE_FIELDS = ("Period_Start", "Period_End")
+
+# Carried as is: free text from the slip, derived metrics and nested enrichment/decision outputs
+OTHER_FIELDS = (
+    "Submission_ID", "Insured", "Perils_Covered", "Situation_of_Risk", "Excess_Deductible",
+    "Premium_Rate_Pct", "Proposed_Terms_Conditions",
+) + actuarial.OUTPUT_COLUMNS + (
+    "Risk_Location", "CAT_Exposure", "Climate_ESG_Risk", "Market_Considerations",
+    "Portfolio_Impact", "Proposed_Share",
+    "Accepted_Share_Pct", "Decision_Reasons", "Decision_Rationale",
+    "Evaluated_Loss_Ratio_Pct", "Evaluated_Accepted_Liability_KES",
+    "Evaluated_Radius_Accumulation_KES", "Evaluated_Zone_Accumulation_KES",
+    "Evaluated_Peak_In_Force_KES",
+)
+
+FIELDS = CATEGORY_FIELDS + AMOUNT_FIELDS + COORDINATE_FIELDS + DATE_FIELDS + OTHER_FIELDS
+_FIELD_SET = frozenset(FIELDS)
+_CATEGORY_SET = frozenset(CATEGORY_FIELDS)
+_AMOUNT_SET = frozenset(AMOUNT_FIELDS)
+_MISSING = object()
+
+
+class RiskRecord(MutableMapping):
+    """A risk as a fixed set of slots; keys outside the schema go to a small overflow dict.
+
+    Behaves like the dict it replaces (get, [], in, items, update, copy),
+    iterating schema fields first, in schema order. Absent fields hold
+    _MISSING rather than being unset, so lookups never raise AttributeError.
+    """
+
+    __slots__ = FIELDS + ("_extra",)
+
+    def __init__(self, data=(), **fields):
+        for clear in _CLEAR_SLOTS:
+            clear(self, _MISSING)
+        self._extra = None
+        if data or fields:
+            self.update(data, **fields)
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            value = getattr(self, key)
+            if value is _MISSING:
+                raise KeyError(key)
+            return value
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def get(self, key, default=None):
+        if key in _FIELD_SET:
+            value = getattr(self, key)
+            return default if value is _MISSING else value
+        return default if self._extra is None else self._extra.get(key, default)
+
+    def __setitem__(self, key, value):
+        if key in _FIELD_SET:
+            setattr(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in _FIELD_SET:
+            if getattr(self, key) is _MISSING:
+                raise KeyError(key)
+            setattr(self, key, _MISSING)
+        elif self._extra is None or key not in self._extra:
+            raise KeyError(key)
+        else:
+            del self._extra[key]
+
+    def __contains__(self, key):
+        if key in _FIELD_SET:
+            return getattr(self, key) is not _MISSING
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        for name in FIELDS:
+            if getattr(self, name) is not _MISSING:
+                yield name
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"RiskRecord({self.to_dict()!r})"
+
+    def __reduce__(self):
+        return (RiskRecord, (self.to_dict(),))
+
+    def copy(self):
+        return RiskRecord(self)
+
+    def to_dict(self):
+        return {key: self[key] for key in self}
+
+
+_CLEAR_SLOTS = tuple(RiskRecord.__dict__[name].__set__ for name in FIELDS)
+_SLOT_GETTERS = {name: RiskRecord.__dict__[name].__get__ for name in FIELDS}
+
+
+# --------------------------
+# Ingestion
+# --------------------------
+
+def _number(value):
+    """(float, valid) with the calculator's coercion: None/blank -> 0.0 (valid), junk -> 0.0 (invalid)."""
+    if value is None:
+        return 0.0, True
+    if isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, bool):
+        value = float(value)
+        return (0.0, True) if value != value else (value, True)
+    s = str(value).strip().replace(",", "")
+    if s == "" or s.lower() in {"nan", "none", "null"}:
+        return 0.0, True
+    try:
+        return float(s), True
+    except ValueError:
+        return 0.0, False
+
+
+def _coordinate(value):
+    if value is None or value == "":
+        return None, True
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None, False
+    return (None, True) if value != value else (value, True)
+
+
+def ingest(records):
+    """Validated RiskRecords for a batch of input records (RiskRecords pass through).
+
+    Amounts become floats, coordinates floats or None and category text is
+    interned; values that could not be read are counted and reported once
+    per batch rather than failing the batch.
+    """
+    out = []
+    coerced = Counter()
+    date_checked = {}
+    bad_dates = 0
+    for index, record in enumerate(records):
+        if isinstance(record, RiskRecord):
+            out.append(record)
+            continue
+        if not isinstance(record, MutableMapping):
+            raise ValueError(f"record {index} is not a JSON object")
+        risk = RiskRecord()
+        for key, value in record.items():
+            if key in _AMOUNT_SET:
+                value, ok = _number(value)
+                if not ok:
+                    coerced[key] += 1
+            elif key in _CATEGORY_SET:
+                if isinstance(value, str):
+                    value = sys.intern(value)
+            elif key in COORDINATE_FIELDS:
+                value, ok = _coordinate(value)
+                if not ok:
+                    coerced[key] += 1
+            elif key in DATE_FIELDS and isinstance(value, str) and value:
+                if value not in date_checked:
+                    date_checked[value] = fx_rates.to_days([value])[0] != fx_rates.NO_DAY
+                bad_dates += not date_checked[value]
+            risk[key] = value
+        out.append(risk)
+    if coerced:
+        detail = ", ".join(f"{field} x{count}" for field, count in coerced.most_common())
+        print(f"[SCHEMA] {sum(coerced.values())} unreadable values coerced ({detail})")
+    if bad_dates:
+        print(f"[SCHEMA] {bad_dates} policy dates are not calendar dates (kept as text, no dated FX)")
+    return out
+
+
+# --------------------------
+# Columnar form
+# --------------------------
+
+def _category(values):
+    if set(map(type, values)) <= {str, type(None)}:
+        return pd.Categorical(values)
+    return values  # mixed types (e.g. lists) stay object
+
+
+def _dates(values):
+    days = fx_rates.to_days(values)
+    out = days.astype("datetime64[D]")
+    out[days == fx_rates.NO_DAY] = np.datetime64("NaT")
+    return out.astype("datetime64[ns]")
+
+
+def _raw_columns(records):
+    """{key: values} for every key any record has (None where a record lacks it)."""
+    if not all(type(r) is RiskRecord for r in records):
+        keys = dict.fromkeys(key for r in records for key in r)
+        return {key: [r.get(key) for r in records] for key in keys}
+    # Slots are read column by column, without going through the mapping interface
+    columns = {}
+    n = len(records)
+    for key in FIELDS:
+        values = list(map(_SLOT_GETTERS[key], records))
+        missing = values.count(_MISSING)
+        if missing < n:
+            columns[key] = [None if v is _MISSING else v for v in values] if missing else values
+    extra_keys = dict.fromkeys(key for r in records if r._extra for key in r._extra)
+    for key in extra_keys:
+        columns[key] = [r._extra.get(key) if r._extra else None for r in records]
+    return columns
+
+
+def typed_frame(records):
+    """DataFrame with schema dtypes: categoricals, float64 amounts/coordinates, datetime64 dates."""
+    columns = _raw_columns(records)
+    for key, values in columns.items():
+        if key in _AMOUNT_SET:
+            columns[key] = actuarial.coerce(values)
+        elif key in _CATEGORY_SET:
+            columns[key] = _category(values)
+        elif key in COORDINATE_FIELDS:
+            columns[key] = np.array([np.nan if v is None else v for v in values], dtype=float)
+        elif key in DATE_FIELDS:
+            columns[key] = _dates(values)
+        else:
+            columns[key] = values
+    return pd.DataFrame(columns, index=pd.RangeIndex(len(records)))
+
+
+def _column_values(series):
+    values = series.astype(object).where(series.notna(), None)
+    return values.tolist()
+
+
+def records_from_frame(df, originals):
+    """RiskRecords from a typed frame; date fields get the original slip text back from `originals`."""
+    columns = {}
+    for key in df.columns:
+        if key in DATE_FIELDS:
+            columns[key] = [r.get(key) for r in originals]
+        else:
+            columns[key] = _column_values(df[key])
+    slots = [(key, values) for key, values in columns.items() if key in _FIELD_SET]
+    extra = [(key, values) for key, values in columns.items() if key not in _FIELD_SET]
+    out = []
+    for i in range(len(df)):
+        risk = RiskRecord()
+        for key, values in slots:
+            setattr(risk, key, values[i])
+        if extra:
+            risk._extra = {key: values[i] for key, values in extra}
+        out.append(risk)
+    return out
+
+
+# --------------------------
+# Memory report
+# --------------------------
+
+def _record_bytes(record):
+    """Container size of one record (keys and values shared with other records not counted)."""
+    size = sys.getsizeof(record)
+    if isinstance(record, RiskRecord) and record._extra is not None:
+        size += sys.getsizeof(record._extra)
+    return size
+
+
+def memory_report(records):
+    """Memory and column-processing cost of plain dicts / object frames vs the typed schema."""
+    typed_records = ingest(records)
+    dict_bytes = sum(_record_bytes(r) for r in records)
+    slot_bytes = sum(_record_bytes(r) for r in typed_records)
+
+    start = time.perf_counter()
+    plain = pd.DataFrame(records)
+    plain_build = time.perf_counter() - start
+    start = time.perf_counter()
+    typed = typed_frame(typed_records)
+    typed_build = time.perf_counter() - start
+
+    plain_usage = plain.memory_usage(deep=True)
+    typed_usage = typed.memory_usage(deep=True)
+    columns = [c for c in CATEGORY_FIELDS + AMOUNT_FIELDS + DATE_FIELDS if c in plain.columns]
+
+    def factorize_seconds(frame):
+        start = time.perf_counter()
+        for column in columns:
+            pd.factorize(frame[column])
+        return time.perf_counter() - start
+
+    return {
+        "records": len(records),
+        "record_bytes": {"dict": dict_bytes / max(1, len(records)), "RiskRecord": slot_bytes / max(1, len(records))},
+        "frame_bytes": {"object": int(plain_usage.sum()), "typed": int(typed_usage.sum())},
+        "column_bytes": {c: {"object": int(plain_usage[c]), "typed": int(typed_usage[c])} for c in columns},
+        "build_seconds": {"object": round(plain_build, 4), "typed": round(typed_build, 4)},
+        "factorize_seconds": {"object": round(factorize_seconds(plain), 4), "typed": round(factorize_seconds(typed), 4)},
+    }
+
+
+def print_memory_report(report):
+    n = report["records"]
+    rb, fb = report["record_bytes"], report["frame_bytes"]
+    print(f"[SCHEMA] {n} records")
+    print(f"  per record container: dict {rb['dict']:.0f} B -> RiskRecord {rb['RiskRecord']:.0f} B")
+    print(f"  DataFrame (deep):     object {fb['object'] / 1e6:.1f} MB -> typed {fb['typed'] / 1e6:.1f} MB")
+    for column, sizes in report["column_bytes"].items():
+        print(f"    {column:<32} {sizes['object'] / 1e6:>8.2f} MB -> {sizes['typed'] / 1e6:>8.2f} MB")
+    bs, fs = report["build_seconds"], report["factorize_seconds"]
+    print(f"  frame build:          object {bs['object']:.3f}s, typed {bs['typed']:.3f}s")
+    print(f"  factorize columns:    object {fs['object']:.3f}s -> typed {fs['typed']:.3f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory report for the typed risk schema")
+    parser.add_argument("input", nargs="?", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_input.json"))
+    parser.add_argument("--rows", type=int, default=100_000, help="repeat the input up to this many records")
+    args = parser.parse_args(argv)
+    try:
+        from calculations import jsonio
+    except ImportError:
+        import jsonio
+    base = jsonio.load_records(args.input)
+    records = [dict(base[i % len(base)]) for i in range(max(args.rows, 1))]
+    print_memory_report(memory_report(records))
+
+
+if __name__ == "__main__":
+    main()
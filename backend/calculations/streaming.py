@@ -0,0 +1,224 @@
+"""Chunked streaming of large bordereaux through the calculator.
+
+Records are read one at a time from JSON Lines or from a JSON array
+(without loading the file), grouped into fixed-size chunks, run through
+FacultativeReinsuranceCalculator.calculate_all_metrics chunk by chunk and
+written straight out, so memory depends on chunk_size rather than on the
+size of the input.
+
+Columns come from each chunk, so a key that no record in a chunk has is
+left out of those output records rather than written as null.
+
+A JSON array is followed by the records appended to its .jsonl journal
+(see jsonio.py), like load_json_input. A file whose top level is a single
+object ({"records": [...]} or column-oriented) cannot be streamed; it is
+loaded whole, as before.
+"""
+import io
+import json
+import os
+import re
+import time
+from urllib.parse import urlparse
+from urllib.request import urlopen
+
+import pandas as pd
+
+try:
+    from calculations import jsonio
+except ImportError:  # run as a script from calculations/
+    import jsonio
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+DEFAULT_CHUNK_SIZE = int(os.getenv("CALC_CHUNK_SIZE", "0") or 0) or 10_000
+READ_SIZE = 1 << 20
+
+_SEPARATORS = re.compile(r"[\s,]*")
+_DECODER = json.JSONDecoder()
+
+
+is_lines_path = jsonio.is_lines_path
+
+
+def _open_text(source):
+    if urlparse(str(source)).scheme in ("http", "https"):
+        return io.TextIOWrapper(urlopen(source), encoding="utf-8")
+    return open(source, "r", encoding="utf-8")
+
+
+def _iter_values(f, buf, pos, closing):
+    """JSON values from the text stream, separated by whitespace/commas, up to `closing` (or EOF)."""
+    eof = False
+    while True:
+        pos = _SEPARATORS.match(buf, pos).end()
+        if pos >= len(buf):
+            if eof:
+                if closing:
+                    raise ValueError("unterminated JSON array")
+                return
+            more = f.read(READ_SIZE)
+            eof = not more
+            buf, pos = buf[pos:] + more, 0
+            continue
+        if closing and buf[pos] == closing:
+            return
+        try:
+            value, end = _DECODER.raw_decode(buf, pos)
+            if end == len(buf) and not eof:
+                raise ValueError("value may continue in the next read")
+        except ValueError:
+            if eof:
+                raise
+            more = f.read(READ_SIZE)
+            eof = not more
+            buf, pos = buf[pos:] + more, 0
+            continue
+        yield value
+        pos = end
+        if pos > READ_SIZE:
+            buf, pos = buf[pos:], 0
+
+
+def _records_from_object(data):
+    """Records of a single top-level object, as records_to_dataframe reads it."""
+    if isinstance(data.get("records"), list):
+        return data["records"]
+    return pd.DataFrame(data).to_dict(orient="records")
+
+
+def iter_json_records(source):
+    """Yield the records of a JSON Lines file, JSON array or records object, one at a time."""
+    if is_lines_path(source) and os.path.isfile(source):
+        # One line per record: parsed line by line with the fast backend
+        yield from jsonio.iter_lines(source)
+        return
+    with _open_text(source) as f:
+        buf = f.read(READ_SIZE)
+        pos = _SEPARATORS.match(buf).end()
+        if buf[pos:pos + 1] == "[":
+            yield from _iter_values(f, buf, pos + 1, "]")
+            # Records appended since (jsonio.append_records), as load_json_input reads them
+            yield from jsonio.iter_journal(source)
+            return
+        values = _iter_values(f, buf, pos, None)
+        first = next(values, None)
+        if first is None:
+            return
+        if not is_lines_path(source) and isinstance(first, dict) and next(values, None) is None and (
+            isinstance(first.get("records"), list) or all(isinstance(v, (list, dict)) for v in first.values())
+        ):
+            yield from _records_from_object(first)
+            return
+        yield first
+        yield from values
+
+
+def iter_chunks(records, chunk_size):
+    """Lists of up to chunk_size records."""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class JsonRecordWriter:
+    """Writes DataFrame chunks as JSON Lines (.jsonl/.ndjson) or one JSON array.
+
+    Output goes to a temp file that replaces output_path on close, so a
+    failed run never leaves a truncated file behind.
+    """
+
+    def __init__(self, output_path, lines=None):
+        self.output_path = output_path
+        self.lines = is_lines_path(output_path) if lines is None else lines
+        self.rows = 0
+        directory = os.path.dirname(os.path.abspath(output_path))
+        os.makedirs(directory, exist_ok=True)
+        self._tmp_path = output_path + ".tmp"
+        self._file = open(self._tmp_path, "w", encoding="utf-8")
+        if not self.lines:
+            self._file.write("[")
+
+    def write_frame(self, df):
+        if df.empty:
+            return
+        # Same serialisation as save_json_output (NaN -> null), one record per line
+        text = df.to_json(orient="records", lines=True)
+        if not self.lines:
+            text = ("\n" if self.rows == 0 else ",\n") + text.rstrip("\n").replace("\n", ",\n")
+        self._file.write(text)
+        self.rows += len(df)
+
+    def close(self):
+        if not self.lines:
+            self._file.write("\n]\n" if self.rows else "]\n")
+        self._file.close()
+        os.replace(self._tmp_path, self.output_path)
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def stream_metrics(calculator, source, output_path, chunk_size=DEFAULT_CHUNK_SIZE, lines=None, progress_every=10):
+    """Run calculate_all_metrics over `source` chunk by chunk into output_path; returns the throughput report."""
+    chunk_size = max(1, int(chunk_size))
+    start = time.perf_counter()
+    rows = chunks = 0
+    calc_seconds = 0.0
+    print(f"[STREAM] {source} -> {output_path} in chunks of {chunk_size}")
+    with JsonRecordWriter(output_path, lines=lines) as writer:
+        for chunk in iter_chunks(iter_json_records(source), chunk_size):
+            calc_start = time.perf_counter()
+            df = calculator.calculate_all_metrics(pd.DataFrame(chunk))
+            calc_seconds += time.perf_counter() - calc_start
+            writer.write_frame(df)
+            rows += len(chunk)
+            chunks += 1
+            if progress_every and chunks % progress_every == 0:
+                elapsed = time.perf_counter() - start
+                print(f"[STREAM] {rows} rows ({rows / max(elapsed, 1e-9):,.0f}/s)")
+    elapsed = time.perf_counter() - start
+    input_bytes = os.path.getsize(source) if os.path.isfile(source) else None
+    report = {
+        "rows": rows,
+        "chunks": chunks,
+        "chunk_size": chunk_size,
+        "seconds": round(elapsed, 3),
+        "calculate_seconds": round(calc_seconds, 3),
+        "rows_per_second": round(rows / elapsed, 1) if elapsed > 0 else 0.0,
+        "input_mb": round(input_bytes / 1e6, 2) if input_bytes is not None else None,
+        "mb_per_second": round(input_bytes / 1e6 / elapsed, 2) if input_bytes and elapsed > 0 else None,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    peak = f", peak RSS {report['peak_rss_mb']:.0f} MB" if report["peak_rss_mb"] is not None else ""
+    print(f"[STREAM] {rows} rows in {chunks} chunks, {elapsed:.2f}s ({report['rows_per_second']:,.0f} rows/s, "
+          f"{calc_seconds:.2f}s calculating){peak}")
+    return report
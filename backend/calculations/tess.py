@@ -9,6 +9,11 @@ from urllib.request import urlopen, Request
 from urllib.parse import urlparse, urlencode
 import requests
 
+try:
+    from calculations import actuarial
+except ImportError:  # run as a script from calculations/
+    import actuarial
+
 # Optional .env loading if python-dotenv is available
 try:
     from dotenv import load_dotenv  # type: ignore
@@ -225,61 +230,28 @@ class FacultativeReinsuranceCalculator:
 
         return self.fx.convert(amount, from_currency, to_currency)
     
+    def fx_rates_to_kes(self, currencies):
+        """Per-row original-currency -> KES rate; each distinct currency is looked up once."""
+        rates = {}
+        for currency in pd.unique(currencies):
+            if isinstance(currency, str) or currency is None:
+                rates[currency] = self.convert_currency(1.0, currency, 'KES')
+            else:
+                rates[currency] = np.nan
+        return np.asarray(pd.Series(currencies).map(rates), dtype=float)
+
     def calculate_all_metrics(self, df):
-        """Calculate all derived metrics for the DataFrame"""
+        """Calculate all derived metrics for the DataFrame (vectorized, see actuarial.py)"""
         
         # First, coerce known numeric columns safely to numeric with 0 defaults
-        numeric_cols = [
-            'TSI_Original_Currency', 'Premium_Original_Currency',
-            'Paid_Losses_3_Years', 'Outstanding_Reserves_3_Years', 'Recoveries_3_Years',
-            'Earned_Premium_3_Years', 'Share_Offered_Pct', 'PML_Pct', 'Retention_of_Cedant_Pct'
-        ]
+        numeric_cols = list(actuarial.NUMERIC_INPUTS)
         df = _coerce_numeric_columns(df, numeric_cols)
         
-        # Convert currencies to KES
-        df['TSI_KES'] = df.apply(lambda row: self.convert_currency(
-            row['TSI_Original_Currency'], 
-            row['Original_Currency'], 
-            'KES'
-        ), axis=1)
-        
-        df['Premium_KES'] = df.apply(lambda row: self.convert_currency(
-            row['Premium_Original_Currency'], 
-            row['Original_Currency'], 
-            'KES'
-        ), axis=1)
-        
-        # Calculate premium rates
-        df['Premium_Rate_Percentage'] = df.apply(lambda row: self.calculate_premium_rate_percentage(
-            row['Premium_KES'], row['TSI_KES']
-        ), axis=1)
-        
-        df['Premium_Rate_Permille'] = df.apply(lambda row: self.calculate_premium_rate_permille(
-            row['Premium_KES'], row['TSI_KES']
-        ), axis=1)
-        
-        # Calculate loss ratios
-        df['Loss_Ratio_Pct'] = df.apply(lambda row: self.calculate_loss_ratio(
-            row['Paid_Losses_3_Years'],
-            row['Outstanding_Reserves_3_Years'],
-            row['Recoveries_3_Years'],
-            row['Earned_Premium_3_Years']
-        ), axis=1)
-        
-        # Calculate accepted amounts
-        df['Accepted_Premium_KES'] = df.apply(lambda row: self.calculate_accepted_premium(
-            row['Premium_KES'], row['Share_Offered_Pct']
-        ), axis=1)
-        
-        df['Accepted_Liability_KES'] = df.apply(lambda row: self.calculate_accepted_liability(
-            row['TSI_KES'], row['Share_Offered_Pct']
-        ), axis=1)
-        
-        # Calculate PML amounts
-        df['PML_Amount_KES'] = _safe_float(1.0) * df['TSI_KES'] * (df['PML_Pct'] / 100)
-        
-        # Calculate retention amounts
-        df['Retention_Amount_KES'] = _safe_float(1.0) * df['TSI_KES'] * (df['Retention_of_Cedant_Pct'] / 100)
+        # Convert currencies to KES and derive rates, ratios and shares column-wise
+        fx_rate = self.fx_rates_to_kes(df['Original_Currency'])
+        inputs = [df[col].to_numpy(dtype=float) for col in numeric_cols]
+        for column, values in actuarial.actuarial_metrics(*inputs, fx_rate=fx_rate).items():
+            df[column] = values
         
         return df
     
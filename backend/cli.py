@@ -0,0 +1,417 @@
+"""Bulk command line for backfills, reprocessing and replays.
+
+Runs the same stages as the comined/main.py monitor, but over a whole
+archive and across cores instead of through the polling loop:
+
+    python backend/cli.py ingest DIR            # extract + NLP + decide every Submission_* under DIR
+    python backend/cli.py extract  [selection]  # documents -> text
+    python backend/cli.py nlp      [selection]  # text -> merged JSON (Gemini)
+    python backend/cli.py calculate [selection] # enrichment + calculator + decision from the input file
+    python backend/cli.py decide   [selection]  # re-apply decision rules to stored records
+    python backend/cli.py rerun                 # re-run stages whose version changed (pipeline.STAGE_VERSIONS)
+
+Selection is --ids ID [ID ...] and/or --since/--until YYYY-MM-DD on the
+Submission_YYYYMMDD_HHMMSS timestamp. Every subcommand takes --workers,
+--dry-run and reports progress and throughput.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from apis import code as code_module
+from comined import pipeline as pipeline_module
+from FINAL import accumulation as accumulation_module
+from FINAL import in_force as in_force_module
+from FINAL import portfolio as portfolio_module
+from FINAL import store as store_module
+from FINAL import snapshot as snapshot_module
+
+PATH_SUBMISSION_EXTRACTOR = os.path.join(BACKEND_DIR, "email", "submission_extractor.py")
+PATH_APITEST = os.path.join(BACKEND_DIR, "nlp2", "APItest.py")
+DEFAULT_SUBMISSIONS_ROOT = os.path.join(BACKEND_DIR, "comined", "Facultative_Submissions")
+DEFAULT_INPUT = os.path.join(BACKEND_DIR, "calculations", "sample_input.json")
+FINAL_DIR = os.path.join(BACKEND_DIR, "FINAL")
+
+
+def _load_module_from_path(module_name, file_path):
+    spec = importlib.util.spec_from_file_location(module_name, file_path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"Cannot load module {module_name} from {file_path}")
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+class Progress:
+    """Prints done/total and items per second at most every `every` seconds."""
+
+    def __init__(self, label, total, every=2.0):
+        self.label = label
+        self.total = total
+        self.every = every
+        self.done = 0
+        self.failed = 0
+        self.start = time.perf_counter()
+        self._last = 0.0
+
+    def step(self, ok=True):
+        self.done += 1
+        if not ok:
+            self.failed += 1
+        now = time.perf_counter()
+        if now - self._last >= self.every or self.done == self.total:
+            self._last = now
+            rate = self.done / max(now - self.start, 1e-9)
+            print(f"[CLI] {self.label}: {self.done}/{self.total} ({rate:.2f}/s, {self.failed} failed)")
+
+    def finish(self):
+        elapsed = time.perf_counter() - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        print(f"[CLI] {self.label} finished: {self.done} items in {elapsed:.2f}s ({rate:.2f}/s), {self.failed} failed")
+        return {"stage": self.label, "items": self.done, "failed": self.failed,
+                "seconds": round(elapsed, 3), "per_second": round(rate, 3)}
+
+
+# --------------------------
+# Selection
+# --------------------------
+
+def submission_timestamp(submission_id):
+    """Datetime from Submission_YYYYMMDD_HHMMSS_..., None for other IDs."""
+    parts = str(submission_id).split("_")
+    if len(parts) < 3 or parts[0] != "Submission":
+        return None
+    try:
+        return datetime.strptime(parts[1] + parts[2], "%Y%m%d%H%M%S")
+    except ValueError:
+        return None
+
+
+def _parse_day(value, end=False):
+    if not value:
+        return None
+    day = datetime.strptime(value, "%Y-%m-%d")
+    return day.replace(hour=23, minute=59, second=59) if end else day
+
+
+def selected(submission_id, args):
+    if args.ids and submission_id not in args.ids:
+        return False
+    since, until = _parse_day(args.since), _parse_day(args.until, end=True)
+    if since or until:
+        ts = submission_timestamp(submission_id)
+        if ts is None or (since and ts < since) or (until and ts > until):
+            return False
+    return True
+
+
+def find_submission_folders(root):
+    folders = []
+    for current, dirs, _ in os.walk(root):
+        for d in sorted(dirs):
+            if d.startswith("Submission_"):
+                folders.append(os.path.join(current, d))
+    return sorted(folders)
+
+
+def _submission_id_from_path(path):
+    return os.path.splitext(os.path.basename(path.rstrip(os.sep)))[0]
+
+
+# --------------------------
+# Stage runners (top-level so they pickle into worker processes)
+# --------------------------
+
+def _extract_one(sub_path, out_path):
+    mod = _load_module_from_path("submission_extractor", PATH_SUBMISSION_EXTRACTOR)
+    mod.process_submission_folder(sub_path, out_path)
+    return out_path
+
+
+def _run_stage_chunk(stage_names, records, books=None):
+    # Rebuilds the running books from the parent's snapshots (they do not pickle by reference)
+    portfolio = accumulation = in_force = None
+    if books:
+        portfolio = portfolio_module.PortfolioAccumulator.restore(books[0])
+        if "decision" in stage_names:
+            accumulation = accumulation_module.AccumulationIndex.restore(books[1])
+            in_force = in_force_module.InForceIndex.restore(books[2])
+    stages = pipeline_module.bind_stages(
+        portfolio, stage_names=stage_names, accumulation=accumulation, in_force=in_force
+    )
+    return pipeline_module.run_stages(records, stages=stages, snapshot_dir="")
+
+
+def _books_snapshot(store):
+    """Snapshots of the store's running books (portfolio, accumulation, in-force) for worker processes."""
+    return tuple(book.snapshot() for book in pipeline_module.books_for(store))
+
+
+def run_extract(folders, root, output_root, workers, dry_run):
+    jobs = [(f, os.path.join(output_root, os.path.relpath(f, root))) for f in folders]
+    if dry_run:
+        for sub_path, out_path in jobs:
+            print(f"[DRY-RUN] extract {sub_path} -> {out_path}")
+        return [out for _, out in jobs], None
+    progress = Progress("extract", len(jobs))
+    outputs = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_extract_one, s, o): s for s, o in jobs}
+        for future in as_completed(futures):
+            try:
+                outputs.append(future.result())
+                progress.step()
+            except Exception as e:
+                print(f"[ERROR] extract {futures[future]}: {e}")
+                progress.step(ok=False)
+    return sorted(outputs), progress.finish()
+
+
+def run_nlp(extracted_folders, workers, dry_run, force=False):
+    mod = _load_module_from_path("apitest_runner", PATH_APITEST)
+
+    def merged_path(folder):
+        return os.path.join(mod.OUTPUT_FOLDER, os.path.relpath(folder, mod.INPUT_FOLDER) + ".json")
+
+    if dry_run:
+        for folder in extracted_folders:
+            print(f"[DRY-RUN] nlp {folder} -> {merged_path(folder)}")
+        return [merged_path(f) for f in extracted_folders], None
+
+    def one(folder):
+        out = merged_path(folder)
+        if force and os.path.isfile(out):
+            os.remove(out)  # APItest skips folders that already have output
+        mod.process_submission(folder)
+        return out
+
+    progress = Progress("nlp", len(extracted_folders))
+    outputs = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(one, f): f for f in extracted_folders}
+        for future in as_completed(futures):
+            try:
+                out = future.result()
+                if os.path.isfile(out):
+                    outputs.append(out)
+                progress.step()
+            except Exception as e:
+                print(f"[ERROR] nlp {futures[future]}: {e}")
+                progress.step(ok=False)
+    return sorted(outputs), progress.finish()
+
+
+def run_pipeline_stages(records, stage_names, workers, label, books=None):
+    """Run the named stages; all but the decision stage run in one chunk per worker.
+
+    The decision stage books accepted risks into the accumulation and
+    in-force indexes as it goes, so it runs once in this process over the
+    whole batch, in input order. Limits then hold across chunks and the
+    decisions do not depend on --workers.
+    """
+    if not records:
+        return [], None
+    progress = Progress(label, len(records))
+    decide = "decision" in stage_names
+    parallel = [name for name in stage_names if name != "decision"]
+    if parallel:
+        chunk_size = max(1, -(-len(records) // max(1, workers)))
+        chunks = [records[i:i + chunk_size] for i in range(0, len(records), chunk_size)]
+        if len(chunks) == 1:
+            results = [_run_stage_chunk(parallel, chunks[0], books)]
+            if not decide:
+                for _ in results[0]:
+                    progress.step()
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_run_stage_chunk, parallel, c, books) for c in chunks]
+                for future in as_completed(futures):
+                    if not decide:
+                        for _ in future.result():
+                            progress.step()
+                results = [future.result() for future in futures]
+        records = [record for result in results for record in result]
+    if decide:
+        records = _run_stage_chunk(["decision"], records, books)
+        for _ in records:
+            progress.step()
+    return records, progress.finish()
+
+
+def publish(store):
+    version, path = snapshot_module.publish(store, FINAL_DIR)
+    print(f"[CLI] Published decisions snapshot v{version} -> {path}")
+
+
+# --------------------------
+# Subcommands
+# --------------------------
+
+def cmd_extract(args):
+    folders = [f for f in find_submission_folders(args.root) if selected(_submission_id_from_path(f), args)]
+    output_root = args.output or _load_module_from_path("submission_extractor", PATH_SUBMISSION_EXTRACTOR).OUTPUT_FOLDER
+    print(f"[CLI] {len(folders)} submission folders selected under {args.root}")
+    run_extract(folders, args.root, output_root, args.workers, args.dry_run)
+
+
+def cmd_nlp(args):
+    mod = _load_module_from_path("apitest_runner", PATH_APITEST)
+    folders = [f for f in find_submission_folders(mod.INPUT_FOLDER) if selected(_submission_id_from_path(f), args)]
+    print(f"[CLI] {len(folders)} extracted folders selected under {mod.INPUT_FOLDER}")
+    run_nlp(folders, args.workers, args.dry_run, force=args.force)
+
+
+def _load_input_records(path, args):
+    records = []
+    for record in code_module.load_input(path):
+        sid = store_module.submission_id_for(record)
+        if selected(sid, args):
+            records.append(dict(record, Submission_ID=sid))
+    # Last occurrence of a submission wins, like the store upsert
+    return list({r["Submission_ID"]: r for r in records}.values())
+
+
+def cmd_calculate(args):
+    records = _load_input_records(args.input, args)
+    print(f"[CLI] {len(records)} submissions selected from {args.input}")
+    if args.dry_run:
+        for r in records:
+            print(f"[DRY-RUN] calculate {r['Submission_ID']} ({r.get('Insured')})")
+        return
+    store = store_module.DecisionStore()
+    books = _books_snapshot(store)
+    decided, _ = run_pipeline_stages(records, [s[0] for s in pipeline_module.STAGES], args.workers, "calculate", books)
+    store.upsert_records(decided, stage_versions=pipeline_module.STAGE_VERSIONS)
+    publish(store)
+
+
+def _rerun_from(store, ids, first_stage_for, args, label):
+    """Re-run stored records from the first stage that needs it, grouped by that stage."""
+    stage_names = [s[0] for s in pipeline_module.STAGES]
+    groups = {}
+    for record, versions in store.get_records(ids):
+        first = first_stage_for(versions)
+        if first is not None:
+            # Rows sharing a group also share the versions of the stages kept as-is
+            kept = tuple(versions.get(n) for n in stage_names[:first])
+            groups.setdefault((first, kept), []).append((record, versions))
+    if not groups:
+        print(f"[CLI] {label}: nothing to do")
+        return
+    for (first, _), items in sorted(groups.items(), key=lambda kv: (kv[0][0], str(kv[0][1]))):
+        names = stage_names[first:]
+        print(f"[CLI] {label}: {len(items)} submissions from stage '{names[0]}'")
+        if args.dry_run:
+            for record, _ in items:
+                print(f"[DRY-RUN] {label} {record.get('Submission_ID')} stages {names}")
+            continue
+        decided, _ = run_pipeline_stages([r for r, _ in items], names, args.workers, label, _books_snapshot(store))
+        # Stages that were not re-run keep their stored version
+        prior = items[0][1]
+        versions = {n: (pipeline_module.STAGE_VERSIONS[n] if n in names else prior.get(n)) for n in stage_names}
+        store.upsert_records(decided, stage_versions=versions)
+    if not args.dry_run:
+        publish(store)
+
+
+def cmd_decide(args):
+    store = store_module.DecisionStore()
+    ids = [sid for sid in store.all_ids() if selected(sid, args)]
+    decision_index = [s[0] for s in pipeline_module.STAGES].index("decision")
+    _rerun_from(store, ids, lambda versions: decision_index, args, "decide")
+
+
+def cmd_rerun(args):
+    store = store_module.DecisionStore()
+    current = pipeline_module.STAGE_VERSIONS
+    stage_names = [s[0] for s in pipeline_module.STAGES]
+    ids = [sid for sid in store.stale_ids(current) if selected(sid, args)]
+    print(f"[CLI] {len(ids)} stored submissions produced by older stage versions")
+
+    def first_stale(versions):
+        for index, name in enumerate(stage_names):
+            if versions.get(name) != current[name]:
+                return index
+        return None
+
+    _rerun_from(store, ids, first_stale, args, "rerun")
+
+
+def cmd_ingest(args):
+    folders = [f for f in find_submission_folders(args.directory) if selected(_submission_id_from_path(f), args)]
+    print(f"[CLI] Ingesting {len(folders)} submission folders from {args.directory}")
+    nlp_mod = _load_module_from_path("apitest_runner", PATH_APITEST)
+    # Extracted text must land under APItest's INPUT_FOLDER for the NLP step
+    extracted, _ = run_extract(folders, args.directory, nlp_mod.INPUT_FOLDER, args.workers, args.dry_run)
+    merged, _ = run_nlp(extracted, args.workers, args.dry_run, force=args.force)
+    if args.dry_run:
+        return
+
+    records = []
+    for path in merged:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data.setdefault("Submission_ID", _submission_id_from_path(path))
+            records.append(data)
+    store = store_module.DecisionStore()
+    written = pipeline_module.run_incremental(records, store)
+    print(f"[CLI] {written} submissions decided")
+    if written:
+        publish(store)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="CedaSense bulk backfill / reprocess / replay")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="parallel workers (default: CPU count)")
+    common.add_argument("--dry-run", action="store_true", help="list what would run without writing anything")
+    common.add_argument("--ids", nargs="+", default=None, help="only these submission IDs")
+    common.add_argument("--since", help="only submissions on/after YYYY-MM-DD")
+    common.add_argument("--until", help="only submissions on/before YYYY-MM-DD")
+
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("ingest", parents=[common], help="extract, NLP and decide every submission under a directory")
+    p.add_argument("directory")
+    p.add_argument("--force", action="store_true", help="re-run NLP even if merged JSON exists")
+    p.set_defaults(func=cmd_ingest)
+
+    p = sub.add_parser("extract", parents=[common], help="convert submission documents to text")
+    p.add_argument("--root", default=DEFAULT_SUBMISSIONS_ROOT)
+    p.add_argument("--output", default=None, help="default: submission_extractor.OUTPUT_FOLDER")
+    p.set_defaults(func=cmd_extract)
+
+    p = sub.add_parser("nlp", parents=[common], help="run Gemini extraction on converted text")
+    p.add_argument("--force", action="store_true", help="re-run even if merged JSON exists")
+    p.set_defaults(func=cmd_nlp)
+
+    p = sub.add_parser("calculate", parents=[common], help="enrich, calculate and decide records from the input file")
+    p.add_argument("--input", default=DEFAULT_INPUT)
+    p.set_defaults(func=cmd_calculate)
+
+    p = sub.add_parser("decide", parents=[common], help="re-apply decision rules to stored records")
+    p.set_defaults(func=cmd_decide)
+
+    p = sub.add_parser("rerun", parents=[common], help="re-run stages whose version changed")
+    p.set_defaults(func=cmd_rerun)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.workers = max(1, args.workers)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
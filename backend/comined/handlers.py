@@ -0,0 +1,38 @@
+"""Stage handlers that run in the stage executor's worker processes.
+
+Process pools pickle a handler by its module and name. A function defined in
+main.py is "__main__.<name>" when main.py runs as a script, which a spawned
+child cannot import, so process-stage handlers live here.
+"""
+import importlib.util
+import os
+import sys
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+PATH_SUBMISSION_EXTRACTOR = os.path.join(PROJECT_ROOT, "email", "submission_extractor.py")
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from comined import profiling
+
+
+def _load_module_from_path(module_name, file_path):
+    spec = importlib.util.spec_from_file_location(module_name, file_path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"Cannot load module {module_name} from {file_path}")
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def extract_submission(sub_path):
+    """Extract stage: convert one submission folder to text (runs in a worker process)"""
+    mod = _load_module_from_path("submission_extractor", PATH_SUBMISSION_EXTRACTOR)
+    profiling.wrap(mod, "extract_text_from_pdf", "extract_text_from_pdf")
+    base_folder = os.path.join(os.getcwd(), "Facultative_Submissions")
+    out_sub_path = os.path.join(mod.OUTPUT_FOLDER, os.path.relpath(sub_path, base_folder))
+    print(f"[EXTRACT] {sub_path} -> {out_sub_path}")
+    mod.process_submission_folder(sub_path, out_sub_path)
+    return [out_sub_path]
@@ -0,0 +1,245 @@
+"""Lease-based job store for running pipeline stages in separate worker processes.
+
+A job is one stage of one submission (e.g. "nlp:Submission_2025..."). Workers
+claim jobs with a time-limited lease, extend it while working (heartbeat)
+and complete or fail it. A worker that crashes stops heartbeating, its lease
+expires and another worker re-claims the job. SQLiteJobStore works across
+processes and hosts sharing the file; LocalJobStore is an in-memory
+stand-in with the same interface for single-process use and tests.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_JOB_STORE_PATH = os.getenv(
+    "JOB_STORE_PATH", os.path.join(os.path.dirname(CURRENT_DIR), "FINAL", "jobs.db")
+)
+
+PENDING, LEASED, DONE, FAILED = "pending", "leased", "done", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id           TEXT PRIMARY KEY,
+    stage            TEXT NOT NULL,
+    payload          TEXT NOT NULL,
+    status           TEXT NOT NULL,
+    attempts         INTEGER NOT NULL DEFAULT 0,
+    lease_owner      TEXT,
+    lease_expires_at REAL,
+    available_at     REAL NOT NULL,
+    last_error       TEXT,
+    created_at       REAL NOT NULL,
+    updated_at       REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs (stage, status, available_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs (status, lease_expires_at);
+"""
+
+
+def enqueue_submission(job_store, sub_path, root):
+    """Queue the first stage (extract) of a submission folder; no-op if already queued."""
+    sid = os.path.basename(sub_path.rstrip(os.sep))
+    return job_store.enqueue(f"extract:{sid}", "extract", {"path": sub_path, "root": root})
+
+
+def _retry_delay(attempts):
+    return min(300.0, 5.0 * (2 ** max(0, attempts - 1)))
+
+
+class SQLiteJobStore:
+    def __init__(self, path=DEFAULT_JOB_STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _write(self):
+        """BEGIN IMMEDIATE so concurrent claimers serialize on the write lock."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, job_id, stage, payload):
+        """Add a job unless one with this ID already exists; returns True if added."""
+        now = time.time()
+        with self._write() as conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO jobs (job_id, stage, payload, status, available_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, stage, json.dumps(payload), PENDING, now, now, now),
+            )
+            return cur.rowcount == 1
+
+    def claim(self, worker_id, stages, lease_seconds=300, limit=1):
+        """Lease up to `limit` pending (or lease-expired) jobs for the given stages."""
+        now = time.time()
+        placeholders = ",".join("?" * len(stages))
+        with self._write() as conn:
+            rows = conn.execute(
+                f"SELECT job_id, stage, payload, attempts FROM jobs WHERE stage IN ({placeholders}) AND ("
+                "(status = ? AND available_at <= ?) OR (status = ? AND lease_expires_at < ?)"
+                ") ORDER BY available_at LIMIT ?",
+                (*stages, PENDING, now, LEASED, now, limit),
+            ).fetchall()
+            jobs = []
+            for row in rows:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, lease_owner = ?, lease_expires_at = ?, "
+                    "attempts = attempts + 1, updated_at = ? WHERE job_id = ?",
+                    (LEASED, worker_id, now + lease_seconds, now, row["job_id"]),
+                )
+                jobs.append({
+                    "job_id": row["job_id"], "stage": row["stage"],
+                    "payload": json.loads(row["payload"]), "attempts": row["attempts"] + 1,
+                })
+            return jobs
+
+    def heartbeat(self, job_id, worker_id, lease_seconds=300):
+        """Extend a lease; False if the worker no longer owns the job."""
+        now = time.time()
+        with self._write() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ?, updated_at = ? "
+                "WHERE job_id = ? AND lease_owner = ? AND status = ?",
+                (now + lease_seconds, now, job_id, worker_id, LEASED),
+            )
+            return cur.rowcount == 1
+
+    def complete(self, job_id, worker_id):
+        with self._write() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires_at = NULL, updated_at = ? "
+                "WHERE job_id = ? AND lease_owner = ?",
+                (DONE, time.time(), job_id, worker_id),
+            )
+            return cur.rowcount == 1
+
+    def fail(self, job_id, worker_id, error, max_attempts=3):
+        """Release a job for retry with backoff, or mark it failed after max_attempts."""
+        now = time.time()
+        with self._write() as conn:
+            row = conn.execute(
+                "SELECT attempts FROM jobs WHERE job_id = ? AND lease_owner = ?", (job_id, worker_id)
+            ).fetchone()
+            if row is None:
+                return False
+            attempts = row["attempts"]
+            status = FAILED if attempts >= max_attempts else PENDING
+            conn.execute(
+                "UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires_at = NULL, "
+                "available_at = ?, last_error = ?, updated_at = ? WHERE job_id = ?",
+                (status, now + _retry_delay(attempts), str(error), now, job_id),
+            )
+            return True
+
+    def stats(self):
+        now = time.time()
+        with self._connect() as conn:
+            by_stage = {}
+            for stage, status, count in conn.execute(
+                "SELECT stage, status, COUNT(*) FROM jobs GROUP BY stage, status"
+            ):
+                by_stage.setdefault(stage, {})[status] = count
+            expired = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ? AND lease_expires_at < ?", (LEASED, now)
+            ).fetchone()[0]
+        return {"stages": by_stage, "expired_leases": expired}
+
+
+class LocalJobStore:
+    """In-memory job store with the SQLiteJobStore interface (one process only)."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def enqueue(self, job_id, stage, payload):
+        with self._lock:
+            if job_id in self._jobs:
+                return False
+            self._jobs[job_id] = {
+                "job_id": job_id, "stage": stage, "payload": payload, "status": PENDING,
+                "attempts": 0, "lease_owner": None, "lease_expires_at": None,
+                "available_at": time.time(), "last_error": None,
+            }
+            return True
+
+    def claim(self, worker_id, stages, lease_seconds=300, limit=1):
+        now = time.time()
+        with self._lock:
+            ready = [
+                j for j in self._jobs.values()
+                if j["stage"] in stages and (
+                    (j["status"] == PENDING and j["available_at"] <= now)
+                    or (j["status"] == LEASED and j["lease_expires_at"] < now)
+                )
+            ]
+            ready.sort(key=lambda j: j["available_at"])
+            claimed = []
+            for job in ready[:limit]:
+                job.update(status=LEASED, lease_owner=worker_id, lease_expires_at=now + lease_seconds)
+                job["attempts"] += 1
+                claimed.append({k: job[k] for k in ("job_id", "stage", "payload", "attempts")})
+            return claimed
+
+    def _owned(self, job_id, worker_id):
+        job = self._jobs.get(job_id)
+        return job if job is not None and job["lease_owner"] == worker_id else None
+
+    def heartbeat(self, job_id, worker_id, lease_seconds=300):
+        with self._lock:
+            job = self._owned(job_id, worker_id)
+            if job is None or job["status"] != LEASED:
+                return False
+            job["lease_expires_at"] = time.time() + lease_seconds
+            return True
+
+    def complete(self, job_id, worker_id):
+        with self._lock:
+            job = self._owned(job_id, worker_id)
+            if job is None:
+                return False
+            job.update(status=DONE, lease_owner=None, lease_expires_at=None)
+            return True
+
+    def fail(self, job_id, worker_id, error, max_attempts=3):
+        with self._lock:
+            job = self._owned(job_id, worker_id)
+            if job is None:
+                return False
+            job.update(
+                status=FAILED if job["attempts"] >= max_attempts else PENDING,
+                lease_owner=None, lease_expires_at=None, last_error=str(error),
+                available_at=time.time() + _retry_delay(job["attempts"]),
+            )
+            return True
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            by_stage = {}
+            for job in self._jobs.values():
+                counts = by_stage.setdefault(job["stage"], {})
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+            expired = sum(1 for j in self._jobs.values() if j["status"] == LEASED and j["lease_expires_at"] < now)
+        return {"stages": by_stage, "expired_leases": expired}
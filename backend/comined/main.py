@@ -1,9 +1,14 @@
-import json
+import hmac
+import time
+
+_STARTUP_STARTED = time.perf_counter()
+
 import os
 import sys
-import time
+import signal
 import threading
-from flask import Flask, jsonify, request, send_from_directory
+from datetime import date
+from flask import Flask, Response, jsonify, request, send_from_directory
 import importlib.util
 
 # Resolve project structure
@@ -20,10 +25,24 @@ NLP2_DIR = os.path.join(PROJECT_ROOT, "nlp2")
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
  
-# Import modules
-from apis import code as code_module
-from calculations import calculator as calc_module
-from FINAL import combine as decision_module
+# Import modules. The pipeline (pandas, numpy, requests) is imported by
+# warm_up() in the background so the API can start serving first.
+from FINAL import store as store_module
+from FINAL import snapshot as snapshot_module
+from calculations import jsonio
+from comined import stages as stages_module
+from comined import scheduler as scheduler_module
+from comined import metrics
+from comined import profiling
+from comined import handlers
+from comined import jobs as jobs_module
+
+code_module = None
+calc_module = None
+pipeline_module = None
+_warm_lock = threading.Lock()
+startup_times = {}
+STARTUP_SECONDS = metrics.gauge("startup_seconds", "Seconds from process start to each startup phase", ("phase",))
 
 # Paths to scripts
 PATH_TEST2 = os.path.join(EMAIL_DIR, "test2.py")
@@ -35,9 +54,140 @@ last_submission_count = 0
 last_merged_json_count = 0
 final_path = os.path.join(FINAL_DIR, "decisions.json")
 
+# Submissions, metrics and decisions (SQLite, FINAL/decisions.db by default) and
+# a pre-serialized copy of the current decisions for /api/decisions; opened at
+# startup by open_decision_store(), not on import
+decision_store = None
+decision_cache = None
+_store_lock = threading.Lock()
+
+def open_decision_store():
+    """Open the decision store and its snapshot cache (once), seeding an empty store from decisions.json"""
+    global decision_store, decision_cache
+    with _store_lock:
+        if decision_store is None:
+            store = store_module.DecisionStore()
+            if store.count() == 0 and os.path.isfile(final_path):
+                # One-time seed from the legacy flat file so the API is never empty
+                store.upsert_records(jsonio.load(final_path))
+            decision_cache = snapshot_module.SnapshotCache(store)
+            decision_store = store
+    return decision_store
+
 # Keep track of appended JSONs globally
 appended_json_files = set()
 
+# Per-stage concurrency for the email -> extract -> NLP -> pipeline executor
+EXTRACT_WORKERS = int(os.getenv("STAGE_EXTRACT_WORKERS", "2"))
+NLP_WORKERS = int(os.getenv("STAGE_NLP_WORKERS", "2"))
+STAGE_QUEUE_SIZE = int(os.getenv("STAGE_QUEUE_SIZE", "16"))
+stage_executor = None
+
+# JOB_WORKER_MODE=external: the monitor only enqueues submissions into the
+# shared job store and separate comined/worker.py processes run the stages
+JOB_WORKER_MODE = os.getenv("JOB_WORKER_MODE", "inline").strip().lower()
+job_store = jobs_module.SQLiteJobStore() if JOB_WORKER_MODE == "external" else None
+
+# Email polling cadence: fast while work is in flight, backing off when idle
+monitor_scheduler = scheduler_module.PollScheduler(
+    min_interval=float(os.getenv("MONITOR_POLL_MIN_SECONDS", "2")),
+    max_interval=float(os.getenv("MONITOR_POLL_MAX_SECONDS", "60")),
+    idle_factor=float(os.getenv("MONITOR_IDLE_BACKOFF", "1.5")),
+)
+
+def _submission_id_from_path(path):
+    """Submission_... folder name from a submission, extracted or merged JSON path"""
+    return os.path.splitext(os.path.basename(path.rstrip(os.sep)))[0]
+
+def _folder_size(path):
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def instrument_external_calls():
+    """Time USGS lookups and OANDA rate fetches, and count USGS/FX cache hits"""
+    metrics.instrument(code_module, "fetch_usgs_magnitudes", "usgs_cat_exposure")
+    code_module.usgs_cache.observer = lambda result: metrics.CACHE_REQUESTS.inc(cache="usgs", result=result)
+
+    # Rate lookups never touch the network; only the daily table fetch does
+    metrics.instrument(calc_module.fx_rates, "fetch_oanda_quotes", "oanda_fx")
+    calc_module.fx_rates.observer = lambda result: metrics.CACHE_REQUESTS.inc(cache="fx_rate", result=result)
+
+def instrument_gemini(mod):
+    """Time Gemini calls on a loaded APItest module and count tokens from usage metadata"""
+    models = mod.client.models
+    original = models.generate_content
+
+    def generate_content(*args, **kwargs):
+        with metrics.timed("gemini"):
+            response = original(*args, **kwargs)
+        usage = getattr(response, "usage_metadata", None)
+        model = kwargs.get("model", getattr(mod, "MODEL", "unknown"))
+        for kind, attr in (("prompt", "prompt_token_count"), ("completion", "candidates_token_count")):
+            count = getattr(usage, attr, None) if usage is not None else None
+            if count:
+                metrics.LLM_TOKENS.inc(count, model=model, kind=kind)
+        return response
+
+    models.generate_content = generate_content
+    return mod
+
+def observe_stage(stage_name, item, started_at, seconds, ok):
+    """Stage executor observer: latency metrics, bytes and per-submission trace"""
+    metrics.record_call(stage_name, seconds, ok)
+    if stage_name == "extract" and ok:
+        metrics.BYTES_PROCESSED.inc(_folder_size(item), stage="extract")
+    metrics.record_span(_submission_id_from_path(item), stage_name, started_at, seconds, ok)
+
+@metrics.add_collector
+def _stage_queue_samples():
+    if stage_executor is None:
+        return []
+    samples = []
+    for name, st in stage_executor.stats().items():
+        samples.append(("stage_queue_depth", "Items waiting per stage queue", "gauge", {"stage": name}, st["queue_depth"]))
+        samples.append(("stage_queue_lag_seconds", "Age of the oldest queued item", "gauge", {"stage": name}, st["lag_seconds"]))
+    return samples
+
+@metrics.add_collector
+def _circuit_samples():
+    if code_module is None:
+        return []
+    st = code_module.usgs_breaker.status()
+    return [
+        ("circuit_open", "1 while an external dependency's circuit breaker is open", "gauge",
+         {"name": st["name"]}, int(st["state"] != "closed")),
+        ("circuit_rejected_total", "Calls rejected by an open circuit breaker", "counter",
+         {"name": st["name"]}, st["rejected"]),
+    ]
+
+def _mark_startup(phase):
+    seconds = time.perf_counter() - _STARTUP_STARTED
+    startup_times[phase] = round(seconds, 3)
+    STARTUP_SECONDS.set(seconds, phase=phase)
+    print(f"[STARTUP] {phase} after {seconds:.2f}s")
+
+def warm_up():
+    """Import the pipeline modules and install their instrumentation (once)"""
+    global code_module, calc_module, pipeline_module
+    with _warm_lock:
+        if pipeline_module is not None:
+            return
+        code_module = importlib.import_module("apis.code")
+        calc_module = importlib.import_module("calculations.calculator")
+        instrument_external_calls()
+        # Stages that can be profiled on demand (PROFILE_STAGES or /api/profiles/enable)
+        profiling.wrap(calc_module.FacultativeReinsuranceCalculator, "calculate_all_metrics", "calculate_all_metrics")
+        pipeline_module = importlib.import_module("comined.pipeline")
+        _mark_startup("pipeline_warm")
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "").strip()
+
 def _load_module_from_path(module_name: str, file_path: str):
     spec = importlib.util.spec_from_file_location(module_name, file_path)
     if spec is None or spec.loader is None:
@@ -46,18 +196,22 @@ def _load_module_from_path(module_name: str, file_path: str):
     spec.loader.exec_module(mod)
     return mod
 
-def count_submission_folders():
-    """Count total submission folders in Facultative_Submissions"""
+def list_submission_folders():
+    """Paths of all submission folders in Facultative_Submissions"""
     base_folder = os.path.join(os.getcwd(), "Facultative_Submissions")
+    folders = set()
     if not os.path.exists(base_folder):
-        return 0
-    
-    count = 0
+        return folders
+
     for root, dirs, files in os.walk(base_folder):
         for d in dirs:
             if d.startswith("Submission_"):
-                count += 1
-    return count
+                folders.add(os.path.join(root, d))
+    return folders
+
+def count_submission_folders():
+    """Count total submission folders in Facultative_Submissions"""
+    return len(list_submission_folders())
 
 def count_merged_json_files():
     """Count total merged JSON files"""
@@ -77,7 +231,8 @@ def run_email_receiver():
     mod = _load_module_from_path("email_processor", PATH_TEST2)
     if hasattr(mod, "process_emails"):
         print("[EMAIL] Checking for new emails...")
-        mod.process_emails()
+        with metrics.timed("imap"):
+            mod.process_emails()
         return count_submission_folders()
     else:
         print("[WARN] process_emails() not found in test2.py")
@@ -105,109 +260,105 @@ def run_nlp_processing():
         print("[WARN] process_all_submissions() not found in APItest.py")
         return False
 
-def append_latest_merged_json():
-    """Append all new merged JSONs to sample_input.json, avoiding duplicates."""
-    merged_json_dir = os.path.join(EMAIL_DIR, "nlp2", "merged_json")
-    if not os.path.exists(merged_json_dir):
-        print("[WARN] No merged JSON directory found")
-        return False  # nothing appended
-
-    # Collect all JSON files sorted by modification time
-    json_files = []
-    for root, dirs, files in os.walk(merged_json_dir):
-        for file in files:
-            if file.endswith('.json'):
-                file_path = os.path.join(root, file)
-                json_files.append((file_path, os.path.getmtime(file_path)))
-
-    if not json_files:
-        print("[WARN] No merged JSON files found")
-        return False
-
-    # Sort by newest first
-    json_files.sort(key=lambda x: x[1])
-
-    appended_any = False
-    dest_path = os.path.join(CALC_DIR, "sample_input.json")
-    dest_data = []
-
-    if os.path.isfile(dest_path):
-        try:
-            with open(dest_path, "r", encoding="utf-8") as f:
-                dest_data = json.load(f)
-            if not isinstance(dest_data, list):
-                print("[WARN] Destination JSON is not a list. Starting fresh.")
-                dest_data = []
-        except Exception as e:
-            print(f"[WARN] Failed to read destination JSON, starting new list: {e}")
-            dest_data = []
-
-    for file_path, _ in json_files:
-        if file_path in appended_json_files:
-            continue  # already appended
-
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                data_obj = json.load(f)
-            dest_data.append(data_obj)
-            appended_json_files.add(file_path)
-            appended_any = True
-            print(f"[OK] Appended new merged JSON: {os.path.basename(file_path)}")
-        except Exception as e:
-            print(f"[WARN] Failed to read or append {file_path}: {e}")
-
-    if appended_any:
-        try:
-            with open(dest_path, "w", encoding="utf-8") as f:
-                json.dump(dest_data, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(f"[WARN] Failed to write updated sample_input.json: {e}")
-            appended_any = False
-
-    return appended_any  # return True if new JSONs were added
-
-def run_pipeline():
-    """Run the actuarial pipeline"""
+def make_nlp_stage():
+    """NLP stage: Gemini extraction for one converted folder, returns the merged JSON path"""
+    mod = instrument_gemini(_load_module_from_path("apitest_runner", PATH_APITEST))
+
+    def nlp_submission(extracted_path):
+        print(f"[NLP] Processing {extracted_path}")
+        mod.process_submission(extracted_path)
+        rel_path = os.path.relpath(extracted_path, mod.INPUT_FOLDER)
+        merged_path = os.path.join(mod.OUTPUT_FOLDER, rel_path + ".json")
+        return [merged_path] if os.path.isfile(merged_path) else []
+
+    return nlp_submission
+
+def pipeline_submission(merged_path):
+    """Pipeline stage: add the submission at merged_path to the dataset and decide it"""
+    if merged_path in appended_json_files:
+        return []
+    record = jsonio.load(merged_path)
+    if isinstance(record, dict):
+        # Merged JSON is named after its submission folder
+        record.setdefault("Submission_ID", _submission_id_from_path(merged_path))
+    # Keep sample_input.json's journal complete for full re-runs (one line per submission)
+    jsonio.append_records(os.path.join(CALC_DIR, "sample_input.json"), [record])
+    appended_json_files.add(merged_path)
+    print(f"[EVENT] New submission {os.path.basename(merged_path)}, running pipeline...")
+    warm_up()
+    open_decision_store()
+    with profiling.profiled("run_pipeline"):
+        written = pipeline_module.run_incremental([record], decision_store)
+    publish_decisions(written)
+    return []
+
+def build_stage_executor():
+    """Extract (processes) -> NLP (threads) -> pipeline (single thread), bounded queues"""
+    return stages_module.StagedExecutor([
+        stages_module.Stage("extract", handlers.extract_submission, workers=EXTRACT_WORKERS,
+                            kind="process", maxsize=STAGE_QUEUE_SIZE),
+        stages_module.Stage("nlp", make_nlp_stage(), workers=NLP_WORKERS,
+                            kind="thread", maxsize=STAGE_QUEUE_SIZE),
+        stages_module.Stage("pipeline", pipeline_submission, workers=1,
+                            kind="thread", maxsize=STAGE_QUEUE_SIZE),
+    ], observer=observe_stage)
+
+def run_pipeline(full=False):
+    """Run the actuarial pipeline on new/changed submissions"""
+    with profiling.profiled("run_pipeline"):
+        return _run_pipeline(full)
+
+def _run_pipeline(full):
     global final_path
-    os.makedirs(CALC_DIR, exist_ok=True)
+    warm_up()
+    open_decision_store()
     os.makedirs(FINAL_DIR, exist_ok=True)
 
     input_path = os.path.join(CALC_DIR, "sample_input.json")
-    facultative_path = os.path.join(CALC_DIR, "facultative_reinsurance_calculations.json")
     final_path = os.path.join(FINAL_DIR, "decisions.json")
 
-    # 1. Step 1 - run enrichment (code.py)
-    print("[PIPELINE] Running enrichment...")
+    # Enrichment -> calculator -> decision engine run in-process on one batch;
+    # only submissions not already in the decision store are processed
     risks = code_module.load_input(input_path)
-    enriched_records = [code_module.enrich_risk_record(r) for r in risks]
-    code_module.write_output(facultative_path, enriched_records)
-
-    # 2. Step 2 - run calculator (calculator.py)
-    print("[PIPELINE] Running actuarial calculator...")
-    df = calc_module.load_json_input(facultative_path)
-    calculator = calc_module.FacultativeReinsuranceCalculator()
-    df_calculated = calculator.calculate_all_metrics(df)
-    calc_module.save_json_output(df_calculated, facultative_path)
-
-    # 3. Step 3 - run decision engine (combine.py)
-    print("[PIPELINE] Running decision engine...")
-    with open(facultative_path, "r", encoding="utf-8") as f:
-        calculated_data = json.load(f)
-    decisions = decision_module.score_facultative_risks(calculated_data)
-
-    with open(final_path, "w", encoding="utf-8") as f:
-        json.dump(decisions, f, indent=2)
-
-    print("[OK] Pipeline finished successfully!")
+    written = pipeline_module.run_incremental(risks, decision_store, full=full)
+    return publish_decisions(written)
+
+def publish_decisions(written):
+    """Publish an immutable versioned snapshot when decisions changed; decisions.json is swapped atomically"""
+    global final_path
+    if written or not os.path.isfile(final_path):
+        os.makedirs(FINAL_DIR, exist_ok=True)
+        version, final_path = snapshot_module.publish(decision_store, FINAL_DIR)
+        decision_cache.refresh()
+        print(f"[PIPELINE] Published decisions snapshot v{version}")
+
+    print(f"[OK] Pipeline finished successfully! ({written} submissions updated)")
     return final_path
 
+# Period-in-force index over the published decisions, rebuilt when the version moves
+_in_force = (None, None)
+_in_force_lock = threading.Lock()
+
+
+def in_force_index():
+    global _in_force
+    version, records, _ = decision_cache.get()
+    with _in_force_lock:
+        if _in_force[0] != version:
+            from FINAL import in_force as in_force_module  # numpy; kept off the startup path
+            _in_force = (version, in_force_module.InForceIndex.from_records(records))
+        return _in_force[1]
+
+
 def monitoring_loop():
-    """Background monitoring loop."""
-    global last_submission_count, last_merged_json_count, final_path
+    """Background monitoring loop: polls email and feeds new submissions to the stage executor."""
+    global last_submission_count, last_merged_json_count, final_path, stage_executor
 
     print("[MONITOR] Starting background monitoring...")
+    warm_up()
 
-    last_submission_count = count_submission_folders()
+    seen_submissions = list_submission_folders()
+    last_submission_count = len(seen_submissions)
     last_merged_json_count = count_merged_json_files()
 
     print(f"[MONITOR] Current submissions: {last_submission_count}, merged JSONs: {last_merged_json_count}")
@@ -217,36 +368,72 @@ def monitoring_loop():
         print("[MONITOR] Running initial pipeline...")
         final_path = run_pipeline()
 
-    while True:
-        try:
-            current_submissions = run_email_receiver()
-
-            if current_submissions > last_submission_count:
-                print(f"[EVENT] New submissions detected: {current_submissions - last_submission_count}")
-                last_submission_count = current_submissions
-
-                if run_submission_extractor():
-                    print("[EVENT] Extraction completed, running NLP processing...")
-
-                    if run_nlp_processing():
-                        # Only append and run pipeline if new JSONs are found
-                        if append_latest_merged_json():
-                            print("[EVENT] New JSONs appended, running pipeline...")
-                            final_path = run_pipeline()
-                            print("[EVENT] Pipeline updated with new data")
-                        else:
-                            print("[EVENT] No new JSONs to append, skipping pipeline")
-
-            time.sleep(2)
-
-        except Exception as e:
-            print(f"[ERROR] Monitoring error: {e}")
-            time.sleep(60)
+    if job_store is None:
+        stage_executor = build_stage_executor().start()
+    else:
+        print("[MONITOR] External worker mode: submissions go to the job store")
+
+    def poll_once():
+        global last_submission_count
+        run_email_receiver()
+
+        new_submissions = sorted(list_submission_folders() - seen_submissions)
+        if new_submissions:
+            print(f"[EVENT] New submissions detected: {len(new_submissions)}")
+        base_folder = os.path.join(os.getcwd(), "Facultative_Submissions")
+        for sub_path in new_submissions:
+            if job_store is not None:
+                jobs_module.enqueue_submission(job_store, sub_path, base_folder)
+            else:
+                # Blocks while the extract queue is full (backpressure on email polling)
+                stage_executor.submit(sub_path)
+            seen_submissions.add(sub_path)
+        last_submission_count = len(seen_submissions)
+
+        if job_store is not None:
+            counts = job_store.stats()["stages"].values()
+            in_flight = any(c.get(jobs_module.PENDING) or c.get(jobs_module.LEASED) for c in counts)
+        else:
+            in_flight = any(s["queue_depth"] or s["in_flight"] for s in stage_executor.stats().values())
+        return bool(new_submissions) or in_flight
+
+    monitor_scheduler.run(poll_once)
+    print("[MONITOR] Stopped")
+
+def shutdown():
+    """Stop polling and the stage workers (queued work is dropped, in-flight work finishes)"""
+    monitor_scheduler.stop()
+    if stage_executor is not None:
+        stage_executor.stop(drain=False)
+
+def _handle_sigterm(signum, frame):
+    raise KeyboardInterrupt
+
+class InvalidArgument(ValueError):
+    """A query parameter that cannot be used; answered with a 400"""
+
+def _int_arg(name, default=None, minimum=0):
+    """Integer query parameter (default when absent); InvalidArgument when not an integer >= minimum"""
+    value = request.args.get(name, "").strip()
+    if not value:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise InvalidArgument(f"{name} must be an integer") from None
+    if number < minimum:
+        raise InvalidArgument(f"{name} must be at least {minimum}")
+    return number
 
 def create_app():
     """Create Flask app"""
+    open_decision_store()
     app = Flask(__name__)
 
+    @app.errorhandler(InvalidArgument)
+    def invalid_argument(e):
+        return jsonify({"error": str(e)}), 400
+
     if not os.path.isdir(FRONTEND_DIR):
         print(f"[WARN] Frontend directory not found: {FRONTEND_DIR}")
 
@@ -254,20 +441,148 @@ def create_app():
     def add_cors_headers(response):
         response.headers["Access-Control-Allow-Origin"] = request.headers.get("Origin", "*") or "*"
         response.headers["Vary"] = "Origin"
-        response.headers["Access-Control-Allow-Methods"] = "GET, OPTIONS"
-        response.headers["Access-Control-Allow-Headers"] = "Content-Type"
+        response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
+        response.headers["Access-Control-Allow-Headers"] = "Content-Type, X-Admin-Token"
         return response
 
     @app.route("/api/decisions", methods=["GET", "OPTIONS"])
     def api_decisions():
         if request.method == "OPTIONS":
             return ("", 204)
-        try:
-            with open(final_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except FileNotFoundError:
-            return jsonify({"error": "decisions.json not found"}), 404
-        return jsonify(data)
+        filters = {
+            key: request.args.get(key)
+            for key in ("cedant", "broker", "decision", "currency", "period_from", "period_to", "created_since")
+        }
+        filters["limit"] = _int_arg("limit", minimum=1)
+        if any(filters.values()):
+            return jsonify(decision_store.query(**filters))
+
+        # Unfiltered: serve the in-memory snapshot without touching disk
+        version, _, payload = decision_cache.get()
+        etag = f'"decisions-v{version}"'
+        if request.headers.get("If-None-Match") == etag:
+            return ("", 304)
+        response = Response(payload, mimetype="application/json")
+        response.headers["ETag"] = etag
+        return response
+
+    @app.route("/api/stages", methods=["GET"])
+    def api_stages():
+        if stage_executor is None:
+            return jsonify({})
+        return jsonify(stage_executor.stats())
+
+    @app.route("/api/jobs", methods=["GET"])
+    def api_jobs():
+        if job_store is None:
+            return jsonify({"mode": JOB_WORKER_MODE, "stages": {}, "expired_leases": 0})
+        return jsonify({"mode": JOB_WORKER_MODE, **job_store.stats()})
+
+    @app.route("/metrics", methods=["GET"])
+    def prometheus_metrics():
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+    @app.route("/api/traces", methods=["GET"])
+    def api_traces():
+        return jsonify(metrics.recent_traces(limit=_int_arg("limit", 50, minimum=1)))
+
+    @app.route("/api/traces/<submission_id>", methods=["GET"])
+    def api_trace(submission_id):
+        trace = metrics.get_trace(submission_id)
+        if trace is None:
+            return jsonify({"error": f"no trace for {submission_id}"}), 404
+        return jsonify(trace)
+
+    def _admin_denied():
+        """Error response unless the request carries ADMIN_TOKEN (admin endpoints are off without one)"""
+        if not ADMIN_TOKEN:
+            return jsonify({"error": "admin endpoints are disabled, set ADMIN_TOKEN"}), 403
+        if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN):
+            return jsonify({"error": "forbidden"}), 403
+        return None
+
+    @app.route("/api/profiles", methods=["GET"])
+    def api_profiles():
+        denied = _admin_denied()
+        if denied:
+            return denied
+        return jsonify({
+            "status": profiling.status(),
+            "profiles": profiling.list_profiles(limit=_int_arg("limit", 20, minimum=1)),
+        })
+
+    @app.route("/api/profiles/enable", methods=["POST"])
+    def api_profiles_enable():
+        denied = _admin_denied()
+        if denied:
+            return denied
+        body = request.get_json(silent=True) or {}
+        stages = body.get("stages") or ["all"]
+        if not isinstance(stages, list) or not all(isinstance(s, str) for s in stages):
+            return jsonify({"error": "stages must be a list of stage names"}), 400
+        return jsonify(profiling.enable(stages, memory=body.get("memory", False)))
+
+    @app.route("/api/profiles/disable", methods=["POST"])
+    def api_profiles_disable():
+        denied = _admin_denied()
+        if denied:
+            return denied
+        return jsonify(profiling.disable())
+
+    @app.route("/api/monitor", methods=["GET"])
+    def api_monitor():
+        return jsonify(monitor_scheduler.status())
+
+    @app.route("/api/health", methods=["GET"])
+    def api_health():
+        version, records, _ = decision_cache.get()
+        return jsonify({
+            "status": "ok",
+            "pipeline_warm": pipeline_module is not None,
+            "snapshot_version": version,
+            "decisions": len(records),
+            "startup_seconds": startup_times,
+        })
+
+    @app.route("/api/monitor/poll", methods=["POST"])
+    def api_monitor_poll():
+        monitor_scheduler.wake()
+        return jsonify({"status": "poll scheduled"}), 202
+
+    @app.route("/api/decisions/summary", methods=["GET"])
+    def api_decisions_summary():
+        return jsonify(decision_store.summary())
+
+    @app.route("/api/exposure", methods=["GET"])
+    def api_exposure():
+        """In-force liability on a date, its peak over a window and risks expiring soon."""
+        from FINAL import in_force as in_force_module
+        index = in_force_index()
+        as_of = in_force_module.to_day(request.args.get("date") or date.today().isoformat())
+        first = in_force_module.to_day(request.args.get("from")) if request.args.get("from") else as_of
+        last = in_force_module.to_day(request.args.get("to")) if request.args.get("to") else None
+        if last is None and first is not None and not request.args.get("to"):
+            last = first + 365
+        if as_of is None or first is None or last is None or last < first:
+            return jsonify({"error": "invalid date, from or to"}), 400
+        expiring_days = _int_arg("expiring_days", 30)
+        peak, peak_date = index.peak(first, last)
+        return jsonify({
+            "as_of": in_force_module.from_day(as_of),
+            "accepted_risks": len(index),
+            "in_force_liability_kes": index.exposure_on(as_of),
+            "peak": {
+                "from": in_force_module.from_day(first),
+                "to": in_force_module.from_day(last),
+                "liability_kes": peak,
+                "date": peak_date,
+            },
+            "expiring": [
+                {"Submission_ID": sid, "Period_End": end, "Accepted_Liability_KES": liability}
+                for sid, end, liability in index.expiring(as_of, expiring_days)
+            ],
+            "profile": index.profile(first, last, _int_arg("step_days", 30, minimum=1)),
+        })
 
     @app.route("/")
     def serve_index():
@@ -285,21 +600,30 @@ def create_app():
 
 if __name__ == "__main__":
     print("[STARTUP] Initializing system...")
-    
+    open_decision_store()
+
     # Start monitoring in background thread
     monitor_thread = threading.Thread(target=monitoring_loop, daemon=True)
     monitor_thread.start()
     
-    # Create and run Flask app
+    # Create and run Flask app, serving the last persisted snapshot right away
     app = create_app()
+    decision_cache.refresh()
+    _mark_startup("api_ready")
     
     print("\n[WEB] Server starting at: http://127.0.0.1:5000")
     print(f"   Serving frontend from: {FRONTEND_DIR}")
-    print("   API: /api/decisions")
-    print("   Monitoring: Background thread (every 30s)")
+    print("   API: /api/decisions (filters: cedant, broker, decision, currency, period_from, period_to, created_since)")
+    print(f"   Monitoring: Background thread (every {monitor_scheduler.min_interval:g}-{monitor_scheduler.max_interval:g}s, adaptive)")
     print("   Press Ctrl+C to stop")
-    
+
+    # SIGTERM (e.g. from a process manager) shuts down like Ctrl+C
+    signal.signal(signal.SIGTERM, _handle_sigterm)
+
     try:
         app.run(host='0.0.0.0', port=5000, debug=False, use_reloader=False)
     except KeyboardInterrupt:
         print("\n[SHUTDOWN] Server stopped by user")
+    finally:
+        shutdown()
+        monitor_thread.join(timeout=10)
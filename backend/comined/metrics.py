@@ -0,0 +1,246 @@
+"""In-process metrics (Prometheus text format) and per-submission stage traces.
+
+Counters, gauges and histograms live in a module-level registry so any
+part of the backend can record into them; render() produces the text the
+/metrics endpoint serves. Collectors registered with add_collector() are
+called at scrape time for values owned elsewhere (queue depth, caches).
+Traces keep the stage timings of the most recent submissions in memory.
+"""
+import functools
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+PREFIX = "cedasense"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+MAX_TRACES = 500
+
+_lock = threading.Lock()
+_metrics = OrderedDict()  # name -> metric
+_collectors = []
+
+
+def _label_text(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + list(extra or [])
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        return [(self.name, self.labelnames, k, None, v) for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with _lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        return [(self.name, self.labelnames, k, None, v) for k, v in self._values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            counts, total, n = self._values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value, n + 1)
+
+    def samples(self):
+        out = []
+        for key, (counts, total, n) in self._values.items():
+            for bound, count in zip(self.buckets, counts):
+                out.append((self.name + "_bucket", self.labelnames, key, ("le", _format_value(bound)), count))
+            out.append((self.name + "_sum", self.labelnames, key, None, total))
+            out.append((self.name + "_count", self.labelnames, key, None, n))
+        return out
+
+
+def _register(metric):
+    with _lock:
+        existing = _metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        _metrics[metric.name] = metric
+        return metric
+
+
+def counter(name, help_text, labelnames=()):
+    return _register(Counter(f"{PREFIX}_{name}", help_text, labelnames))
+
+
+def gauge(name, help_text, labelnames=()):
+    return _register(Gauge(f"{PREFIX}_{name}", help_text, labelnames))
+
+
+def histogram(name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return _register(Histogram(f"{PREFIX}_{name}", help_text, labelnames, buckets))
+
+
+def add_collector(fn):
+    """fn() -> iterable of (name, help, type, {labels}, value), called at scrape time."""
+    _collectors.append(fn)
+    return fn
+
+
+# Standard instruments shared by every stage and external call
+STAGE_CALLS = counter("stage_calls_total", "Stage and external call invocations", ("stage", "outcome"))
+STAGE_LATENCY = histogram("stage_duration_seconds", "Stage and external call latency", ("stage",))
+STAGE_IN_FLIGHT = gauge("stage_in_flight", "Calls currently executing", ("stage",))
+BYTES_PROCESSED = counter("bytes_processed_total", "Input bytes processed", ("stage",))
+LLM_TOKENS = counter("llm_tokens_total", "LLM tokens consumed", ("model", "kind"))
+CACHE_REQUESTS = counter("cache_requests_total", "Cache lookups", ("cache", "result"))
+
+
+def record_call(stage, seconds, ok=True):
+    STAGE_CALLS.inc(stage=stage, outcome="ok" if ok else "error")
+    STAGE_LATENCY.observe(seconds, stage=stage)
+
+
+@contextmanager
+def timed(stage):
+    """Time a block as one call of `stage` (latency, outcome, in-flight)."""
+    STAGE_IN_FLIGHT.inc(stage=stage)
+    start = time.perf_counter()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        STAGE_IN_FLIGHT.dec(stage=stage)
+        record_call(stage, time.perf_counter() - start, ok)
+
+
+def instrument(owner, attr, stage):
+    """Replace owner.attr (module function or class method) with a timed wrapper."""
+    original = getattr(owner, attr)
+    if getattr(original, "_metrics_stage", None):
+        return original
+
+    @functools.wraps(original)
+    def wrapper(*args, **kwargs):
+        with timed(stage):
+            return original(*args, **kwargs)
+
+    wrapper._metrics_stage = stage
+    setattr(owner, attr, wrapper)
+    return wrapper
+
+
+def render():
+    """All metrics in Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        metrics = list(_metrics.values())
+        snapshots = [(m, m.samples()) for m in metrics]
+    for metric, samples in snapshots:
+        lines.extend(metric.header())
+        for name, labelnames, key, extra, value in samples:
+            lines.append(f"{name}{_label_text(labelnames, key, [extra] if extra else None)} {_format_value(value)}")
+
+    seen = set()
+    for collect in list(_collectors):
+        try:
+            samples = list(collect())
+        except Exception as e:
+            print(f"[WARN] Metrics collector failed: {e}")
+            continue
+        for name, help_text, kind, labels, value in samples:
+            full = f"{PREFIX}_{name}"
+            if full not in seen:
+                lines.extend([f"# HELP {full} {help_text}", f"# TYPE {full} {kind}"])
+                seen.add(full)
+            lines.append(f"{full}{_label_text(list(labels), list(labels.values()))} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# --------------------------
+# Per-submission traces
+# --------------------------
+
+_traces = OrderedDict()  # submission_id -> list of span dicts
+
+
+def record_span(submission_id, stage, started_at, seconds, ok=True):
+    span = {
+        "stage": stage,
+        "started_at": round(started_at, 3),
+        "duration_seconds": round(seconds, 4),
+        "ok": ok,
+    }
+    with _lock:
+        spans = _traces.pop(submission_id, [])
+        spans.append(span)
+        _traces[submission_id] = spans
+        while len(_traces) > MAX_TRACES:
+            _traces.popitem(last=False)
+
+
+def get_trace(submission_id):
+    with _lock:
+        spans = list(_traces.get(submission_id, []))
+    if not spans:
+        return None
+    return {
+        "submission_id": submission_id,
+        "total_seconds": round(sum(s["duration_seconds"] for s in spans), 4),
+        "spans": spans,
+    }
+
+
+def recent_traces(limit=50):
+    with _lock:
+        ids = list(_traces.keys())[-limit:]
+    return [get_trace(sid) for sid in reversed(ids)]
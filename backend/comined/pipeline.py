@@ -0,0 +1,198 @@
+"""In-process composition of the actuarial pipeline stages.
+
+Every stage takes a batch of risk records (list of dicts) and returns the
+processed batch, so enrichment -> calculator -> decision engine run over the
+same records in memory. Only the final batch is persisted (to the decision
+store, see run_incremental); set PIPELINE_SNAPSHOT_DIR to also dump the
+batch after each stage for debugging.
+"""
+import functools
+import os
+import sys
+import threading
+import time
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from apis import code as code_module
+from calculations import calculator as calc_module
+from calculations import jsonio
+from calculations import schema
+from FINAL import accumulation as accumulation_module
+from FINAL import combine as decision_module
+from FINAL import in_force as in_force_module
+from FINAL import portfolio as portfolio_module
+from FINAL import store as store_module
+from comined import metrics
+from comined import profiling
+
+# Optional directory for per-stage debug snapshots (disabled when empty)
+SNAPSHOT_DIR = os.getenv("PIPELINE_SNAPSHOT_DIR", "").strip()
+
+
+def enrich_stage(records, portfolio=None, to_kes=None):
+    """Step 1 - CAT, climate/ESG, market and portfolio enrichment (code.py)"""
+    return code_module.enrich_records(records, portfolio=portfolio, to_kes=to_kes)
+
+
+def calculate_stage(records, calculator=None):
+    """Step 2 - actuarial metrics (calculator.py)"""
+    if calculator is None:
+        calculator = calc_module.FacultativeReinsuranceCalculator()
+    # Typed columns (schema.py): categorical currency codes, float64 amounts, datetime64 policy dates
+    df = schema.typed_frame(records)
+    df_calculated = calculator.calculate_all_metrics(df)
+    return schema.records_from_frame(df_calculated, records)
+
+
+def decide_stage(records, accumulation=None, in_force=None):
+    """Step 3 - decision engine (combine.py)"""
+    return decision_module.score_facultative_risks(records, accumulation=accumulation, in_force=in_force)
+
+
+STAGES = [
+    ("enrichment", enrich_stage),
+    ("calculator", calculate_stage),
+    ("decision", decide_stage),
+]
+
+# Bump a stage's version when its rules or formulas change; stored rows
+# produced by an older version are picked up by `cli.py rerun`.
+STAGE_VERSIONS = {
+    "enrichment": "4",
+    "calculator": "1",
+    "decision": "3",
+}
+
+
+def bind_stages(portfolio=None, calculator=None, stage_names=None, accumulation=None, in_force=None):
+    """STAGES with the running books (portfolio, accumulation, in-force) and one shared calculator bound in.
+
+    The calculator's FX rates also convert TSI to KES for the portfolio
+    concentration check, at the rate on the same policy date
+    (calculator.fx_date_field), so both stages see the same rate.
+    """
+    if calculator is None:
+        calculator = calc_module.FacultativeReinsuranceCalculator()
+
+    def to_kes(amount, currency, record):
+        on_date = record.get(calculator.fx_date_field) if calculator.fx_date_field else None
+        return calculator.convert_currency(amount, currency, "KES", on_date=on_date)
+
+    bound = {
+        "enrichment": functools.partial(enrich_stage, portfolio=portfolio, to_kes=to_kes),
+        "calculator": functools.partial(calculate_stage, calculator=calculator),
+        "decision": functools.partial(decide_stage, accumulation=accumulation, in_force=in_force),
+    }
+    return [
+        (name, bound.get(name, stage)) for name, stage in STAGES
+        if stage_names is None or name in stage_names
+    ]
+
+
+# Running books per decision store, rebuilt when another process wrote to it
+_books = {}
+_books_lock = threading.Lock()
+
+
+def books_for(store):
+    """(PortfolioAccumulator, AccumulationIndex, InForceIndex) over the store's accepted decisions."""
+    with _books_lock:
+        cached = _books.get(store.path)
+        version = store.version()
+        if cached is None or cached[0] != version:
+            accepted = store.query(decision="Accept")
+            cached = (
+                version,
+                portfolio_module.PortfolioAccumulator.from_records(accepted),
+                accumulation_module.AccumulationIndex.from_records(accepted),
+                in_force_module.InForceIndex.from_records(accepted),
+            )
+            _books[store.path] = cached
+            print(f"[PIPELINE] Portfolio book loaded: {len(cached[1])} accepted risks")
+        return cached[1:]
+
+
+def _record_decisions(store, portfolio, decisions, committed_version):
+    # The accumulation and in-force indexes were already updated by the decision stage
+    with _books_lock:
+        for decision in decisions:
+            portfolio.apply_decision(decision)
+        cached = _books.get(store.path)
+        if cached is None or cached[1] is not portfolio:
+            return
+        if committed_version is not None and committed_version == cached[0] + 1:
+            _books[store.path] = (committed_version,) + cached[1:]
+        else:
+            # Another process wrote in between; its rows are not in these books
+            _books.pop(store.path, None)
+
+
+def write_snapshot(snapshot_dir, index, stage_name, records):
+    """Dump the batch as it left a stage, e.g. 02_calculator.json"""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    path = os.path.join(snapshot_dir, f"{index:02d}_{stage_name}.json")
+    jsonio.dump(records, path)
+    print(f"[PIPELINE] Snapshot written: {path}")
+    return path
+
+
+def run_stages(records, stages=None, snapshot_dir=None):
+    """Pass one record batch through every stage and return the final batch (schema.RiskRecord objects)."""
+    if snapshot_dir is None:
+        snapshot_dir = SNAPSHOT_DIR
+    # The one validated conversion of the raw input dicts
+    records = schema.ingest(records)
+    for index, (name, stage) in enumerate(stages or STAGES, start=1):
+        print(f"[PIPELINE] Running {name}...")
+        started_at, start = time.time(), time.perf_counter()
+        with metrics.timed(name), profiling.profiled(name):
+            records = stage(records)
+        seconds = time.perf_counter() - start
+        for record in records:
+            if record.get("Submission_ID"):
+                metrics.record_span(record["Submission_ID"], name, started_at, seconds)
+        if snapshot_dir:
+            write_snapshot(snapshot_dir, index, name, records)
+    return records
+
+
+def run_incremental(records, store, full=False, snapshot_dir=None, force_ids=None):
+    """Run only new or changed submissions through the stages and upsert them.
+
+    Records are keyed by Submission_ID (content-derived for legacy inputs);
+    anything whose extracted fields already match the store is skipped
+    unless full=True or its ID is in force_ids. Returns the number of rows
+    written.
+    """
+    known = {} if full else store.known_hashes()
+    force_ids = set(force_ids or ())
+    pending = {}
+    for record in records:
+        sid = store_module.submission_id_for(record)
+        if sid not in force_ids and known.get(sid) == store_module.extracted_hash(record):
+            continue
+        pending[sid] = dict(record, Submission_ID=sid)
+
+    print(f"[PIPELINE] {len(pending)} new/changed of {len(records)} submissions")
+    if not pending:
+        return 0
+
+    portfolio, accumulation, in_force = books_for(store)
+    stages = bind_stages(portfolio, accumulation=accumulation, in_force=in_force)
+    decisions = run_stages(list(pending.values()), stages=stages, snapshot_dir=snapshot_dir)
+    try:
+        written, committed_version = store.upsert_records(decisions, stage_versions=STAGE_VERSIONS)
+    except Exception:
+        # The decision stage already booked this batch into the cached indexes;
+        # drop them so the next run rebuilds from what the store actually holds
+        with _books_lock:
+            _books.pop(store.path, None)
+        raise
+    # Accepted risks join the book, declined or reversed ones leave it
+    _record_decisions(store, portfolio, decisions, committed_version)
+    return written
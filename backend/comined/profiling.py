@@ -0,0 +1,142 @@
+"""Opt-in cProfile / tracemalloc hooks around pipeline stages.
+
+Profiling is off unless PROFILE_STAGES lists stage names (comma separated,
+or "all") or enable() is called at runtime (see /api/profiles/enable).
+Each profiled call writes <timestamp>_<stage>.prof (pstats format) and, with
+memory profiling on, <timestamp>_<stage>.mem.txt with the top allocation
+sites into PROFILE_DIR. Only one profile runs at a time; calls nested inside
+an active profile or overlapping with one are simply not profiled.
+"""
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(BACKEND_DIR, "profiles"))
+TOP_ALLOCATIONS = 25
+
+_config = {
+    "stages": {s.strip() for s in os.getenv("PROFILE_STAGES", "").split(",") if s.strip()},
+    "memory": os.getenv("PROFILE_MEMORY", "").strip().lower() in ("1", "true", "yes"),
+}
+_active = threading.Lock()
+
+
+def enable(stages, memory=False):
+    """Profile the given stage names ("all" for every wrapped stage)."""
+    _config["stages"] = {s.strip() for s in stages if s and s.strip()}
+    _config["memory"] = bool(memory)
+    return status()
+
+
+def disable():
+    _config["stages"] = set()
+    _config["memory"] = False
+    return status()
+
+
+def status():
+    return {"stages": sorted(_config["stages"]), "memory": _config["memory"], "profile_dir": PROFILE_DIR}
+
+
+def is_enabled(stage):
+    stages = _config["stages"]
+    return "all" in stages or stage in stages
+
+
+def _write_memory_report(path, snapshot):
+    stats = snapshot.statistics("lineno")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"Top {TOP_ALLOCATIONS} allocation sites (tracemalloc, by line)\n")
+        for stat in stats[:TOP_ALLOCATIONS]:
+            f.write(f"{stat}\n")
+        f.write(f"\nTotal traced: {sum(s.size for s in stats) / 1024:.1f} KiB\n")
+
+
+@contextmanager
+def profiled(stage):
+    """Profile the block if `stage` is enabled and no other profile is running."""
+    if not is_enabled(stage) or not _active.acquire(blocking=False):
+        yield
+        return
+
+    memory = _config["memory"]
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            base = os.path.join(PROFILE_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{stage}")
+            profiler.dump_stats(base + ".prof")
+            if memory:
+                _write_memory_report(base + ".mem.txt", tracemalloc.take_snapshot())
+            print(f"[PROFILE] {stage} -> {base}.prof")
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+        _active.release()
+
+
+def wrap(owner, attr, stage):
+    """Replace owner.attr with a version that runs under profiled(stage)."""
+    original = getattr(owner, attr)
+    if getattr(original, "_profiled_stage", None):
+        return original
+
+    @functools.wraps(original)
+    def wrapper(*args, **kwargs):
+        with profiled(stage):
+            return original(*args, **kwargs)
+
+    wrapper._profiled_stage = stage
+    setattr(owner, attr, wrapper)
+    return wrapper
+
+
+def top_functions(prof_path, limit=10):
+    """Top functions by cumulative time from a .prof file."""
+    stats = pstats.Stats(prof_path, stream=io.StringIO())
+    rows = []
+    for (filename, line, func), (cc, nc, tt, ct, callers) in stats.stats.items():
+        rows.append({
+            "function": f"{os.path.basename(filename)}:{line}({func})",
+            "calls": nc,
+            "total_seconds": round(tt, 6),
+            "cumulative_seconds": round(ct, 6),
+        })
+    rows.sort(key=lambda r: r["cumulative_seconds"], reverse=True)
+    return rows[:limit]
+
+
+def list_profiles(limit=20, top=10):
+    """Most recent profiles, newest first, with their top functions."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    names = sorted((n for n in os.listdir(PROFILE_DIR) if n.endswith(".prof")), reverse=True)[:limit]
+    profiles = []
+    for name in names:
+        path = os.path.join(PROFILE_DIR, name)
+        mem_path = path[:-len(".prof")] + ".mem.txt"
+        try:
+            functions = top_functions(path, top)
+        except Exception as e:
+            functions = [{"error": str(e)}]
+        profiles.append({
+            "file": name,
+            "stage": name[len("YYYYmmdd_HHMMSS_ffffff_"):-len(".prof")],
+            "memory_report": os.path.basename(mem_path) if os.path.isfile(mem_path) else None,
+            "top_functions": functions,
+        })
+    return profiles
@@ -0,0 +1,127 @@
+"""Adaptive poll scheduler for the monitoring loop.
+
+Polls fast while there is work in flight, backs off geometrically while the
+inbox is quiet, and applies exponential backoff with jitter per failure
+class (provider throttling, transient network errors, anything else) instead
+of a fixed stall. wake() triggers the next poll immediately and stop() ends
+run() at the next wait.
+"""
+import imaplib
+import random
+import socket
+import ssl
+import threading
+
+THROTTLE_MARKERS = ("429", "rate limit", "too many", "quota", "resource_exhausted", "throttl")
+
+# failure class -> (base delay, max delay) in seconds
+DEFAULT_BACKOFF = {
+    "throttled": (30.0, 900.0),
+    "transient": (2.0, 120.0),
+    "error": (10.0, 300.0),
+}
+
+# Network and timeout failures only; other OSErrors (permissions, missing
+# files, disk full) are not retried as transient so they surface
+TRANSIENT_ERRORS = (ConnectionError, TimeoutError, socket.timeout, socket.gaierror,
+                    imaplib.IMAP4.abort, ssl.SSLError)
+
+
+def classify_failure(exc):
+    """Map an exception to 'throttled', 'transient' or 'error'."""
+    response = getattr(exc, "response", None)
+    if getattr(response, "status_code", None) == 429 or getattr(exc, "code", None) == 429:
+        return "throttled"
+    text = str(exc).lower()
+    if any(marker in text for marker in THROTTLE_MARKERS):
+        return "throttled"
+    if isinstance(exc, TRANSIENT_ERRORS) and not isinstance(exc, ssl.SSLCertVerificationError):
+        return "transient"
+    return "error"
+
+
+class PollScheduler:
+    def __init__(self, min_interval=2.0, max_interval=60.0, idle_factor=1.5,
+                 jitter=0.2, backoff=None):
+        self.min_interval = float(min_interval)
+        self.max_interval = max(float(max_interval), self.min_interval)
+        self.idle_factor = max(1.0, float(idle_factor))
+        self.jitter = max(0.0, min(1.0, float(jitter)))
+        self.backoff = dict(DEFAULT_BACKOFF, **(backoff or {}))
+        self.interval = self.min_interval
+        self.failures = {}  # failure class -> consecutive count
+        self.last_failure = None
+        self._next_delay = 0.0
+        # wake() sets _woken under the condition so a wake is never lost
+        # between a wait returning and the flag being reset
+        self._cond = threading.Condition()
+        self._woken = False
+        self._stop = threading.Event()
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    def wake(self):
+        """Run the next poll now (e.g. a new event or an admin request)."""
+        with self._cond:
+            self._woken = True
+            self._cond.notify_all()
+
+    def stop(self):
+        self._stop.set()
+        self.wake()
+
+    def _jittered(self, delay):
+        return delay * random.uniform(1.0 - self.jitter, 1.0 + self.jitter)
+
+    def record_success(self, busy):
+        """Busy polls reset to the fast interval; idle polls stretch it."""
+        self.failures.clear()
+        self.last_failure = None
+        if busy:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * self.idle_factor)
+        self._next_delay = self._jittered(self.interval)
+        return self._next_delay
+
+    def record_failure(self, exc):
+        kind = classify_failure(exc)
+        count = self.failures.get(kind, 0) + 1
+        self.failures[kind] = count
+        base, cap = self.backoff[kind]
+        delay = min(cap, base * (2 ** (count - 1)))
+        # Equal jitter: at least half the backoff, spread the rest
+        self._next_delay = delay / 2.0 + random.uniform(0.0, delay / 2.0)
+        self.last_failure = {"kind": kind, "consecutive": count, "error": str(exc),
+                             "retry_in_seconds": round(self._next_delay, 2)}
+        return self._next_delay
+
+    def wait(self):
+        """Sleep until the next poll, a wake() or stop(); returns False once stopped."""
+        with self._cond:
+            if not self._woken and not self._stop.is_set():
+                self._cond.wait(timeout=self._next_delay)
+            self._woken = False
+        return not self._stop.is_set()
+
+    def run(self, tick):
+        """Call tick() until stop(); tick returns True when there is work in flight."""
+        while not self._stop.is_set():
+            try:
+                busy = tick()
+                self.record_success(bool(busy))
+            except Exception as e:
+                delay = self.record_failure(e)
+                print(f"[ERROR] Monitoring error ({self.last_failure['kind']}): {e}; retrying in {delay:.1f}s")
+            if not self.wait():
+                break
+
+    def status(self):
+        return {
+            "interval_seconds": round(self.interval, 2),
+            "next_delay_seconds": round(self._next_delay, 2),
+            "stopped": self.stopped,
+            "last_failure": self.last_failure,
+        }
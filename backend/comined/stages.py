@@ -0,0 +1,151 @@
+"""Staged executor: per-stage worker pools connected by bounded queues.
+
+Each Stage has a handler(item) -> list of items for the next stage. Thread
+stages run the handler directly (IMAP, LLM calls); process stages hand it to
+a ProcessPoolExecutor (CPU-bound parsing) so the handler must be a picklable
+top-level function. Queues are bounded, so a slow stage makes upstream
+submit() calls block instead of piling up work.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+_STOP = object()
+
+
+class Stage:
+    def __init__(self, name, handler, workers=1, kind="thread", maxsize=16):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown stage kind: {kind}")
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.kind = kind
+        self.queue = queue.Queue(maxsize=max(1, int(maxsize)))
+        self.pool = None
+        self.threads = []
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+        self.last_wait_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def oldest_age(self):
+        """Seconds the head of the queue has been waiting (0 when empty)."""
+        with self.queue.mutex:
+            if not self.queue.queue:
+                return 0.0
+            head = self.queue.queue[0]
+        return 0.0 if head is _STOP else time.monotonic() - head[0]
+
+    def stats(self):
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "failed": self.failed,
+            "lag_seconds": round(self.oldest_age(), 3),
+            "last_wait_seconds": round(self.last_wait_seconds, 3),
+        }
+
+
+class StagedExecutor:
+    def __init__(self, stages, observer=None):
+        """observer(stage_name, item, started_at, seconds, ok) is called after every item."""
+        if not stages:
+            raise ValueError("StagedExecutor needs at least one stage")
+        self.stages = list(stages)
+        self.observer = observer
+        self._started = False
+
+    def start(self):
+        if self._started:
+            return self
+        for index, stage in enumerate(self.stages):
+            if stage.kind == "process":
+                stage.pool = ProcessPoolExecutor(max_workers=stage.workers)
+            downstream = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            for n in range(stage.workers):
+                t = threading.Thread(
+                    target=self._worker, args=(stage, downstream),
+                    name=f"stage-{stage.name}-{n}", daemon=True,
+                )
+                t.start()
+                stage.threads.append(t)
+        self._started = True
+        return self
+
+    def submit(self, item, timeout=None):
+        """Queue an item for the first stage; blocks while that queue is full."""
+        self.stages[0].queue.put((time.monotonic(), item), timeout=timeout)
+
+    def _worker(self, stage, downstream):
+        while True:
+            entry = stage.queue.get()
+            if entry is _STOP:
+                stage.queue.task_done()
+                return
+            enqueued_at, item = entry
+            with stage._lock:
+                stage.in_flight += 1
+                stage.last_wait_seconds = time.monotonic() - enqueued_at
+            started_at, start = time.time(), time.perf_counter()
+            ok = False
+            try:
+                if stage.pool is not None:
+                    outputs = stage.pool.submit(stage.handler, item).result()
+                else:
+                    outputs = stage.handler(item)
+                for out in outputs or []:
+                    if downstream is not None:
+                        downstream.queue.put((time.monotonic(), out))
+                with stage._lock:
+                    stage.processed += 1
+                ok = True
+            except Exception as e:
+                with stage._lock:
+                    stage.failed += 1
+                print(f"[ERROR] Stage '{stage.name}' failed on {item}: {e}")
+            finally:
+                with stage._lock:
+                    stage.in_flight -= 1
+                if self.observer is not None:
+                    try:
+                        self.observer(stage.name, item, started_at, time.perf_counter() - start, ok)
+                    except Exception as e:
+                        print(f"[WARN] Stage observer failed: {e}")
+                stage.queue.task_done()
+
+    def join(self):
+        """Wait until every queued item has passed through all stages."""
+        for stage in self.stages:
+            stage.queue.join()
+
+    def stop(self, drain=True):
+        if not self._started:
+            return
+        if drain:
+            self.join()
+        else:
+            # Drop queued work; items already in a handler still finish
+            for stage in self.stages:
+                with stage.queue.mutex:
+                    stage.queue.queue.clear()
+                    stage.queue.not_full.notify_all()
+        for stage in self.stages:
+            for _ in stage.threads:
+                stage.queue.put(_STOP)
+            for t in stage.threads:
+                t.join(timeout=5)
+            stage.threads = []
+            if stage.pool is not None:
+                stage.pool.shutdown(wait=drain)
+                stage.pool = None
+        self._started = False
+
+    def stats(self):
+        return {stage.name: stage.stats() for stage in self.stages}
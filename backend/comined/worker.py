@@ -0,0 +1,195 @@
+"""Standalone pipeline worker that claims submissions from the shared job store.
+
+Run as many of these as needed, on one host or several sharing the backend
+directory (job store, decision store and submission folders):
+
+    python backend/comined/worker.py --worker-id host-a-1
+    python backend/comined/worker.py --stages nlp --lease 600
+
+With JOB_WORKER_MODE=external the monitor in main.py only polls email and
+enqueues "extract" jobs. A worker runs extract -> nlp -> decide, each stage
+as its own job, so a crash loses at most one stage: the lease expires and
+another worker re-claims it.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(CURRENT_DIR)
+FINAL_DIR = os.path.join(PROJECT_ROOT, "FINAL")
+PATH_SUBMISSION_EXTRACTOR = os.path.join(PROJECT_ROOT, "email", "submission_extractor.py")
+PATH_APITEST = os.path.join(PROJECT_ROOT, "nlp2", "APItest.py")
+
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from comined import jobs as jobs_module
+from comined import pipeline as pipeline_module
+from FINAL import store as store_module
+from FINAL import snapshot as snapshot_module
+
+STAGES = ("extract", "nlp", "decide")
+LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+IDLE_SLEEP = float(os.getenv("JOB_IDLE_SECONDS", "2"))
+
+
+def _load_module_from_path(module_name, file_path):
+    spec = importlib.util.spec_from_file_location(module_name, file_path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"Cannot load module {module_name} from {file_path}")
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def _submission_id_from_path(path):
+    return os.path.splitext(os.path.basename(path.rstrip(os.sep)))[0]
+
+
+class Worker:
+    def __init__(self, job_store, decision_store, worker_id=None, stages=STAGES,
+                 lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS, final_dir=FINAL_DIR):
+        self.job_store = job_store
+        self.decision_store = decision_store
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.stages = list(stages)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.final_dir = final_dir
+        self.handlers = {"extract": self.extract, "nlp": self.nlp, "decide": self.decide}
+        self._stop = threading.Event()
+        self._modules = {}
+
+    def _module(self, name, path):
+        if name not in self._modules:
+            self._modules[name] = _load_module_from_path(name, path)
+        return self._modules[name]
+
+    # --------------------------
+    # Stage handlers: payload -> list of (stage, payload) follow-up jobs
+    # --------------------------
+
+    def extract(self, payload):
+        mod = self._module("submission_extractor", PATH_SUBMISSION_EXTRACTOR)
+        sub_path = payload["path"]
+        out_path = os.path.join(mod.OUTPUT_FOLDER, os.path.relpath(sub_path, payload["root"]))
+        print(f"[WORKER] extract {sub_path} -> {out_path}")
+        mod.process_submission_folder(sub_path, out_path)
+        return [("nlp", {"path": out_path})]
+
+    def nlp(self, payload):
+        mod = self._module("apitest_runner", PATH_APITEST)
+        extracted_path = payload["path"]
+        print(f"[WORKER] nlp {extracted_path}")
+        mod.process_submission(extracted_path)
+        merged_path = os.path.join(mod.OUTPUT_FOLDER, os.path.relpath(extracted_path, mod.INPUT_FOLDER) + ".json")
+        if not os.path.isfile(merged_path):
+            raise RuntimeError(f"NLP produced no merged JSON for {extracted_path}")
+        return [("decide", {"path": merged_path})]
+
+    def decide(self, payload):
+        merged_path = payload["path"]
+        with open(merged_path, "r", encoding="utf-8") as f:
+            record = json.load(f)
+        if isinstance(record, dict):
+            record.setdefault("Submission_ID", _submission_id_from_path(merged_path))
+        written = pipeline_module.run_incremental([record], self.decision_store)
+        if written:
+            self.publish()
+        return []
+
+    def publish(self):
+        # Several workers may publish at once; skip if a newer snapshot is already out
+        published, _ = snapshot_module.latest_snapshot(self.final_dir)
+        if published is not None and published >= self.decision_store.version():
+            return
+        version, path = snapshot_module.publish(self.decision_store, self.final_dir)
+        print(f"[WORKER] Published decisions snapshot v{version} -> {path}")
+
+    # --------------------------
+    # Lease loop
+    # --------------------------
+
+    def _heartbeat(self, job_id, done):
+        interval = max(1.0, self.lease_seconds / 3)
+        while not done.wait(interval):
+            if not self.job_store.heartbeat(job_id, self.worker_id, self.lease_seconds):
+                print(f"[WARN] Lost lease on {job_id}")
+                return
+
+    def run_job(self, job):
+        job_id, stage = job["job_id"], job["stage"]
+        done = threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(job_id, done), daemon=True)
+        beat.start()
+        start = time.perf_counter()
+        try:
+            follow_ups = self.handlers[stage](job["payload"])
+            sid = job_id.split(":", 1)[-1]
+            for next_stage, payload in follow_ups:
+                self.job_store.enqueue(f"{next_stage}:{sid}", next_stage, payload)
+            self.job_store.complete(job_id, self.worker_id)
+            print(f"[WORKER] {job_id} done in {time.perf_counter() - start:.2f}s")
+            return True
+        except Exception as e:
+            self.job_store.fail(job_id, self.worker_id, e, max_attempts=self.max_attempts)
+            print(f"[ERROR] {job_id} failed (attempt {job['attempts']}/{self.max_attempts}): {e}")
+            return False
+        finally:
+            done.set()
+            beat.join(timeout=5)
+
+    def run_once(self):
+        """Claim and run one job; False when nothing was available."""
+        claimed = self.job_store.claim(self.worker_id, self.stages, self.lease_seconds, limit=1)
+        for job in claimed:
+            self.run_job(job)
+        return bool(claimed)
+
+    def run(self, idle_sleep=IDLE_SLEEP, exit_when_idle=False):
+        print(f"[WORKER] {self.worker_id} serving stages: {', '.join(self.stages)}")
+        while not self._stop.is_set():
+            if not self.run_once():
+                if exit_when_idle:
+                    break
+                self._stop.wait(idle_sleep)
+        print(f"[WORKER] {self.worker_id} stopped")
+
+    def stop(self):
+        self._stop.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a pipeline worker against the shared job store.")
+    parser.add_argument("--worker-id", help="Lease owner name (default: host-pid)")
+    parser.add_argument("--stages", default=",".join(STAGES), help="Comma separated stages to serve")
+    parser.add_argument("--lease", type=float, default=LEASE_SECONDS, help="Lease length in seconds")
+    parser.add_argument("--job-store", default=jobs_module.DEFAULT_JOB_STORE_PATH, help="SQLite job store path")
+    parser.add_argument("--exit-when-idle", action="store_true", help="Stop once no job is claimable")
+    args = parser.parse_args(argv)
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = sorted(set(stages) - set(STAGES))
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    worker = Worker(
+        jobs_module.SQLiteJobStore(args.job_store), store_module.DecisionStore(),
+        worker_id=args.worker_id, stages=stages, lease_seconds=args.lease,
+    )
+    try:
+        worker.run(exit_when_idle=args.exit_when_idle)
+    except KeyboardInterrupt:
+        # The current job's lease simply expires and another worker re-claims it
+        worker.stop()
+
+
+if __name__ == "__main__":
+    main()
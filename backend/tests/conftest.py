@@ -0,0 +1,22 @@
+"""Shared setup: backend/ on sys.path, and every on-disk store pointed at a scratch directory.
+
+The env vars must be set before the modules under test are imported, since
+they read their default paths at import time.
+"""
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+_SCRATCH = tempfile.mkdtemp(prefix="backend-tests-")
+for name, value in {
+    "DECISION_STORE_PATH": os.path.join(_SCRATCH, "decisions.db"),
+    "JOB_STORE_PATH": os.path.join(_SCRATCH, "jobs.db"),
+    "USGS_CACHE_PATH": os.path.join(_SCRATCH, "usgs.db"),
+    "FX_CACHE_DIR": os.path.join(_SCRATCH, "fx"),
+    "PROFILE_DIR": os.path.join(_SCRATCH, "profiles"),
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,92 @@
+from FINAL import accumulation
+from FINAL.accumulation import AccumulationIndex
+
+
+def accepted(sid, lat, lon, liability, country="Kenya", **extra):
+    return dict(
+        Submission_ID=sid, Decision="Accept", Accepted_Liability_KES=liability,
+        Risk_Location={"latitude": lat, "longitude": lon, "country": country}, **extra,
+    )
+
+
+BOOK = [
+    accepted("A", -1.2921, 36.8219, 100.0),
+    accepted("B", -1.3000, 36.8300, 50.0),  # ~1.2 km from A
+    accepted("C", -4.0435, 39.6682, 70.0),  # Mombasa, ~440 km away
+    accepted("D", 0.3476, 32.5825, 30.0, country="Uganda"),
+    accepted("E", None, None, 20.0, CRESTA_Zone="KE-01"),  # zone only
+]
+
+
+def test_radius_and_zone_totals():
+    index = AccumulationIndex.from_records(BOOK)
+    assert index.within_radius(-1.2921, 36.8219, 5) == (150.0, 2)
+    assert index.within_radius(-1.2921, 36.8219, 300) == (150.0, 2)
+    assert index.within_radius(-1.2921, 36.8219, 1000) == (250.0, 4)
+    assert index.zone_total("Kenya") == (220.0, 3)
+    assert index.zone_total("KE-01") == (20.0, 1)
+
+
+def test_accumulation_excludes_the_risks_own_entry():
+    index = AccumulationIndex.from_records(BOOK)
+    # Re-deciding A with a new liability must not count its booked 100 as well
+    result = index.accumulation(accepted("A", -1.2921, 36.8219, 0), 120.0, radius_km=5)
+    assert result["radius_liability"] == 170.0
+    assert result["radius_risks"] == 1
+    assert result["zone_liability"] == 240.0
+    assert result["zone_risks"] == 2
+
+    # A new risk at the same spot counts everything booked
+    result = index.accumulation(accepted("NEW", -1.2921, 36.8219, 0), 120.0, radius_km=5)
+    assert result["radius_liability"] == 270.0
+    assert result["zone_liability"] == 340.0
+
+
+def test_exclude_own_inside_a_fully_covered_cell():
+    # A radius far wider than a cell takes whole cells by their running total;
+    # the excluded risk's cell must still be walked risk by risk
+    index = AccumulationIndex.from_records(BOOK, cell_deg=0.01)
+    total, count = index.within_radius(-1.2921, 36.8219, 50, exclude="A")
+    assert (total, count) == (50.0, 1)
+
+
+def test_declining_or_reversing_removes_the_risk():
+    index = AccumulationIndex.from_records(BOOK)
+    index.apply_decision(dict(BOOK[0], Decision="Decline"))
+    assert len(index) == 4
+    assert index.within_radius(-1.2921, 36.8219, 5) == (50.0, 1)
+    assert index.zone_total("Kenya") == (120.0, 2)
+
+    index.apply_decision(dict(BOOK[1], Risk_Location={"latitude": -4.05, "longitude": 39.67, "country": "Kenya"}))
+    assert index.within_radius(-1.2921, 36.8219, 5) == (0.0, 0)
+    assert index.within_radius(-4.0435, 39.6682, 5) == (120.0, 2)
+
+
+def test_incremental_updates_match_a_rebuild():
+    index = AccumulationIndex.from_records(BOOK)
+    updates = [
+        dict(BOOK[0], Accepted_Liability_KES=300.0),
+        dict(BOOK[2], Decision="Decline"),
+        accepted("F", -1.2950, 36.8250, 10.0),
+        dict(BOOK[3], Risk_Location={"latitude": 0.35, "longitude": 32.58, "country": "Kenya"}),
+    ]
+    for record in updates:
+        index.apply_decision(record)
+
+    latest = {r["Submission_ID"]: r for r in BOOK + updates}
+    rebuilt = AccumulationIndex.from_records(latest.values())
+    restored = AccumulationIndex.restore(index.snapshot())
+    for other in (rebuilt, restored):
+        assert len(other) == len(index)
+        for lat, lon, radius in ((-1.2921, 36.8219, 5), (0.35, 32.58, 20), (-2.0, 37.0, 800)):
+            assert other.within_radius(lat, lon, radius) == index.within_radius(lat, lon, radius)
+        for zone in ("Kenya", "Uganda", "KE-01"):
+            assert other.zone_total(zone) == index.zone_total(zone)
+    assert index.zone_total("Uganda") == (0.0, 0)
+
+
+def test_unlocated_risk_without_zone_is_not_booked():
+    index = AccumulationIndex()
+    index.apply_decision({"Submission_ID": "X", "Decision": "Accept", "Accepted_Liability_KES": 5})
+    assert len(index) == 0
+    assert accumulation.zone_for({"Risk_Location": {"country": "Kenya"}, "CRESTA_Zone": " KE-02 "}) == "KE-02"
@@ -0,0 +1,44 @@
+import pytest
+
+from comined import main
+
+
+@pytest.fixture
+def client():
+    return main.create_app().test_client()
+
+
+@pytest.mark.parametrize("url, message", [
+    ("/api/decisions?limit=abc", "limit must be an integer"),
+    ("/api/traces?limit=0", "limit must be at least 1"),
+    ("/api/exposure?expiring_days=soon", "expiring_days must be an integer"),
+    ("/api/exposure?step_days=0", "step_days must be at least 1"),
+])
+def test_bad_integer_parameters_are_a_400(client, url, message):
+    response = client.get(url)
+    assert response.status_code == 400
+    assert response.get_json() == {"error": message}
+
+
+def test_integer_parameters_are_optional(client):
+    assert client.get("/api/traces").status_code == 200
+    assert client.get("/api/traces?limit=5").status_code == 200
+
+
+def test_profile_endpoints_are_off_without_admin_token(client, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "")
+    for method, url in (("get", "/api/profiles"), ("post", "/api/profiles/enable"), ("post", "/api/profiles/disable")):
+        response = getattr(client, method)(url, headers={"X-Admin-Token": ""})
+        assert response.status_code == 403
+
+
+def test_profile_endpoints_need_the_token_and_a_stage_list(client, monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "secret")
+    assert client.get("/api/profiles", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    headers = {"X-Admin-Token": "secret"}
+    response = client.post("/api/profiles/enable", json={"stages": "all"}, headers=headers)
+    assert response.status_code == 400
+    response = client.post("/api/profiles/enable", json={"stages": ["decision"]}, headers=headers)
+    assert response.status_code == 200
+    assert client.post("/api/profiles/disable", headers=headers).status_code == 200
@@ -0,0 +1,71 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from calculations import fx_rates
+from calculations.fx_rates import FxHistory
+
+
+def history():
+    h = FxHistory()
+    h.add_rates("2025-01-01", {"USD": 130.0, "EUR": 140.0})
+    h.add_rates("2025-03-01", {"usd": 128.0})
+    h.add_rates("2025-02-01", {"USD": 129.0, "EUR": 0, "GBP": "n/a"})
+    return h
+
+
+def test_rate_on_the_latest_date_on_or_before_the_row():
+    rates = history().rates(
+        ["USD", "USD", "USD", "USD", "USD"],
+        ["2025-01-01", "2025-01-31", "15/02/2025", "2025-03-01 09:00", "2030-01-01"],
+    )
+    assert rates.tolist() == [130.0, 130.0, 129.0, 128.0, 128.0]
+
+
+def test_no_rate_before_the_first_date_or_for_unparseable_dates():
+    rates = history().rates(["USD", "USD", "USD", "USD"], ["2024-12-31", "soon", None, float("nan")])
+    assert all(math.isnan(r) for r in rates)
+
+
+def test_missing_currency_is_nan_and_kes_is_one():
+    rates = history().rates(["JPY", None, "GBP", "kes", "EUR"], ["2025-02-15"] * 5)
+    assert math.isnan(rates[0]) and math.isnan(rates[1])
+    # Non-positive and non-numeric rates are not recorded
+    assert math.isnan(rates[2])
+    assert rates[3:].tolist() == [1.0, 140.0]
+
+
+def test_cross_rates_and_typed_columns():
+    h = history()
+    currencies = pd.Series(["USD", "EUR", "USD"], dtype="category")
+    days = pd.Series(pd.to_datetime(["2025-01-15", "2025-01-15", None]))
+    rates = h.rates(currencies, days, "EUR")
+    assert rates[0] == 130.0 / 140.0
+    assert rates[1] == 1.0
+    assert math.isnan(rates[2])
+    assert np.array_equal(fx_rates.to_days(days)[:2], fx_rates.to_days(["2025-01-15", "15/01/2025"]))
+
+
+def test_later_rates_replace_a_date_and_merge_in_order():
+    h = history()
+    h.add_rates("2025-02-01", {"USD": 125.0})
+    h.add_rates("2024-12-01", {"USD": 131.0})
+    rates = h.rates(["USD"] * 3, ["2024-12-15", "2025-02-10", "2025-03-10"])
+    assert rates.tolist() == [131.0, 125.0, 128.0]
+    assert len(h) == 5  # USD on four dates, EUR on one
+    assert h.status() == {"currencies": 2, "first": "2024-12-01", "last": "2025-03-01"}
+
+
+def test_load_rate_sheet_and_day_files(tmp_path):
+    sheet = tmp_path / "rates.csv"
+    sheet.write_text("date,currency,rate\n2025-01-01,USD,130\n2025-01-01,EUR,140\n02/01/2025,USD,131\n")
+    day_file = tmp_path / "rates-2025-01-03.json"
+    day_file.write_text('{"date": "2025-01-03", "quotes": {"USD": 1.0, "KES": 132.0, "EUR": 0.9}}')
+
+    h = FxHistory()
+    assert h.load_file(str(sheet)) == 2
+    assert h.load_dir(str(tmp_path)) == 1
+    rates = h.rates(["USD", "USD", "USD", "EUR"], ["2025-01-01", "2025-01-02", "2025-01-03", "2025-01-03"])
+    assert rates[:3].tolist() == [130.0, 131.0, 132.0]
+    assert math.isclose(rates[3], 132.0 / 0.9)
@@ -0,0 +1,83 @@
+import pytest
+
+from FINAL import in_force
+from FINAL.in_force import InForceIndex
+
+
+def accepted(sid, start, end, liability):
+    return {
+        "Submission_ID": sid, "Decision": "Accept", "Accepted_Liability_KES": liability,
+        "Period_Start": start, "Period_End": end,
+    }
+
+
+BOOK = [
+    accepted("A", "2025-01-01", "2025-12-31", 100.0),
+    accepted("B", "01/03/2025", "31/05/2025", 50.0),
+    accepted("C", "1 June 2025", "30 June 2025 00:00", 70.0),
+]
+
+
+def test_periods_are_inclusive_of_both_dates():
+    index = InForceIndex.from_records(BOOK)
+    assert index.exposure_on("2024-12-31") == 0.0
+    assert index.exposure_on("2025-01-01") == 100.0
+    assert index.exposure_on("2025-05-31") == 150.0
+    assert index.exposure_on("2025-06-01") == 170.0
+    assert index.exposure_on("2025-06-30") == 170.0
+    assert index.exposure_on("2025-07-01") == 100.0
+    assert index.exposure_on("2026-01-01") == 0.0
+
+
+def test_peak_and_its_date():
+    index = InForceIndex.from_records(BOOK)
+    assert index.peak("2025-01-01", "2025-12-31") == (170.0, "2025-06-01")
+    assert index.peak("2025-03-15", "2025-04-15") == (150.0, "2025-03-15")
+    with pytest.raises(ValueError):
+        index.peak("2025-02-01", "2025-01-01")
+
+
+def test_period_peak_leaves_the_risks_own_period_out():
+    index = InForceIndex.from_records(BOOK)
+    # C is already booked; re-evaluating it must not count its 70 twice
+    assert index.period_peak(BOOK[2]) == (100.0, "2025-06-01")
+    assert index.period_peak(dict(BOOK[2], Submission_ID="NEW")) == (170.0, "2025-06-01")
+    assert index.period_peak({"Submission_ID": "X", "Period_Start": "n/a"}) is None
+
+
+@pytest.mark.parametrize("threshold", [1, 64])
+def test_delta_updates_match_a_rebuild(threshold):
+    index = InForceIndex(rebuild_threshold=threshold)
+    for record in BOOK:
+        index.apply_decision(record)
+    updates = [
+        dict(BOOK[0], Accepted_Liability_KES=300.0),
+        dict(BOOK[1], Decision="Decline"),
+        accepted("D", "2025-06-15", "2025-07-15", 40.0),
+        dict(BOOK[2], Period_End="2025-06-10"),
+    ]
+    for record in updates:
+        index.apply_decision(record)
+
+    latest = {r["Submission_ID"]: r for r in BOOK + updates}
+    rebuilt = InForceIndex.from_records(latest.values())
+    restored = InForceIndex.restore(index.snapshot())
+    for other in (rebuilt, restored):
+        assert len(other) == len(index) == 3
+        for day in ("2025-01-01", "2025-04-01", "2025-06-05", "2025-06-12", "2025-07-10", "2025-12-31"):
+            assert other.exposure_on(day) == index.exposure_on(day)
+        assert other.peak("2025-01-01", "2025-12-31") == index.peak("2025-01-01", "2025-12-31")
+        assert other.expiring("2025-06-01", 45) == index.expiring("2025-06-01", 45)
+    assert index.peak("2025-01-01", "2025-12-31") == (370.0, "2025-06-01")
+    assert index.expiring("2025-06-01", 45) == [("C", "2025-06-10", 70.0), ("D", "2025-07-15", 40.0)]
+
+
+def test_unparseable_or_reversed_period_is_not_booked():
+    index = InForceIndex.from_records([
+        accepted("X", "soon", "2025-12-31", 10.0),
+        accepted("Y", "2025-12-31", "2025-01-01", 10.0),
+        accepted("Z", None, "2025-12-31", 10.0),
+    ])
+    assert len(index) == 0
+    assert in_force.to_day("2025-01-01 12:30") == in_force.to_day("01/01/2025")
+    assert in_force.to_day(float("nan")) is None
@@ -0,0 +1,124 @@
+import pytest
+
+from comined import pipeline
+from FINAL import store as store_module
+
+
+def slip(sid, tsi=1_000_000, **extra):
+    return dict(
+        Submission_ID=sid, Insured=f"Insured {sid}", Cedant="Acme Re", Original_Currency="KES",
+        TSI_Original_Currency=tsi, Period_Start="2025-01-01", Period_End="2025-12-31",
+        Risk_Location={"latitude": -1.29, "longitude": 36.82, "country": "Kenya"}, **extra,
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    pipeline._books.clear()
+    yield store_module.DecisionStore(str(tmp_path / "decisions.db"))
+    pipeline._books.clear()
+
+
+@pytest.fixture
+def decided(monkeypatch):
+    """Replace the stages with one that accepts every risk and books it, like the decision stage does."""
+    batches = []
+
+    def bind_stages(portfolio=None, accumulation=None, in_force=None, **kwargs):
+        def decide(records):
+            batches.append([r["Submission_ID"] for r in records])
+            out = []
+            for record in records:
+                record = dict(record, Decision="Accept", TSI_KES=record["TSI_Original_Currency"],
+                              Accepted_Liability_KES=record["TSI_Original_Currency"] / 10)
+                accumulation.apply_decision(record)
+                in_force.apply_decision(record)
+                out.append(record)
+            return out
+        return [("decision", decide)]
+
+    monkeypatch.setattr(pipeline, "bind_stages", bind_stages)
+    return batches
+
+
+def test_unchanged_submissions_are_skipped(store, decided):
+    assert pipeline.run_incremental([slip("S1"), slip("S2")], store) == 2
+    assert pipeline.run_incremental([slip("S1"), slip("S2")], store) == 0
+    assert pipeline.run_incremental([slip("S1"), slip("S2", tsi=2_000_000)], store) == 1
+    assert decided == [["S1", "S2"], ["S2"]]
+    assert store.count() == 2
+
+
+def test_force_ids_and_full_rerun_unchanged_submissions(store, decided):
+    pipeline.run_incremental([slip("S1"), slip("S2")], store)
+    assert pipeline.run_incremental([slip("S1"), slip("S2")], store, force_ids=["S2"]) == 1
+    assert pipeline.run_incremental([slip("S1"), slip("S2")], store, full=True) == 2
+    assert decided[1:] == [["S2"], ["S1", "S2"]]
+
+
+def test_legacy_records_get_a_content_id(store, decided):
+    record = slip(None)
+    del record["Submission_ID"]
+    assert pipeline.run_incremental([record], store) == 1
+    assert pipeline.run_incremental([dict(record)], store) == 0
+    [sid] = decided[0]
+    assert sid == store_module.submission_id_for(record) and sid.startswith("sha1-")
+
+
+def test_books_follow_our_own_writes(store, decided):
+    pipeline.run_incremental([slip("S1")], store)
+    version, portfolio, accumulation, in_force = pipeline._books[store.path]
+    assert version == store.version()
+    assert len(portfolio) == len(accumulation) == len(in_force) == 1
+
+    pipeline.run_incremental([slip("S2")], store)
+    assert pipeline._books[store.path][0] == store.version()
+    assert pipeline._books[store.path][2] is accumulation
+    assert len(accumulation) == 2
+
+
+def test_books_dropped_when_another_writer_got_in_between(store, decided, monkeypatch):
+    pipeline.run_incremental([slip("S1")], store)
+    upsert = store.upsert_records
+
+    def racing_upsert(records, **kwargs):
+        # Another process books a risk between our book load and our write
+        other = store_module.DecisionStore(store.path)
+        other.upsert_records([dict(slip("OTHER"), Decision="Accept", Accepted_Liability_KES=5.0)])
+        return upsert(records, **kwargs)
+
+    monkeypatch.setattr(store, "upsert_records", racing_upsert)
+    pipeline.run_incremental([slip("S2")], store)
+    assert store.path not in pipeline._books
+
+    _, accumulation, _ = pipeline.books_for(store)
+    assert len(accumulation) == 3
+
+
+def test_failed_upsert_drops_the_books(store, decided, monkeypatch):
+    pipeline.run_incremental([slip("S1")], store)
+    version = store.version()
+    upsert = store.upsert_records
+
+    def failing_upsert(records, **kwargs):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(store, "upsert_records", failing_upsert)
+    with pytest.raises(RuntimeError, match="disk full"):
+        pipeline.run_incremental([slip("S2")], store)
+    # The decision stage booked S2 into the cached indexes; they must not survive
+    assert store.path not in pipeline._books
+    assert store.version() == version
+
+    monkeypatch.setattr(store, "upsert_records", upsert)
+    portfolio, accumulation, in_force = pipeline.books_for(store)
+    assert len(portfolio) == len(accumulation) == len(in_force) == 1
+    # S2 was never stored, so the next run decides it again
+    assert pipeline.run_incremental([slip("S1"), slip("S2")], store) == 1
+    assert decided[-1] == ["S2"]
+
+
+def test_upsert_returns_the_version_it_committed(store):
+    assert store.upsert_records([]) == (0, None)
+    before = store.version()
+    assert store.upsert_records([slip("S1"), slip("S2")]) == (2, before + 1)
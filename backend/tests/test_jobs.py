@@ -0,0 +1,78 @@
+import pytest
+
+from comined import jobs
+
+
+@pytest.fixture(params=["sqlite", "local"])
+def job_store(request, tmp_path):
+    if request.param == "sqlite":
+        return jobs.SQLiteJobStore(str(tmp_path / "jobs.db"))
+    return jobs.LocalJobStore()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(jobs.time, "time", lambda: now[0])
+    return now
+
+
+def test_enqueue_is_idempotent(job_store):
+    assert job_store.enqueue("extract:S1", "extract", {"path": "S1"})
+    assert not job_store.enqueue("extract:S1", "extract", {"path": "other"})
+    [job] = job_store.claim("w1", ["extract"])
+    assert job["payload"] == {"path": "S1"}
+
+
+def test_live_lease_is_not_reclaimed(job_store, clock):
+    job_store.enqueue("extract:S1", "extract", {})
+    assert len(job_store.claim("w1", ["extract"], lease_seconds=60)) == 1
+    clock[0] += 59
+    assert job_store.claim("w2", ["extract"]) == []
+
+
+def test_expired_lease_is_reclaimed_by_another_worker(job_store, clock):
+    job_store.enqueue("extract:S1", "extract", {})
+    job_store.claim("w1", ["extract"], lease_seconds=60)
+    clock[0] += 61
+    assert job_store.stats()["expired_leases"] == 1
+
+    [job] = job_store.claim("w2", ["extract"], lease_seconds=60)
+    assert job["job_id"] == "extract:S1"
+    assert job["attempts"] == 2
+    # The crashed worker lost the job: it can neither extend nor finish it
+    assert not job_store.heartbeat("extract:S1", "w1")
+    assert not job_store.complete("extract:S1", "w1")
+    assert job_store.complete("extract:S1", "w2")
+    assert job_store.stats()["stages"]["extract"] == {jobs.DONE: 1}
+
+
+def test_heartbeat_keeps_the_lease(job_store, clock):
+    job_store.enqueue("extract:S1", "extract", {})
+    job_store.claim("w1", ["extract"], lease_seconds=60)
+    clock[0] += 50
+    assert job_store.heartbeat("extract:S1", "w1", lease_seconds=60)
+    clock[0] += 50
+    assert job_store.claim("w2", ["extract"]) == []
+    assert job_store.stats()["expired_leases"] == 0
+
+
+def test_failed_job_retries_after_backoff_then_gives_up(job_store, clock):
+    job_store.enqueue("nlp:S1", "nlp", {})
+    job_store.claim("w1", ["nlp"])
+    assert job_store.fail("nlp:S1", "w1", "boom", max_attempts=2)
+    assert job_store.claim("w1", ["nlp"]) == []
+    clock[0] += jobs._retry_delay(1)
+
+    [job] = job_store.claim("w1", ["nlp"])
+    assert job["attempts"] == 2
+    job_store.fail("nlp:S1", "w1", "boom", max_attempts=2)
+    clock[0] += jobs._retry_delay(2)
+    assert job_store.claim("w1", ["nlp"]) == []
+    assert job_store.stats()["stages"]["nlp"] == {jobs.FAILED: 1}
+
+
+def test_claim_only_takes_requested_stages(job_store):
+    job_store.enqueue("extract:S1", "extract", {})
+    job_store.enqueue("nlp:S2", "nlp", {})
+    assert [j["job_id"] for j in job_store.claim("w1", ["nlp"], limit=5)] == ["nlp:S2"]
@@ -0,0 +1,90 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from calculations import schema
+from calculations.schema import RiskRecord
+
+
+RAW = [
+    {
+        "Submission_ID": "S1", "Cedant": "Acme Re", "Original_Currency": "USD",
+        "TSI_Original_Currency": "1,000,000", "PML_Pct": None,
+        "Period_Start": "20/09/2025", "Period_End": "19 September 2026 00:00",
+        "latitude": "-1.29", "longitude": 36.82, "Broker_Notes": "kept as extra",
+    },
+    {
+        "Submission_ID": "S2", "Cedant": "Acme Re", "Original_Currency": "KES",
+        "TSI_Original_Currency": "about 5m", "Period_Start": "2025-10-01",
+        "Period_End": "TBA", "latitude": "", "Perils_Covered": ["Fire", "Flood"],
+    },
+]
+
+
+def test_ingest_coerces_amounts_coordinates_and_keeps_date_text(capsys):
+    s1, s2 = schema.ingest(RAW)
+    assert s1["TSI_Original_Currency"] == 1_000_000.0
+    assert s1["PML_Pct"] == 0.0
+    assert (s1["latitude"], s1["longitude"]) == (-1.29, 36.82)
+    assert s1["Broker_Notes"] == "kept as extra"
+    assert s2["TSI_Original_Currency"] == 0.0
+    assert s2["latitude"] is None
+    # Dates are validated but left as the slip wrote them
+    assert s1["Period_End"] == "19 September 2026 00:00"
+    assert s2["Period_End"] == "TBA"
+    out = capsys.readouterr().out
+    assert "TSI_Original_Currency x1" in out
+    assert "1 policy dates are not calendar dates" in out
+
+
+def test_ingest_rejects_non_objects_and_passes_records_through():
+    record = RiskRecord(Submission_ID="S1")
+    assert schema.ingest([record])[0] is record
+    with pytest.raises(ValueError, match="record 1"):
+        schema.ingest([{}, ["not", "a", "record"]])
+
+
+def test_typed_frame_dtypes():
+    df = schema.typed_frame(schema.ingest(RAW))
+    assert isinstance(df["Cedant"].dtype, pd.CategoricalDtype)
+    assert df["TSI_Original_Currency"].dtype == np.float64
+    assert df["latitude"].isna().tolist() == [False, True]
+    assert pd.api.types.is_datetime64_dtype(df["Period_Start"])
+    assert df["Period_Start"].tolist() == [pd.Timestamp("2025-09-20"), pd.Timestamp("2025-10-01")]
+    assert df["Period_End"].iloc[0] == pd.Timestamp("2026-09-19")
+    assert pd.isna(df["Period_End"].iloc[1])
+
+
+def test_records_from_frame_round_trips_date_text():
+    records = schema.ingest(RAW)
+    df = schema.typed_frame(records)
+    df["TSI_KES"] = df["TSI_Original_Currency"] * 2
+    back = schema.records_from_frame(df, records)
+
+    for original, record in zip(records, back):
+        assert record["Period_Start"] == original["Period_Start"]
+        assert record["Period_End"] == original["Period_End"]
+        assert record["Cedant"] == original["Cedant"]
+    assert back[0]["TSI_KES"] == 2_000_000.0
+    assert back[0]["Broker_Notes"] == "kept as extra"
+    assert back[1]["Perils_Covered"] == ["Fire", "Flood"]
+    # A field only one record had reads as None on the others
+    assert back[1]["latitude"] is None
+    assert back[1]["Broker_Notes"] is None
+    # and they still serialize as plain JSON types
+    assert type(back[0]["TSI_KES"]) is float
+    assert type(back[0]["Cedant"]) is str
+
+
+def test_risk_record_behaves_like_a_dict():
+    record = RiskRecord({"Submission_ID": "S1", "Cedant": "Acme Re"}, Custom=1)
+    assert list(record) == ["Cedant", "Submission_ID", "Custom"]
+    assert "Broker" not in record and record.get("Broker", "-") == "-"
+    with pytest.raises(KeyError):
+        record["Broker"]
+    del record["Cedant"]
+    assert record.to_dict() == {"Submission_ID": "S1", "Custom": 1}
+    assert pickle.loads(pickle.dumps(record)) == record
+    assert record.copy() == dict(record)